@@ -0,0 +1,61 @@
+"""
+API v1 — Emission Activities
+Bulk import of emission activities from CSV / Excel files.
+"""
+
+import os
+import uuid
+
+from flask import Blueprint, jsonify, request
+from flask_login import current_user, login_required
+
+from app.models.user import UserRole
+from app.security.permissions import PermissionManager
+
+bp = Blueprint("api_activities", __name__, url_prefix="/api/v1/activities")
+
+
+@bp.route("/import", methods=["POST"])
+@login_required
+def import_activities():
+    """
+    POST /api/v1/activities/import   (multipart: file=<.csv|.xlsx>[, auto_validate=1])
+
+    Imports one activity per row as the current user's drafts. Required
+    columns: scope, category, period_start, period_end, ademe_factor_id;
+    optional: activity_type, quantity, quantity_unit, tonnage, distance,
+    transport_mode, description. Org admins may pass auto_validate=1.
+
+    Runs as a background job: returns 202 with the job (see /api/v1/jobs/<id>),
+    whose result is {"rows", "imported", "rejected", "chunks",
+    "errors": [{"line", "error"}]}.
+    """
+    if not PermissionManager.can_submit_activity(current_user):
+        return jsonify({"error": "Permission denied"}), 403
+
+    file = request.files.get("file")
+    if not file or not file.filename:
+        return jsonify({"error": "No file uploaded"}), 400
+
+    auto_validate = (request.form.get("auto_validate") == "1"
+                     and current_user.role == UserRole.ORG_ADMIN)
+
+    from app.emissions.importer import read_rows
+    from app.services.job_queue import enqueue, job_file_path
+
+    # The upload only lives as long as the request; the job reads a copy
+    path = job_file_path(f"upload-{uuid.uuid4().hex}{os.path.splitext(file.filename)[1].lower()}")
+    file.save(path)
+    try:
+        # Reject unusable files now rather than in the job
+        with open(path, "rb") as stream:
+            rows = read_rows(stream, file.filename)
+            next(rows, None)
+            rows.close()
+    except ValueError as e:
+        os.remove(path)
+        return jsonify({"error": str(e)}), 400
+
+    job = enqueue("import_activities", current_user, path=path, filename=file.filename,
+                  auto_validate=auto_validate)
+    return jsonify(job.to_dict()), 202
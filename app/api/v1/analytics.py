@@ -1,9 +1,14 @@
 from flask import Blueprint, jsonify, request, current_app
 from flask_login import login_required, current_user
-from sqlalchemy import func
+from sqlalchemy import extract, func
 from datetime import datetime
 
 from app.models.emission_activity import EmissionActivity, ActivityStatus, EmissionScope
+from app.models.emission_rollup import EmissionRollup
+from app.models.organization import Organization
+from app.models.user import UserRole
+from app.emissions.rollup import platform_breakdown, rollup_totals
+from app.services import analytics_cache
 from app.security.permissions import PermissionManager
 from app.extensions import db
 
@@ -20,6 +25,10 @@ def get_emissions_analytics():
     try:
         # Determine the target organization ID
         target_org_id = request.args.get('org_id', type=int)
+        # Organization whose rollup rows answer the request (None = every org);
+        # workers only see their own activities, which the rollup cannot tell apart
+        rollup_org_id = target_org_id
+        own_activities_only = False
 
         # 1. Platform Admins can see everything (global view if no org_id, specific org if org_id)
         if PermissionManager.is_platform_admin(current_user):
@@ -31,17 +40,17 @@ def get_emissions_analytics():
         elif current_user.role == UserRole.AUDITOR:
             if not target_org_id:
                 return jsonify({'error': 'Auditors must specify an org_id'}), 400
-                
-            from app.models.contract import AuditorContract, ContractStatus
+
+            from app.models.auditor_contract import AuditorContract, ContractStatus
             has_contract = AuditorContract.query.filter(
                 AuditorContract.auditor_id == current_user.id,
                 AuditorContract.organization_id == target_org_id,
                 AuditorContract.status.in_([ContractStatus.TRIAL, ContractStatus.ACTIVE])
             ).first()
-            
+
             if not has_contract:
                 return jsonify({'error': 'Not authorized to view analytics for this organization'}), 403
-            
+
             query = EmissionActivity.query.filter_by(organization_id=target_org_id)
 
         # 3. Org Admins and Viewers can see everything WITHIN their own org
@@ -49,16 +58,18 @@ def get_emissions_analytics():
             if not current_user.organization_id:
                 return jsonify({'error': 'No organization assigned'}), 403
             query = EmissionActivity.query.filter_by(organization_id=current_user.organization_id)
+            rollup_org_id = current_user.organization_id
 
         # 4. Workers can only see their OWN activities
         elif current_user.role == UserRole.WORKER:
             if not current_user.organization_id:
                 return jsonify({'error': 'No organization assigned'}), 403
             query = EmissionActivity.query.filter_by(
-                organization_id=current_user.organization_id, 
+                organization_id=current_user.organization_id,
                 created_by_id=current_user.id
             )
-            
+            own_activities_only = True
+
         else:
             return jsonify({'error': 'Unauthorized role for analytics'}), 403
 
@@ -69,82 +80,181 @@ def get_emissions_analytics():
         category = request.args.get('category')
         status = request.args.get('status')
 
-        if date_from:
-            query = query.filter(EmissionActivity.period_start >= datetime.strptime(date_from, '%Y-%m-%d').date())
-        if date_to:
-            query = query.filter(EmissionActivity.period_end <= datetime.strptime(date_to, '%Y-%m-%d').date())
-        if scope:
-            query = query.filter(EmissionActivity.scope == EmissionScope(scope))
-        if category:
-            query = query.filter(EmissionActivity.category == category)
-        if status:
-            query = query.filter(EmissionActivity.status == ActivityStatus(status))
-
-        # We only care about activities with actual calculated results
-        query = query.filter(EmissionActivity.co2e_result.isnot(None))
-
-        # Execute query
-        activities = query.all()
-
-        # Aggregations
-        total_co2e_kg = sum(a.co2e_result for a in activities)
-        total_co2e_t = total_co2e_kg / 1000
-
-        # Scope Breakdown
-        scopes = {}
-        for a in activities:
-            s = a.scope.value
-            scopes[s] = scopes.get(s, 0) + a.co2e_result
+        date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else None
+        date_to = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else None
+        scope = EmissionScope(scope) if scope else None
+        status = ActivityStatus(status) if status else None
 
-        # Category Breakdown
-        categories = {}
-        for a in activities:
-            c = a.category or 'Uncategorized'
-            categories[c] = categories.get(c, 0) + a.co2e_result
-
-        # Trend Data (Monthly)
-        trend = {}
-        for a in activities:
-            # Group by year-month of the period start date
-            month_key = a.period_start.strftime('%Y-%m')
-            trend[month_key] = trend.get(month_key, 0) + a.co2e_result
-
-        # Sort trend chronologically
-        sorted_trend_keys = sorted(trend.keys())
-        trend_labels = sorted_trend_keys
-        trend_data = [trend[k] / 1000 for k in sorted_trend_keys] # Convert to tonnes for charts
+        key = analytics_cache.cache_key(
+            'own' if own_activities_only else 'org' if rollup_org_id else 'platform',
+            current_user.organization_id if own_activities_only else rollup_org_id,
+            current_user.id if own_activities_only else None,
+            date_from=date_from, date_to=date_to, scope=scope, category=category, status=status,
+        )
 
-        # Activity Types (Radar chart)
-        activity_types = {}
-        for a in activities:
-            t = a.activity_type.value
-            activity_types[t] = activity_types.get(t, 0) + a.co2e_result
-
-        return jsonify({
-            'summary': {
-                'total_kg': total_co2e_kg,
-                'total_t': total_co2e_t,
-                'count': len(activities)
-            },
-            'scopes': {
-                'labels': list(scopes.keys()),
-                'data': [v / 1000 for v in scopes.values()]
-            },
-            'categories': {
-                # top 10 categories
-                'labels': [k for k, v in sorted(categories.items(), key=lambda item: item[1], reverse=True)[:10]],
-                'data': [v / 1000 for k, v in sorted(categories.items(), key=lambda item: item[1], reverse=True)[:10]]
-            },
-            'trend': {
-                'labels': trend_labels,
-                'data': trend_data
-            },
-            'activity_types': {
-                'labels': list(activity_types.keys()),
-                'data': [v / 1000 for v in activity_types.values()]
-            }
-        })
+        def compute():
+            # The rollup is keyed on the month of period_start: it answers
+            # month-aligned date_from filters, but not date_to (on period_end)
+            if not own_activities_only and not date_to and (not date_from or date_from.day == 1):
+                return _rollup_analytics(rollup_org_id, date_from, scope, category, status)
+            return _activity_analytics(query, date_from, date_to, scope, category, status)
+
+        return jsonify(analytics_cache.get_or_compute(key, compute))
 
     except Exception as e:
         current_app.logger.error(f"Analytics API Error: {e}")
         return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/stats', methods=['GET'])
+@login_required
+def get_analytics_stats():
+    """
+    GET /api/v1/analytics/stats
+
+    Returns the analytics response cache counters (size, hits, misses, hit
+    ratio) and the average latency of cache hits and misses, for platform admins.
+    """
+    if not PermissionManager.is_platform_admin(current_user):
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify(analytics_cache.stats())
+
+
+def _activity_analytics(query, date_from, date_to, scope, category, status):
+    """Analytics payload aggregated from the filtered activity rows"""
+    if date_from:
+        query = query.filter(EmissionActivity.period_start >= date_from)
+    if date_to:
+        query = query.filter(EmissionActivity.period_end <= date_to)
+    if scope:
+        query = query.filter(EmissionActivity.scope == scope)
+    if category:
+        query = query.filter(EmissionActivity.category == category)
+    if status:
+        query = query.filter(EmissionActivity.status == status)
+
+    # We only care about activities with actual calculated results
+    query = query.filter(EmissionActivity.co2e_result.isnot(None))
+
+    # One GROUP BY over the filtered activities; the groups (a few per
+    # category and month) are then folded into the chart series
+    year = extract('year', EmissionActivity.period_start)
+    month = extract('month', EmissionActivity.period_start)
+    groups = (
+        query.with_entities(
+            EmissionActivity.scope,
+            EmissionActivity.category,
+            EmissionActivity.activity_type,
+            year,
+            month,
+            func.sum(EmissionActivity.co2e_result),
+            func.count(EmissionActivity.id),
+        )
+        .group_by(EmissionActivity.scope, EmissionActivity.category,
+                  EmissionActivity.activity_type, year, month)
+        .all()
+    )
+
+    return _fold_groups(
+        (s, c, t, f"{int(y):04d}-{int(m):02d}", kg, n) for s, c, t, y, m, kg, n in groups
+    )
+
+
+def _rollup_analytics(organization_id, month_from, scope, category, status):
+    """Analytics payload summed from EmissionRollup rows instead of activities"""
+    rows = rollup_totals(
+        EmissionRollup.scope, EmissionRollup.category,
+        EmissionRollup.activity_type, EmissionRollup.period_month,
+        organization_id=organization_id,
+        statuses=[status] if status else None,
+        scope=scope,
+        category=category,
+        month_from=month_from,
+    )
+    # Groups without a calculated result count as no data, like the activity query
+    payload = _fold_groups(
+        (r.scope, r.category, r.activity_type, r.period_month.strftime('%Y-%m'), r.co2e_kg, r.priced_count)
+        for r in rows if r.priced_count
+    )
+    # Platform view: top organizations, industries and countries. The
+    # breakdowns are kept per scope and status only, so they are left out
+    # when a category or date filter narrows the rest of the payload.
+    if organization_id is None and not category and not month_from:
+        payload['breakdowns'] = _platform_breakdowns(status, scope)
+    return payload
+
+
+def _platform_breakdowns(status, scope):
+    """Top 10 organizations, industries and countries by emissions (tCO2e)"""
+    statuses = [status] if status else None
+    breakdowns = {}
+    for name, dimension in (('organizations', 'organization'), ('industries', 'industry'),
+                            ('countries', 'country')):
+        rows = platform_breakdown(dimension, statuses=statuses, scope=scope)
+        breakdowns[name] = {
+            'labels': [r.value or 'Unspecified' for r in rows],
+            'data': [r.co2e_kg / 1000 for r in rows],
+        }
+
+    org_names = dict(
+        db.session.query(Organization.id, Organization.name)
+        .filter(Organization.id.in_([int(v) for v in breakdowns['organizations']['labels']]))
+    )
+    breakdowns['organizations']['labels'] = [
+        org_names.get(int(v), f'#{v}') for v in breakdowns['organizations']['labels']
+    ]
+    return breakdowns
+
+
+def _fold_groups(groups):
+    """
+    Fold (scope, category, activity_type, 'YYYY-MM', co2e_kg, count) groups
+    into the analytics payload
+    """
+    total_co2e_kg, count = 0.0, 0
+    scopes, categories, trend, activity_types = {}, {}, {}, {}
+    for scope, category, activity_type, month_key, co2e_kg, n in groups:
+        total_co2e_kg += co2e_kg
+        count += n
+        scopes[scope.value] = scopes.get(scope.value, 0) + co2e_kg
+        # Category Breakdown
+        c = category or 'Uncategorized'
+        categories[c] = categories.get(c, 0) + co2e_kg
+        # Trend Data (Monthly), by year-month of the period start date
+        trend[month_key] = trend.get(month_key, 0) + co2e_kg
+        # Activity Types (Radar chart)
+        activity_types[activity_type.value] = activity_types.get(activity_type.value, 0) + co2e_kg
+
+    return _analytics_response(total_co2e_kg, count, scopes, categories, trend, activity_types)
+
+
+def _analytics_response(total_co2e_kg, count, scopes, categories, trend, activity_types):
+    """JSON body shared by every aggregation path (kgCO2e in, tCO2e for charts)"""
+    # Sort trend chronologically
+    trend_labels = sorted(trend.keys())
+    top_categories = sorted(categories.items(), key=lambda item: item[1], reverse=True)[:10]
+
+    return {
+        'summary': {
+            'total_kg': total_co2e_kg,
+            'total_t': total_co2e_kg / 1000,
+            'count': count
+        },
+        'scopes': {
+            'labels': list(scopes.keys()),
+            'data': [v / 1000 for v in scopes.values()]
+        },
+        'categories': {
+            # top 10 categories
+            'labels': [k for k, v in top_categories],
+            'data': [v / 1000 for k, v in top_categories]
+        },
+        'trend': {
+            'labels': trend_labels,
+            'data': [trend[k] / 1000 for k in trend_labels]  # Convert to tonnes for charts
+        },
+        'activity_types': {
+            'labels': list(activity_types.keys()),
+            'data': [v / 1000 for v in activity_types.values()]
+        }
+    }
@@ -5,33 +5,103 @@ Used by the new-emission wizard and the public Factor Explorer.
 """
 
 from flask import Blueprint, jsonify, request
-from app.services.emission_factor_loader import get_loader
+from app.extensions import csrf
+from app.services.factor_registry import ID_SEPARATOR, get_registry
+from app.services.emission_factor_loader import (
+    FACET_FIELDS, get_loader, get_loader_version, loader_status, on_reload
+)
+from app.utils.cache import LRUCache
 
 bp = Blueprint("api_factors", __name__, url_prefix="/api/v1/factors")
 
+# Most ids and queries a single batch request may carry
+MAX_BATCH_ITEMS = 500
+
+# Typeahead queries repeat constantly ("elec", "gaz", "diesel"...)
+_search_cache = LRUCache(max_size=2048, ttl=600)
+on_reload(_search_cache.clear)
+
 
 @bp.route("/search")
 def search():
     """
     GET /api/v1/factors/search?q=<query>&lang=fr&limit=20&valid_only=1
+        [&category=..&source=..&location=..&unit=..][&facets=1][&databases=all]
 
     Returns a JSON list of matching emission factors ordered by relevance.
+    Facet parameters may be repeated (values are OR-ed, facets AND-ed).
+    With facets=1 the response is {"results": [...], "facets": {facet:
+    [{"value", "count"}]}}, counting every factor that matches the query.
+    ADEME Base Carbone is searched by default; databases takes "all" or a
+    comma-separated list (ademe, defra, epa, ipcc, ghg_protocol, custom).
     """
-    q = request.args.get("q", "").strip()
-    lang = request.args.get("lang", "fr")
-    limit = min(int(request.args.get("limit", 20)), 50)
+    q = " ".join(request.args.get("q", "").split()).lower()
+    lang = "fr" if request.args.get("lang", "fr") == "fr" else "en"
+    limit = max(min(request.args.get("limit", 20, type=int), 50), 0)
     valid_only = request.args.get("valid_only", "1") == "1"
+    with_facets = request.args.get("facets", "0") == "1"
+    filters = {
+        name: tuple(sorted(set(request.args.getlist(name))))
+        for name in FACET_FIELDS if request.args.getlist(name)
+    }
+    databases = _parse_databases(request.args.get("databases", ""))
 
     if not q or len(q) < 2:
-        return jsonify([])
+        return jsonify({"results": [], "facets": {}} if with_facets else [])
+
+    # The loader and registry versions in the key keep results from replaced
+    # indexes out; selecting first picks up edits to database-backed factors
+    searcher = _searcher(databases)
+    registry_version = searcher.version if databases is not None else 0
+    key = (get_loader_version(), registry_version, databases, q, lang, limit, valid_only,
+           tuple(sorted(filters.items())), with_facets)
+    return jsonify(_search_cache.get_or_set(
+        key, lambda: _search(searcher, q, lang, limit, valid_only, filters, with_facets)
+    ))
+
+
+def _parse_databases(value: str):
+    """None for the default ADEME search, "all", or a sorted tuple of database names."""
+    names = {name.strip().lower() for name in value.split(",") if name.strip()}
+    if not names or names == {"ademe"}:
+        return None
+    if "all" in names:
+        return "all"
+    return tuple(sorted(names))
+
+
+def _searcher(databases):
+    """The ADEME loader, or the selected databases of the registry."""
+    if databases is None:
+        return get_loader()
+    return get_registry().select(None if databases == "all" else databases)
 
-    loader = get_loader()
-    raw_results = loader.search(q, language=lang, max_results=limit * 2)
 
+def _search(searcher, q: str, lang: str, limit: int, valid_only: bool, filters: dict,
+            with_facets: bool):
+    """Run the search engine and serialise hits for the JSON response."""
+    if with_facets:
+        raw_results, counts = searcher.faceted_search(
+            q, language=lang, max_results=limit, valid_only=valid_only, filters=filters
+        )
+        return {
+            "results": _serialize_hits(raw_results),
+            "facets": {
+                name: [{"value": value, "count": count} for value, count in values.items()]
+                for name, values in counts.items()
+            },
+        }
+
+    raw_results = searcher.search(
+        q, language=lang, max_results=limit, valid_only=valid_only, filters=filters
+    )
+    return _serialize_hits(raw_results)
+
+
+def _serialize_hits(raw_results) -> list:
+    """JSON dicts for (factor, score) search hits."""
     results = []
     for factor, score in raw_results:
-        if valid_only and factor.status == "Archivé":
-            continue
         results.append({
             "id": factor.id,
             "name_fr": factor.name_fr,
@@ -50,10 +120,128 @@ def search():
             "tags_fr": factor.tags_fr,
             "score": round(score, 3),
         })
-        if len(results) >= limit:
-            break
 
-    return jsonify(results)
+    return results
+
+
+@bp.route("/suggest")
+def suggest():
+    """
+    GET /api/v1/factors/suggest?q=<prefix>&lang=fr&limit=8
+
+    Returns typeahead completions (tags and factor names) for a partially
+    typed query. Served from a prefix index, cheap enough for every keystroke;
+    clients run /search once the user pauses or submits.
+    """
+    q = request.args.get("q", "")
+    lang = "fr" if request.args.get("lang", "fr") == "fr" else "en"
+    limit = max(min(request.args.get("limit", 8, type=int), 20), 0)
+
+    if not q.strip():
+        return jsonify([])
+
+    return jsonify(get_loader().suggest(q, language=lang, limit=limit))
+
+
+@bp.route("/batch", methods=["POST"])
+@csrf.exempt
+def batch():
+    """
+    POST /api/v1/factors/batch
+
+    Body: {"ids": ["<ademe id>", ...], "queries": ["<query>", ...],
+           "lang": "fr", "limit": 5, "valid_only": true, "databases": "all"}
+
+    Resolves many factors in one round trip: ids through the id index,
+    queries through a single multi-query pass of the search engine. Returns
+    {"factors": {id: factor or null}, "queries": [{"q", "results"}]}.
+    Read-only, so exempt from CSRF for import clients.
+    """
+    payload = request.get_json(silent=True) or {}
+    ids = payload.get("ids") or []
+    queries = payload.get("queries") or []
+    if not isinstance(ids, list) or not isinstance(queries, list):
+        return jsonify({"error": "ids and queries must be lists"}), 400
+    if len(ids) + len(queries) > MAX_BATCH_ITEMS:
+        return jsonify({"error": f"At most {MAX_BATCH_ITEMS} ids and queries per batch"}), 400
+    limit = payload.get("limit", 5)
+    if isinstance(limit, bool) or not isinstance(limit, int):
+        return jsonify({"error": "limit must be an integer"}), 400
+    valid_only = payload.get("valid_only", True)
+    if not isinstance(valid_only, bool):
+        return jsonify({"error": "valid_only must be a boolean"}), 400
+
+    lang = "fr" if payload.get("lang", "fr") == "fr" else "en"
+    limit = max(min(limit, 50), 0)
+    databases = payload.get("databases") or ""
+    if not isinstance(databases, str):
+        databases = ",".join(map(str, databases))
+    searcher = _searcher(_parse_databases(databases))
+
+    factors = {}
+    for factor_id in ids:
+        factor = _get_by_id(str(factor_id).strip())
+        factors[str(factor_id)] = _serialize_factor(factor) if factor else None
+
+    normalized = [" ".join(str(q).split()).lower() for q in queries]
+    searchable = [q for q in normalized if len(q) >= 2]
+    hits = dict(zip(searchable, searcher.search_many(
+        searchable, language=lang, max_results=limit, valid_only=valid_only
+    )))
+
+    return jsonify({
+        "factors": factors,
+        "queries": [
+            {"q": query, "results": _serialize_hits(hits.get(q, []))}
+            for query, q in zip(queries, normalized)
+        ],
+    })
+
+
+@bp.route("/categories")
+def categories():
+    """
+    GET /api/v1/factors/categories?path=<A > B>
+
+    Returns a node of the ADEME category tree (the root when path is empty)
+    with its direct children and factor counts, for drill-down navigation.
+    """
+    path = request.args.get("path", "")
+    tree = get_loader().get_category_tree()
+    node = tree.node(path) if tree else None
+    if node is None:
+        return jsonify({"error": "Category not found"}), 404
+
+    return jsonify({
+        **node.to_dict(),
+        "children": [child.to_dict() for child in node.children.values()],
+    })
+
+
+@bp.route("/stats")
+def stats():
+    """
+    GET /api/v1/factors/stats
+
+    Returns the search result cache counters (size, hits, misses, hit ratio)
+    and the current loader version.
+    """
+    return jsonify({
+        "loader_version": get_loader_version(),
+        "search_cache": _search_cache.stats(),
+    })
+
+
+@bp.route("/health")
+def health():
+    """
+    GET /api/v1/factors/health
+
+    Reports whether the ADEME factor loader has finished warming up.
+    Returns 200 once ready, 503 while loading or after a failed load.
+    """
+    status = loader_status()
+    return jsonify(status), 200 if status["ready"] else 503
 
 
 @bp.route("/<factor_id>")
@@ -61,14 +249,26 @@ def get_factor(factor_id: str):
     """
     GET /api/v1/factors/<id>
 
-    Returns a single factor by ADEME ID.
+    Returns a single factor by ADEME ID (or "<database>:<id>" for other
+    databases).
     """
-    loader = get_loader()
-    factor = loader.get_by_id(factor_id)
+    factor = _get_by_id(factor_id)
     if not factor:
         return jsonify({"error": "Factor not found"}), 404
 
-    return jsonify({
+    return jsonify(_serialize_factor(factor))
+
+
+def _get_by_id(factor_id: str):
+    """ADEME factors from the loader; "<database>:<id>" factors from the registry."""
+    if ID_SEPARATOR in factor_id:
+        return get_registry().get_by_id(factor_id)
+    return get_loader().get_by_id(factor_id)
+
+
+def _serialize_factor(factor) -> dict:
+    """Full JSON dict for a single factor."""
+    return {
         "id": factor.id,
         "name_fr": factor.name_fr,
         "name_en": factor.name_en,
@@ -88,4 +288,4 @@ def get_factor(factor_id: str):
         "other_ghg": factor.other_ghg,
         "tags_fr": factor.tags_fr,
         "comment_fr": factor.comment_fr,
-    })
+    }
@@ -0,0 +1,82 @@
+"""
+API v1 — Background Jobs
+Status polling and file downloads for work queued on the job queue
+(bulk imports, report exports, recalculations).
+"""
+
+import os
+
+from flask import Blueprint, current_app, jsonify, request, send_file
+from flask_login import current_user, login_required
+
+from app.extensions import db
+from app.models.background_job import BackgroundJob, JobStatus
+from app.security.permissions import PermissionManager
+
+bp = Blueprint("api_jobs", __name__, url_prefix="/api/v1/jobs")
+
+
+def _visible_job(job_id: int):
+    """The job if the current user started it (or is a platform admin), else None."""
+    job = db.session.get(BackgroundJob, job_id)
+    if job is None:
+        return None
+    if job.created_by_id != current_user.id and not PermissionManager.is_platform_admin(current_user):
+        return None
+    return job
+
+
+@bp.route("")
+@login_required
+def list_jobs():
+    """
+    GET /api/v1/jobs?kind=<kind>&limit=20
+
+    Returns the current user's most recent jobs, newest first.
+    """
+    limit = max(min(request.args.get("limit", 20, type=int), 100), 1)
+    query = BackgroundJob.query.filter_by(created_by_id=current_user.id)
+    if request.args.get("kind"):
+        query = query.filter_by(kind=request.args["kind"])
+    jobs = query.order_by(BackgroundJob.id.desc()).limit(limit).all()
+    return jsonify([job.to_dict() for job in jobs])
+
+
+@bp.route("/<int:job_id>")
+@login_required
+def get_job(job_id: int):
+    """
+    GET /api/v1/jobs/<id>
+
+    Returns the job's status (queued, running, succeeded, failed), progress
+    (0-100) and, once finished, its result or error.
+    """
+    job = _visible_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@bp.route("/<int:job_id>/download")
+@login_required
+def download(job_id: int):
+    """
+    GET /api/v1/jobs/<id>/download
+
+    Sends the file produced by a succeeded job (e.g. a report export).
+    """
+    job = _visible_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job.status != JobStatus.SUCCEEDED or not (job.result or {}).get("file"):
+        return jsonify({"error": "Job has no file to download"}), 409
+
+    path = os.path.join(current_app.config["JOB_FILES_DIR"], os.path.basename(job.result["file"]))
+    if not os.path.exists(path):
+        return jsonify({"error": "File no longer available"}), 410
+    return send_file(
+        path,
+        as_attachment=True,
+        download_name=job.result.get("filename") or os.path.basename(path),
+        mimetype=job.result.get("mimetype"),
+    )
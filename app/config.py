@@ -35,6 +35,32 @@ class Config:
     # Application settings
     DEBUG = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
 
+    # Load the ADEME Base Carbone on a background thread at startup
+    FACTOR_WARMUP = os.environ.get('FACTOR_WARMUP', 'True').lower() == 'true'
+    # Seconds between checks of the CSV for changes (0 disables hot-reload)
+    FACTOR_RELOAD_INTERVAL = int(os.environ.get('FACTOR_RELOAD_INTERVAL', 60))
+
+    # Background job queue: runner threads per process (0 = none, jobs wait
+    # for another process), idle poll interval, and where job files are kept
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+    JOB_FILES_DIR = os.environ.get('JOB_FILES_DIR') or str(basedir / 'instance' / 'jobs')
+    # Run jobs synchronously inside enqueue() (tests)
+    JOB_INLINE = False
+    # Start the runner and maintenance threads (periodic jobs) with the app,
+    # not only from the gunicorn worker hook or the first enqueue()
+    JOB_AUTOSTART = os.environ.get('JOB_AUTOSTART', 'True').lower() == 'true'
+    # Seconds between heartbeats of running jobs; a RUNNING job without one
+    # for JOB_STALE_AFTER seconds is failed. Job files (exports, uploads) are
+    # deleted after JOB_FILES_RETENTION seconds
+    JOB_HEARTBEAT_INTERVAL = float(os.environ.get('JOB_HEARTBEAT_INTERVAL', 30))
+    JOB_STALE_AFTER = float(os.environ.get('JOB_STALE_AFTER', 300))
+    JOB_FILES_RETENTION = float(os.environ.get('JOB_FILES_RETENTION', 7 * 24 * 3600))
+    # Seconds between refreshes of the platform-wide rollup tables
+    PLATFORM_ROLLUP_INTERVAL = float(os.environ.get('PLATFORM_ROLLUP_INTERVAL', 300))
+    # Periodic jobs: kind -> config key of their interval in seconds (0 disables)
+    JOB_SCHEDULE = {'refresh_platform_rollups': 'PLATFORM_ROLLUP_INTERVAL'}
+
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -50,6 +76,10 @@ class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    FACTOR_WARMUP = False
+    FACTOR_RELOAD_INTERVAL = 0
+    JOB_INLINE = True
+    JOB_AUTOSTART = False
 
 
 config = {
@@ -584,8 +584,64 @@ def global_settings():
             db.session.add(SystemSetting(key=key, value=default_val, description=desc))
     db.session.commit()
 
+    from app.services.emission_factor_loader import loader_status
+    from app.models.background_job import BackgroundJob
+
     settings = SystemSetting.query.order_by(SystemSetting.key).all()
-    return render_template('pages/dashboard/admin/settings.html', settings=settings)
+    recalculation = (BackgroundJob.query.filter_by(kind='recalculate_emissions')
+                     .order_by(BackgroundJob.id.desc()).first())
+    return render_template(
+        'pages/dashboard/admin/settings.html',
+        settings=settings,
+        factor_status=loader_status(),
+        recalculation=recalculation,
+    )
+
+
+@bp.route('/factors/reload', methods=['POST'])
+@login_required
+def reload_emission_factors():
+    """Rebuild the ADEME factor indexes in the background, in every worker, and swap them in."""
+    if not current_user.is_platform_admin:
+        return redirect(url_for('main.index'))
+
+    from app.services.emission_factor_loader import request_reload, get_loader_version
+    request_reload()
+
+    log = AuditLog(
+        actor_id=current_user.id,
+        action='RELOAD_EMISSION_FACTORS',
+        entity_type='EmissionFactor',
+        details=f'Platform admin triggered an ADEME factor reload (from version {get_loader_version()}).',
+    )
+    db.session.add(log)
+    db.session.commit()
+    flash('Emission factor reload started. Searches keep using the current factors until it completes.', 'success')
+    return redirect(url_for('dashboard_admin.global_settings'))
+
+
+@bp.route('/factors/recalculate', methods=['POST'])
+@login_required
+def recalculate_emissions():
+    """Re-price every non-audited activity against the current ADEME factors."""
+    if not current_user.is_platform_admin:
+        return redirect(url_for('main.index'))
+
+    from app.services.job_queue import enqueue, job_queue
+    from app.models.background_job import BackgroundJob, JobStatus
+    # A recalculation whose worker was killed must not block this one forever
+    job_queue.fail_stale()
+    pending = BackgroundJob.query.filter(
+        BackgroundJob.kind == 'recalculate_emissions',
+        BackgroundJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+    ).first()
+    if pending:
+        flash('An emission recalculation is already in progress.', 'warning')
+        return redirect(url_for('dashboard_admin.global_settings'))
+
+    enqueue('recalculate_emissions', current_user)
+    flash('Emission recalculation queued. Audited activities are left unchanged.', 'success')
+    return redirect(url_for('dashboard_admin.global_settings'))
 
 
 # ─── AI Bot Management ───────────────────────────────────────────────────────
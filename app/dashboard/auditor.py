@@ -10,6 +10,9 @@ from app.models.notification import Notification, NotificationType
 from app.models.organization import Organization
 from app.models.auditor_contract import AuditorContract, ContractStatus, AuditorType
 from app.models.auditor_point_log import AuditorPointLog
+from app.emissions.rollup import RollupChanges, record_change, rollup_state
+from app.dashboard.services import activity_status_counts
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 
 bp = Blueprint(
@@ -92,7 +95,7 @@ def auditor_index():
     # All contracts for this auditor
     all_contracts = AuditorContract.query.filter_by(
         auditor_id=current_user.id
-    ).order_by(AuditorContract.created_at.desc()).all()
+    ).options(joinedload(AuditorContract.organization)).order_by(AuditorContract.created_at.desc()).all()
 
     pending_contracts = [c for c in all_contracts if c.status == ContractStatus.PENDING]
     active_contracts  = [c for c in all_contracts if c.status in (ContractStatus.TRIAL, ContractStatus.ACTIVE)]
@@ -124,23 +127,51 @@ def auditor_index():
     primary_orgs    = []   # auditor is PRIMARY → shows activity review queue
     collateral_orgs = []   # auditor is COLLATERAL → shows countersign queue + backup review queue
 
+    # Everything the per-org cards need, loaded for all orgs at once
+    org_ids = [c.organization_id for c in active_contracts]
+    status_counts = activity_status_counts(org_ids)
+
+    # First org admin of each org, for message routing
+    org_admin_users = {}
+    for admin in (User.query
+                  .filter(User.organization_id.in_(org_ids), User.role == UserRole.ORG_ADMIN)
+                  .order_by(User.id)):
+        org_admin_users.setdefault(admin.organization_id, admin)
+
+    reports_by_org = {}
+    for report in Report.query.filter(
+        Report.organization_id.in_(org_ids),
+        Report.status.in_([
+            ReportStatus.PENDING_COLLATERAL_REVIEW,
+            ReportStatus.PENDING_AUDIT,
+            ReportStatus.AUDITED,
+            ReportStatus.NOTARIZED
+        ])
+    ).order_by(Report.id):
+        reports_by_org.setdefault(report.organization_id, []).append(report)
+
+    # Active primary contracts of the orgs this auditor countersigns for
+    collateral_org_ids = [c.organization_id for c in active_contracts
+                          if c.auditor_type != AuditorType.PRIMARY]
+    primary_contracts = {}
+    for primary in AuditorContract.query.filter(
+        AuditorContract.organization_id.in_(collateral_org_ids),
+        AuditorContract.auditor_type == AuditorType.PRIMARY,
+        AuditorContract.status.in_([ContractStatus.TRIAL, ContractStatus.ACTIVE])
+    ).order_by(AuditorContract.id):
+        primary_contracts.setdefault(primary.organization_id, primary)
+
     for contract in active_contracts:
         org = contract.organization
+        org_admin_user = org_admin_users.get(org.id)
+        reports = reports_by_org.get(org.id, [])
 
-        # Pre-fetch the org admin user for message routing
-        org_admin_user = User.query.filter_by(
-            organization_id=org.id, role=UserRole.ORG_ADMIN
-        ).first()
-
-        base = EmissionActivity.query.filter_by(organization_id=org.id)
+        counts = status_counts[org.id]
         kpis = {
-            'pending_review':  base.filter_by(status=ActivityStatus.SUBMITTED).count(),
-            'proof_requested': base.filter(
-                EmissionActivity.proof_requested == True,
-                EmissionActivity.status == ActivityStatus.SUBMITTED
-            ).count(),
-            'validated': base.filter_by(status=ActivityStatus.VALIDATED).count(),
-            'rejected':  base.filter_by(status=ActivityStatus.REJECTED).count(),
+            'pending_review':  counts[ActivityStatus.SUBMITTED.value],
+            'proof_requested': counts['proof_requested'],
+            'validated': counts[ActivityStatus.VALIDATED.value],
+            'rejected':  counts[ActivityStatus.REJECTED.value],
         }
 
         if contract.auditor_type == AuditorType.PRIMARY:
@@ -149,34 +180,19 @@ def auditor_index():
                 'org': org,
                 'org_admin_user': org_admin_user,
                 'kpis': kpis,
-                'pending_reports': Report.query.filter_by(
-                    organization_id=org.id, status=ReportStatus.PENDING_AUDIT
-                ).all(),
-                'completed_reports': Report.query.filter(
-                    Report.organization_id == org.id,
-                    Report.status.in_([
-                        ReportStatus.PENDING_COLLATERAL_REVIEW, 
-                        ReportStatus.PENDING_AUDIT, 
-                        ReportStatus.AUDITED, 
-                        ReportStatus.NOTARIZED
-                    ])
-                ).count(),
+                'pending_reports': [r for r in reports if r.status == ReportStatus.PENDING_AUDIT],
+                'completed_reports': len(reports),
             })
         else:  # COLLATERAL
             # Check if primary auditor contract exists and is active/trial
-            primary_contract = AuditorContract.query.filter(
-                AuditorContract.organization_id == org.id,
-                AuditorContract.auditor_type == AuditorType.PRIMARY,
-                AuditorContract.status.in_([ContractStatus.TRIAL, ContractStatus.ACTIVE])
-            ).first()
+            primary_contract = primary_contracts.get(org.id)
 
             # Collateral can review queue if no primary is active (stepped-up scenario)
             primary_defaulted = primary_contract is None
 
-            pending_countersign = Report.query.filter_by(
-                organization_id=org.id,
-                status=ReportStatus.PENDING_COLLATERAL_REVIEW
-            ).all()
+            pending_countersign = [
+                r for r in reports if r.status == ReportStatus.PENDING_COLLATERAL_REVIEW
+            ]
 
             collateral_orgs.append({
                 'contract': contract,
@@ -474,11 +490,7 @@ def review_queue(org_id):
         .paginate(page=page, per_page=10, error_out=False)
     )
 
-    counts = {}
-    for s in ActivityStatus:
-        counts[s.value] = EmissionActivity.query.filter_by(
-            organization_id=org_id, status=s
-        ).count()
+    counts = activity_status_counts([org_id])[org_id]
 
     # Active contract for this org
     contract = AuditorContract.query.filter(
@@ -538,7 +550,9 @@ def approve_emission(id):
     _org_for_auditor(activity.organization_id)
 
     note = request.form.get('auditor_notes', '').strip()
+    before = rollup_state(activity)
     activity.status = ActivityStatus.VALIDATED
+    record_change(before, activity)
     activity.auditor_notes = note or None
     activity.proof_requested = False
     activity.audited_by_id = current_user.id
@@ -572,7 +586,9 @@ def reject_emission(id):
         flash('Please provide a rejection reason.', 'error')
         return redirect(url_for('dashboard_auditor.emission_detail', id=id))
 
+    before = rollup_state(activity)
     activity.status = ActivityStatus.REJECTED
+    record_change(before, activity)
     activity.rejection_reason = reason
     activity.auditor_notes = reason
     activity.proof_requested = False
@@ -732,8 +748,12 @@ def finalize_audit(org_id):
         )
         db.session.add(report)
 
+        rollups = RollupChanges()
         for a in validated_activities:
+            before = rollup_state(a)
             a.status = ActivityStatus.AUDITED
+            rollups.change(before, rollup_state(a))
+        rollups.apply()
 
         action_label = (
             'AUDIT_FINALIZED_PENDING_COLLATERAL'
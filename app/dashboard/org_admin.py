@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from flask_login import login_required, current_user
 from app.extensions import db
 from app.models.emission_activity import EmissionActivity, ActivityStatus
@@ -6,6 +6,8 @@ from app.models.user import User, UserRole
 from app.security.permissions import PermissionManager
 from app.models.audit_log import AuditLog
 from app.models.report import Report
+from app.emissions.rollup import record_change, rollup_state
+from app.dashboard.services import organization_kpis
 
 bp = Blueprint(
     'dashboard_org_admin',
@@ -38,67 +40,37 @@ def org_admin_index():
     # Organizational Data
     org_id = current_user.organization_id
     
-    all_activities = EmissionActivity.query.filter_by(organization_id=org_id).order_by(EmissionActivity.created_at.desc()).all()
-    users = User.query.filter_by(organization_id=org_id).all()
-    
     recent_page = request.args.get('recent_page', 1, type=int)
     recent_activities_paginated = EmissionActivity.query.filter_by(organization_id=org_id).order_by(EmissionActivity.created_at.desc()).paginate(page=recent_page, per_page=5, error_out=False)
 
     pending_page = request.args.get('pending_page', 1, type=int)
     pending_emissions_paginated = EmissionActivity.query.filter_by(organization_id=org_id, status=ActivityStatus.SUBMITTED).order_by(EmissionActivity.created_at.desc()).paginate(page=pending_page, per_page=5, error_out=False)
-    
-    from app.models.emission_activity import EmissionScope
-
-    # ── Activity pools ────────────────────────────────────────────────────────
-    # Chart shows SUBMITTED + VALIDATED so it updates with every new submission
-    active_statuses = {ActivityStatus.SUBMITTED, ActivityStatus.VALIDATED}
-    active_activities = [
-        a for a in all_activities if a.status in active_statuses and a.co2e_result
-    ]
-    validated_activities = [
-        a for a in all_activities if a.status == ActivityStatus.VALIDATED and a.co2e_result
-    ]
-
-    def scope_t(scope_enum, pool):
-        return sum(a.co2e_result for a in pool if a.scope == scope_enum) / 1000
-
-    # Live scope totals in tCO2e (drives scope_chart bars)
-    total_t  = sum(a.co2e_result for a in active_activities) / 1000
-    scope1_t = scope_t(EmissionScope.SCOPE_1, active_activities)
-    scope2_t = scope_t(EmissionScope.SCOPE_2, active_activities)
-    scope3_t = scope_t(EmissionScope.SCOPE_3, active_activities)
 
-    # Validated-only subtotals (for KPI sub-labels)
-    val_total_t  = sum(a.co2e_result for a in validated_activities) / 1000
-    val_scope1_t = scope_t(EmissionScope.SCOPE_1, validated_activities)
-    val_scope2_t = scope_t(EmissionScope.SCOPE_2, validated_activities)
-    val_scope3_t = scope_t(EmissionScope.SCOPE_3, validated_activities)
+    # ── Every KPI in one query over the rollup table ─────────────────────────
+    totals = organization_kpis(org_id)
 
-    # Status counts
-    pending_validation = sum(1 for a in all_activities if a.status == ActivityStatus.SUBMITTED)
-    validated_count    = sum(1 for a in all_activities if a.status == ActivityStatus.VALIDATED)
-    draft_count        = sum(1 for a in all_activities if a.status == ActivityStatus.DRAFT)
-    rejected_count     = sum(1 for a in all_activities if a.status == ActivityStatus.REJECTED)
+    pending_validation = totals.submitted_count
+    validated_count    = totals.validated_count
+    draft_count        = totals.draft_count
+    rejected_count     = totals.rejected_count
+    user_count         = totals.user_count
 
     # Real completeness: % of non-draft activities that have an ADEME factor
     non_draft_total = pending_validation + validated_count + rejected_count
-    with_factor = sum(
-        1 for a in all_activities
-        if a.status in active_statuses and getattr(a, 'ademe_factor_id', None)
-    )
+    with_factor = totals.with_factor
     completeness = int(with_factor / non_draft_total * 100) if non_draft_total else 0
 
     kpis = {
         # Scope totals in tCO2e — SUBMITTED + VALIDATED (drives chart)
-        'total_emissions': f"{total_t:,.2f}",
-        'scope1': f"{scope1_t:,.2f}",
-        'scope2': f"{scope2_t:,.2f}",
-        'scope3': f"{scope3_t:,.2f}",
+        'total_emissions': f"{totals.total_kg / 1000:,.2f}",
+        'scope1': f"{totals.scope1_kg / 1000:,.2f}",
+        'scope2': f"{totals.scope2_kg / 1000:,.2f}",
+        'scope3': f"{totals.scope3_kg / 1000:,.2f}",
         # Validated-only sub-totals
-        'val_total': f"{val_total_t:,.2f}",
-        'val_scope1': f"{val_scope1_t:,.2f}",
-        'val_scope2': f"{val_scope2_t:,.2f}",
-        'val_scope3': f"{val_scope3_t:,.2f}",
+        'val_total': f"{totals.val_total_kg / 1000:,.2f}",
+        'val_scope1': f"{totals.val_scope1_kg / 1000:,.2f}",
+        'val_scope2': f"{totals.val_scope2_kg / 1000:,.2f}",
+        'val_scope3': f"{totals.val_scope3_kg / 1000:,.2f}",
         # Trend placeholders
         'total_emissions_change': "+0.0%",
         'scope1_change': "+0.0%",
@@ -109,9 +81,9 @@ def org_admin_index():
         'validated_count': validated_count,
         'draft_count': draft_count,
         'rejected_count': rejected_count,
-        'user_count': len(users),
+        'user_count': user_count,
         'completeness': f"{completeness}%",
-        'activity_count': len(all_activities),
+        'activity_count': totals.activity_count,
     }
 
     alerts = [
@@ -120,7 +92,7 @@ def org_admin_index():
          "subtitle": "Awaiting your validation",
          "url": "/dashboard/org-admin/emissions/pending"},
         {"type": "group", "color": "green",
-         "title": f"{len(users)} active user{'s' if len(users) != 1 else ''}",
+         "title": f"{user_count} active user{'s' if user_count != 1 else ''}",
          "subtitle": "In your organization",
          "url": "/dashboard/org-admin/users"},
         {"type": "verified", "color": "emerald",
@@ -139,7 +111,6 @@ def org_admin_index():
         organization=current_user.organization,
         recent_activities=recent_activities_paginated,
         pending_emissions=pending_emissions_paginated,
-        users=users,
         kpis=kpis,
         alerts=alerts
     )
@@ -154,7 +125,9 @@ def approve_emission(id):
         flash('Permission denied.', 'error')
         return redirect(url_for('dashboard_org_admin.org_admin_index'))
         
+    before = rollup_state(activity)
     activity.status = ActivityStatus.VALIDATED
+    record_change(before, activity)
     
     log = AuditLog(
         actor_id=current_user.id,
@@ -472,7 +445,7 @@ def reports():
 def download_report(report_id, format):
     """Download a generated report in the specified format."""
     from flask import send_file
-    from app.services.report_generator import PDFReportGenerator, DocxReportGenerator, ExcelReportGenerator
+    from app.services.report_generator import REPORT_FORMATS
 
     if not PermissionManager.is_org_admin(current_user, current_user.organization_id):
         flash('Access denied.', 'error')
@@ -483,36 +456,42 @@ def download_report(report_id, format):
         flash('Access denied.', 'error')
         return redirect(url_for('dashboard_org_admin.reports'))
 
-    try:
-        if format == 'pdf':
-            generator = PDFReportGenerator()
-            buffer = generator.generate(report_id)
-            mimetype = 'application/pdf'
-            filename = f"GreenLedger_Report_{report.period_label or report.id}.pdf"
-        elif format == 'docx':
-            generator = DocxReportGenerator()
-            buffer = generator.generate(report_id)
-            mimetype = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            filename = f"GreenLedger_Report_{report.period_label or report.id}.docx"
-        elif format == 'xlsx':
-            generator = ExcelReportGenerator()
-            buffer = generator.generate(report_id)
-            mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            filename = f"GreenLedger_Report_{report.period_label or report.id}.xlsx"
-        else:
-            flash(f"Unsupported format: {format}", 'error')
-            return redirect(url_for('dashboard_org_admin.reports'))
+    if format not in REPORT_FORMATS:
+        flash(f"Unsupported format: {format}", 'error')
+        return redirect(url_for('dashboard_org_admin.reports'))
 
+    try:
+        generator_class, mimetype = REPORT_FORMATS[format]
+        buffer = generator_class().generate(report_id)
         return send_file(
             buffer,
             as_attachment=True,
-            download_name=filename,
+            download_name=f"GreenLedger_Report_{report.period_label or report.id}.{format}",
             mimetype=mimetype
         )
     except Exception as e:
         flash(f'Error generating report: {str(e)}', 'error')
         return redirect(url_for('dashboard_org_admin.reports'))
 
+@bp.route('/reports/<int:report_id>/export/<format>', methods=['POST'])
+@login_required
+def export_report(report_id, format):
+    """Queue a report export; the client polls the job and downloads the file."""
+    from app.services.job_queue import enqueue
+    from app.services.report_generator import REPORT_FORMATS
+
+    if not PermissionManager.is_org_admin(current_user, current_user.organization_id):
+        return jsonify({'error': 'Access denied'}), 403
+
+    report = Report.query.get_or_404(report_id)
+    if report.organization_id != current_user.organization_id:
+        return jsonify({'error': 'Access denied'}), 403
+    if format not in REPORT_FORMATS:
+        return jsonify({'error': f'Unsupported format: {format}'}), 400
+
+    job = enqueue('export_report', current_user, report_id=report.id, format=format)
+    return jsonify(job.to_dict()), 202
+
 @bp.route('/reports/download_latest/<format>')
 @login_required
 def download_latest_report(format):
@@ -0,0 +1,114 @@
+"""
+Dashboard KPIs
+Computes the headline numbers of the org-admin and worker dashboards in a
+single SQL query each: conditional sums over the organization's
+EmissionRollup rows give every scope total, status count and completeness
+figure at once, instead of loading activities and filtering them in Python.
+Auditor pages get their per-organization status counts from one GROUP BY
+across all of their organizations.
+"""
+
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import case, func, select
+
+from app.emissions.rollup import ensure_rollups
+from app.extensions import db
+from app.models.emission_activity import ActivityStatus, EmissionActivity, EmissionScope
+from app.models.emission_rollup import EmissionRollup
+from app.models.user import User
+
+
+# Statuses pooled in the scope chart, so it moves with every new submission
+ACTIVE_STATUSES = (ActivityStatus.SUBMITTED, ActivityStatus.VALIDATED)
+SCOPES = {'scope1': EmissionScope.SCOPE_1, 'scope2': EmissionScope.SCOPE_2,
+          'scope3': EmissionScope.SCOPE_3}
+
+
+def _conditional_sum(column, *conditions):
+    return func.coalesce(func.sum(case((db.and_(*conditions), column), else_=0)), 0)
+
+
+def organization_kpis(organization_id: Optional[int]):
+    """
+    Dashboard KPIs of an organization, from one query on its rollup rows
+
+    Returns a row with:
+        total_kg, scope1_kg..scope3_kg: SUBMITTED + VALIDATED emissions
+        val_total_kg, val_scope1_kg..val_scope3_kg: VALIDATED emissions only
+        draft_count, submitted_count, validated_count, rejected_count,
+        audited_count, activity_count: activity counts
+        with_factor: SUBMITTED + VALIDATED activities with an ADEME factor
+        user_count: members of the organization
+    """
+    ensure_rollups()
+    rollup = EmissionRollup
+    active = rollup.status.in_(ACTIVE_STATUSES)
+    validated = rollup.status == ActivityStatus.VALIDATED
+
+    columns = [
+        _conditional_sum(rollup.co2e_kg, active).label('total_kg'),
+        _conditional_sum(rollup.co2e_kg, validated).label('val_total_kg'),
+    ]
+    for name, scope in SCOPES.items():
+        columns += [
+            _conditional_sum(rollup.co2e_kg, active, rollup.scope == scope).label(f'{name}_kg'),
+            _conditional_sum(rollup.co2e_kg, validated, rollup.scope == scope).label(f'val_{name}_kg'),
+        ]
+    columns += [
+        _conditional_sum(rollup.activity_count, rollup.status == status).label(f'{status.value}_count')
+        for status in ActivityStatus
+    ]
+    columns += [
+        func.coalesce(func.sum(rollup.activity_count), 0).label('activity_count'),
+        _conditional_sum(rollup.factor_count, active).label('with_factor'),
+        select(func.count(User.id))
+        .where(User.organization_id == organization_id)
+        .scalar_subquery()
+        .label('user_count'),
+    ]
+    return db.session.execute(
+        select(*columns).where(rollup.organization_id == organization_id)
+    ).one()
+
+
+def user_status_counts(user_id: int) -> Dict[ActivityStatus, int]:
+    """Number of activities a user created, per status"""
+    return dict(
+        db.session.query(EmissionActivity.status, func.count(EmissionActivity.id))
+        .filter(EmissionActivity.created_by_id == user_id)
+        .group_by(EmissionActivity.status)
+        .all()
+    )
+
+
+def activity_status_counts(organization_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+    """
+    Activity counts per status for several organizations, in one GROUP BY
+
+    Returns {organization_id: {status value: count, ..., 'proof_requested': n}}
+    with every ActivityStatus present (0 when empty); proof_requested counts
+    SUBMITTED activities an auditor asked more documents for.
+    """
+    organization_ids = list(set(organization_ids))
+    counts = {
+        org_id: {**{status.value: 0 for status in ActivityStatus}, 'proof_requested': 0}
+        for org_id in organization_ids
+    }
+    if not organization_ids:
+        return counts
+
+    activity = EmissionActivity
+    proof_requested = _conditional_sum(
+        1, activity.proof_requested.is_(True), activity.status == ActivityStatus.SUBMITTED
+    )
+    rows = (
+        db.session.query(activity.organization_id, activity.status,
+                         func.count(activity.id), proof_requested)
+        .filter(activity.organization_id.in_(organization_ids))
+        .group_by(activity.organization_id, activity.status)
+    )
+    for org_id, status, count, proof in rows:
+        counts[org_id][status.value] = count
+        counts[org_id]['proof_requested'] += proof
+    return counts
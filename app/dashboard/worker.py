@@ -8,6 +8,7 @@ from app.models.emission_factor import EmissionFactor
 from app.models.document import Document
 from app.models.audit_log import AuditLog
 from app.security.permissions import PermissionManager
+from app.dashboard.services import organization_kpis, user_status_counts
 from app.security.encryption import EncryptionManager
 from datetime import datetime
 import json
@@ -34,47 +35,27 @@ def worker_index():
     """
     Worker dashboard — shows company-wide scope KPIs (read-only) and the worker's own activities.
     """
-    # Worker's own activities (all, for stats)
-    all_my_activities = (EmissionActivity.query
-                     .filter_by(created_by_id=current_user.id)
-                     .order_by(EmissionActivity.created_at.desc())
-                     .all())
-
     recent_page = request.args.get('recent_page', 1, type=int)
     my_activities_paginated = (EmissionActivity.query
                      .filter_by(created_by_id=current_user.id)
                      .order_by(EmissionActivity.created_at.desc())
                      .paginate(page=recent_page, per_page=5, error_out=False))
 
-    # Company-wide activities (same org) for the scope overview
-    org_id = current_user.organization_id
-    org_activities = (EmissionActivity.query
-                      .filter_by(organization_id=org_id)
-                      .all()) if org_id else []
-
-    # Pool for chart: SUBMITTED + VALIDATED (same as admin)
-    active_statuses = {ActivityStatus.SUBMITTED, ActivityStatus.VALIDATED}
-    active_org = [a for a in org_activities if a.status in active_statuses and a.co2e_result]
-
-    def scope_t(scope_enum, pool):
-        return sum(a.co2e_result for a in pool if a.scope == scope_enum) / 1000
-
-    total_t  = sum(a.co2e_result for a in active_org) / 1000
-    scope1_t = scope_t(EmissionScope.SCOPE_1, active_org)
-    scope2_t = scope_t(EmissionScope.SCOPE_2, active_org)
-    scope3_t = scope_t(EmissionScope.SCOPE_3, active_org)
+    # Company-wide scope overview (same org), SUBMITTED + VALIDATED like the admin chart
+    totals = organization_kpis(current_user.organization_id)
 
     # Worker-specific counts
-    my_draft     = sum(1 for a in all_my_activities if a.status == ActivityStatus.DRAFT)
-    my_submitted = sum(1 for a in all_my_activities if a.status == ActivityStatus.SUBMITTED)
-    my_validated = sum(1 for a in all_my_activities if a.status == ActivityStatus.VALIDATED)
-    my_rejected  = sum(1 for a in all_my_activities if a.status == ActivityStatus.REJECTED)
+    my_counts = user_status_counts(current_user.id)
+    my_draft     = my_counts.get(ActivityStatus.DRAFT, 0)
+    my_submitted = my_counts.get(ActivityStatus.SUBMITTED, 0)
+    my_validated = my_counts.get(ActivityStatus.VALIDATED, 0)
+    my_rejected  = my_counts.get(ActivityStatus.REJECTED, 0)
 
     kpis = {
-        'total_emissions':        f"{total_t:,.2f}",
-        'scope1':                 f"{scope1_t:,.2f}",
-        'scope2':                 f"{scope2_t:,.2f}",
-        'scope3':                 f"{scope3_t:,.2f}",
+        'total_emissions':        f"{totals.total_kg / 1000:,.2f}",
+        'scope1':                 f"{totals.scope1_kg / 1000:,.2f}",
+        'scope2':                 f"{totals.scope2_kg / 1000:,.2f}",
+        'scope3':                 f"{totals.scope3_kg / 1000:,.2f}",
         'total_emissions_change': "+0.0%",
         'scope1_change':          "+0.0%",
         'scope2_change':          "+0.0%",
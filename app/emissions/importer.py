@@ -0,0 +1,342 @@
+"""
+Bulk Activity Import
+Imports EmissionActivity rows from CSV or Excel files. Rows are read one at
+a time (csv module / openpyxl read-only mode), validated with the rules of
+CarbonCalculator.validate_activity_data, priced per chunk with factors
+resolved in one batch, and inserted with bulk_insert_mappings, one
+transaction and one audit entry per chunk.
+"""
+
+import csv
+import io
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.extensions import db
+from app.emissions.calculators import calculate_co2e_bulk
+from app.emissions.rollup import RollupChanges, rollup_state
+from app.services.analytics_cache import mark_changed
+from app.models.audit_log import AuditLog
+from app.models.emission_activity import ActivityStatus, EmissionActivity, EmissionScope
+from app.models.emission_factor_database import ActivityType
+from app.services.emission_factor_loader import get_loader
+
+
+# Rows validated, priced and inserted per transaction
+DEFAULT_CHUNK_SIZE = 2000
+
+# Row errors kept in the report (the count is always exact)
+MAX_REPORTED_ERRORS = 100
+
+REQUIRED_COLUMNS = ('scope', 'category', 'period_start', 'period_end', 'ademe_factor_id')
+
+# Alternative header spellings, after lower-casing and replacing spaces with "_"
+COLUMN_ALIASES = {
+    'activity': 'activity_type',
+    'type': 'activity_type',
+    'unit': 'quantity_unit',
+    'value': 'quantity',
+    'factor_id': 'ademe_factor_id',
+    'start': 'period_start',
+    'end': 'period_end',
+    'mode': 'transport_mode',
+}
+
+
+@dataclass
+class ImportReport:
+    """Outcome of an import: counts plus the first MAX_REPORTED_ERRORS row errors"""
+
+    rows: int = 0
+    imported: int = 0
+    rejected: int = 0
+    chunks: int = 0
+    errors: List[Dict] = field(default_factory=list)
+
+    def add_error(self, line: int, message: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def read_rows(stream, filename: str) -> Iterator[Tuple[int, Dict]]:
+    """
+    Yield (line number, {column: value}) for each non-empty data row
+
+    Raises:
+        ValueError: For an unsupported extension or a missing required column
+    """
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'csv':
+        rows = _csv_rows(stream)
+    elif extension in ('xlsx', 'xlsm'):
+        rows = _xlsx_rows(stream)
+    else:
+        raise ValueError("Unsupported file type: upload a .csv or .xlsx file")
+
+    header = [_column_name(name) for name in next(rows, [])]
+    missing = [name for name in REQUIRED_COLUMNS if name not in header]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    for line, values in enumerate(rows, start=2):
+        if any(value not in (None, '') for value in values):
+            yield line, dict(zip(header, values))
+
+
+def _csv_rows(stream) -> Iterator[List]:
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    sample = text.readline()
+    # French spreadsheets export with ";", everything else with ","
+    delimiter = ';' if sample.count(';') > sample.count(',') else ','
+    yield next(csv.reader([sample], delimiter=delimiter), [])
+    yield from csv.reader(text, delimiter=delimiter)
+
+
+def _xlsx_rows(stream) -> Iterator[Tuple]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _column_name(name) -> str:
+    name = '_'.join(str(name or '').strip().lower().split())
+    return COLUMN_ALIASES.get(name, name)
+
+
+# ---------------------------------------------------------------------------
+# Validation
+# ---------------------------------------------------------------------------
+
+def _number(value, column: str) -> Optional[float]:
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        if isinstance(value, str):
+            value = value.strip().replace('\u00a0', '').replace(' ', '').replace(',', '.')
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{column} must be a valid number")
+
+
+def _date(value, column: str) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value or '').strip()
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(text, '%d/%m/%Y').date()
+    except ValueError:
+        pass
+    raise ValueError(f"{column} must be a date (YYYY-MM-DD or DD/MM/YYYY)")
+
+
+def _scope(value) -> EmissionScope:
+    digits = ''.join(ch for ch in str(value or '') if ch.isdigit())
+    for scope in EmissionScope:
+        if scope.value.endswith(f' {digits}'):
+            return scope
+    raise ValueError("scope must be 1, 2 or 3")
+
+
+def _activity_type(value) -> ActivityType:
+    text = str(value or '').strip().lower()
+    if not text:
+        return ActivityType.SIMPLE
+    try:
+        return ActivityType(text)
+    except ValueError:
+        raise ValueError(f"activity_type must be one of: {', '.join(t.value for t in ActivityType)}")
+
+
+def _text(row: Dict, column: str) -> Optional[str]:
+    value = row.get(column)
+    if value is None:
+        return None
+    return str(value).strip() or None
+
+
+def parse_row(row: Dict) -> Dict:
+    """
+    Validate one row into EmissionActivity column values (before pricing)
+
+    Applies CarbonCalculator.validate_activity_data: transport rows need a
+    positive tonnage, distance and a transport mode; other rows a
+    non-negative quantity.
+
+    Raises:
+        ValueError: Describing the first invalid field
+    """
+    activity_type = _activity_type(row.get('activity_type'))
+    quantity = _number(row.get('quantity'), 'quantity')
+    tonnage = _number(row.get('tonnage'), 'tonnage')
+    distance = _number(row.get('distance'), 'distance')
+    transport_mode = _text(row, 'transport_mode')
+
+    if activity_type == ActivityType.TRANSPORT:
+        if tonnage is None or tonnage <= 0:
+            raise ValueError("Transport activity requires positive tonnage")
+        if distance is None or distance <= 0:
+            raise ValueError("Transport activity requires positive distance")
+        if not transport_mode:
+            raise ValueError("Transport activity requires transport mode")
+    else:
+        if quantity is None:
+            raise ValueError(f"{activity_type.value} activity requires a quantity")
+        if quantity < 0:
+            raise ValueError("Activity value cannot be negative")
+
+    category = _text(row, 'category')
+    if not category:
+        raise ValueError("category is required")
+    factor_id = _text(row, 'ademe_factor_id')
+    if not factor_id:
+        raise ValueError("ademe_factor_id is required")
+
+    period_start = _date(row.get('period_start'), 'period_start')
+    period_end = _date(row.get('period_end'), 'period_end')
+    if period_end < period_start:
+        raise ValueError("period_end is before period_start")
+
+    return {
+        'scope': _scope(row.get('scope')),
+        'category': category[:100],
+        'activity_type': activity_type,
+        'description': _text(row, 'description'),
+        # Stored like the entry form: 0 means "not given"
+        'quantity': quantity or None,
+        'quantity_unit': _text(row, 'quantity_unit'),
+        'period_start': period_start,
+        'period_end': period_end,
+        'tonnage': tonnage or None,
+        'distance': distance or None,
+        'transport_mode': transport_mode,
+        'ademe_factor_id': factor_id,
+        'activity_data': {'value': quantity} if quantity is not None else {},
+    }
+
+
+# ---------------------------------------------------------------------------
+# Import
+# ---------------------------------------------------------------------------
+
+def import_activities(user, stream, filename: str, *, auto_validate: bool = False,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      progress: Optional[Callable[[ImportReport], None]] = None) -> ImportReport:
+    """
+    Import every valid row of a CSV/XLSX file as the user's activities
+
+    Invalid rows (including unknown factor ids) are skipped and reported by
+    line number; valid ones are committed chunk by chunk, so an error in a
+    late chunk keeps the earlier ones. Activities are created as DRAFT, or
+    VALIDATED with auto_validate, like create_activity(). progress is called
+    after every committed chunk.
+
+    Raises:
+        ValueError: If the file type or header is unusable
+    """
+    report = ImportReport()
+    chunk: List[Tuple[int, Dict]] = []
+    for line, row in read_rows(stream, filename):
+        report.rows += 1
+        try:
+            chunk.append((line, parse_row(row)))
+        except ValueError as e:
+            report.add_error(line, str(e))
+        if len(chunk) >= chunk_size:
+            _insert_chunk(user, chunk, report, auto_validate)
+            chunk = []
+            if progress:
+                progress(report)
+    if chunk:
+        _insert_chunk(user, chunk, report, auto_validate)
+    return report
+
+
+def _insert_chunk(user, chunk: List[Tuple[int, Dict]], report: ImportReport, auto_validate: bool):
+    """Resolve factors for a chunk in one pass, price it and insert it"""
+    loader = get_loader()
+    factors = {
+        factor_id: loader.get_by_id(factor_id)
+        for factor_id in {values['ademe_factor_id'] for _, values in chunk}
+    }
+
+    rows = []
+    for line, values in chunk:
+        factor = factors[values['ademe_factor_id']]
+        if factor is None:
+            report.add_error(line, f"Unknown ADEME factor id: {values['ademe_factor_id']}")
+        else:
+            rows.append((values, factor))
+    if not rows:
+        return
+
+    co2e = calculate_co2e_bulk(
+        [values['activity_type'] for values, _ in rows],
+        [values['quantity'] for values, _ in rows],
+        [factor.factor or 0.0 for _, factor in rows],
+        [values['tonnage'] for values, _ in rows],
+        [values['distance'] for values, _ in rows],
+    )
+
+    status = ActivityStatus.VALIDATED if auto_validate else ActivityStatus.DRAFT
+    mappings = [
+        {
+            **values,
+            'organization_id': user.organization_id,
+            'created_by_id': user.id,
+            'status': status,
+            'ademe_factor_name': factor.name_fr,
+            'ademe_factor_value': factor.factor,
+            'ademe_factor_unit': factor.unit_fr,
+            'ademe_factor_source': factor.source,
+            'ademe_factor_category': factor.category,
+            # Same rule as _resolve_factor: no result without a factor value
+            'co2e_result': float(result) if factor.factor else None,
+        }
+        for (values, factor), result in zip(rows, co2e)
+    ]
+
+    try:
+        db.session.bulk_insert_mappings(EmissionActivity, mappings)
+        rollups = RollupChanges()
+        for values in mappings:
+            rollups.add(rollup_state(values))
+        rollups.apply()
+        # bulk_insert_mappings bypasses the flush events the analytics cache listens to
+        mark_changed(db.session, [user.organization_id])
+        db.session.add(AuditLog(
+            actor_id=user.id,
+            organization_id=user.organization_id,
+            action='IMPORT_EMISSIONS',
+            entity_type='EmissionActivity',
+            details=(
+                f"Imported {len(mappings)} {'auto-validated' if auto_validate else 'draft'} "
+                f"activities (lines {chunk[0][0]}–{chunk[-1][0]}), "
+                f"co2e={round(float(co2e.sum()), 4)} kgCO2e"
+            ),
+        ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    report.imported += len(mappings)
+    report.chunks += 1
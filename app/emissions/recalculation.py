@@ -0,0 +1,206 @@
+"""
+Bulk CO2e Recalculation
+Re-prices every not-yet-audited EmissionActivity against the current ADEME
+factors after a new Base Carbone version is loaded. Activity ids are
+streamed in chunks; each chunk's rows are re-read and locked in the writer
+transaction, priced with the vectorised engine and written back with one
+executemany UPDATE and one consolidated audit entry, instead of re-saving
+each activity through update_activity(). Runs as the "recalculate_emissions"
+background job.
+"""
+
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Optional
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+
+from app.extensions import db
+from app.emissions.calculators import calculate_co2e_bulk
+from app.emissions.rollup import RollupChanges, rollup_state
+from app.services.analytics_cache import mark_changed
+from app.models.audit_log import AuditLog
+from app.models.emission_activity import ActivityStatus, EmissionActivity
+from app.services.emission_factor_loader import get_loader, get_loader_version
+
+
+# Activities read, priced and written per chunk
+DEFAULT_CHUNK_SIZE = 1000
+
+
+@dataclass
+class RecalculationProgress:
+    """Running totals of a recalculation, passed to the progress callback"""
+
+    total: int = 0
+    processed: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    missing_factor: int = 0
+    chunks: int = 0
+    factor_version: int = 0
+    done: bool = False
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def recalculate_activities(
+    actor_id: Optional[int] = None,
+    organization_id: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[Callable[[RecalculationProgress], None]] = None,
+) -> RecalculationProgress:
+    """
+    Recompute ademe_factor_value and co2e_result of every activity that is
+    not AUDITED and references an ADEME factor.
+
+    Factor values come from the loader's id index. Activities whose factor
+    no longer exists (or has no value) are left untouched, like the form
+    path does. Each chunk is committed with its audit entry, so an
+    interrupted run keeps the chunks already done and can simply be re-run.
+    Rows are re-read with SELECT ... FOR UPDATE before being priced, so
+    activities audited or edited since the ids were streamed are skipped or
+    priced as they are now, and the rollup deltas match what was written.
+
+    Args:
+        actor_id: User credited in the audit entries (None = system)
+        organization_id: Restrict to one organization
+        chunk_size: Activities per chunk (yield_per batch)
+        progress: Called after every chunk with the running totals
+
+    Returns:
+        The final RecalculationProgress
+    """
+    loader = get_loader()
+    report = RecalculationProgress(factor_version=get_loader_version())
+
+    criteria = [
+        EmissionActivity.status != ActivityStatus.AUDITED,
+        EmissionActivity.ademe_factor_id.isnot(None),
+        EmissionActivity.ademe_factor_id != '',
+    ]
+    if organization_id is not None:
+        criteria.append(EmissionActivity.organization_id == organization_id)
+
+    report.total = db.session.scalar(
+        select(db.func.count(EmissionActivity.id)).where(*criteria)
+    )
+
+    table = EmissionActivity.__table__
+    # The status check keeps rows audited mid-run locked (SQLite has no FOR UPDATE)
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam('activity_id'))
+        .where(table.c.status != ActivityStatus.AUDITED)
+        .values(ademe_factor_value=bindparam('factor_value'), co2e_result=bindparam('co2e'))
+    )
+    ids_query = (select(EmissionActivity.id).where(*criteria)
+                 .order_by(EmissionActivity.id).execution_options(yield_per=chunk_size))
+    rows_query = select(
+        EmissionActivity.id,
+        EmissionActivity.activity_type,
+        EmissionActivity.quantity,
+        EmissionActivity.tonnage,
+        EmissionActivity.distance,
+        EmissionActivity.ademe_factor_id,
+        EmissionActivity.ademe_factor_value,
+        EmissionActivity.co2e_result,
+        # Rollup key columns
+        EmissionActivity.organization_id,
+        EmissionActivity.scope,
+        EmissionActivity.category,
+        EmissionActivity.status,
+        EmissionActivity.period_start,
+    ).where(*criteria).order_by(EmissionActivity.id).with_for_update()
+
+    factor_values: Dict[str, Optional[float]] = {}
+    with _reader() as reader:
+        for id_chunk in reader.execute(ids_query).partitions():
+            chunk = db.session.execute(
+                rows_query.where(EmissionActivity.id.in_([row.id for row in id_chunk]))
+            ).all()
+            report.chunks += 1
+            report.processed += len(id_chunk)
+            if not chunk:
+                # Every activity of the chunk was audited meanwhile
+                db.session.commit()
+                continue
+            ids, types, quantities, tonnages, distances, factor_ids, old_values, old_results, *_ = \
+                zip(*chunk)
+
+            new_values = []
+            for factor_id in factor_ids:
+                if factor_id not in factor_values:
+                    factor = loader.get_by_id(factor_id.strip())
+                    factor_values[factor_id] = factor.factor if factor and factor.factor else None
+                new_values.append(factor_values[factor_id])
+
+            priced = np.array([value is not None for value in new_values])
+            new_values = np.array([value or 0.0 for value in new_values], dtype=np.float64)
+            results = calculate_co2e_bulk(
+                [getattr(t, 'value', t) for t in types], quantities, new_values, tonnages, distances
+            )
+
+            old_values = np.array(old_values, dtype=np.float64)
+            old_results = np.array(old_results, dtype=np.float64)
+            # NaN never equals anything, so a missing snapshot counts as changed
+            changed = priced & ((new_values != old_values) | (results != old_results))
+
+            mappings = [
+                {'activity_id': ids[i], 'factor_value': float(new_values[i]), 'co2e': float(results[i])}
+                for i in np.flatnonzero(changed)
+            ]
+            if mappings:
+                db.session.execute(statement, mappings)
+                rollups = RollupChanges()
+                for i in np.flatnonzero(changed):
+                    row = chunk[i]._mapping
+                    rollups.change(rollup_state(row),
+                                   rollup_state({**row, 'co2e_result': float(results[i])}))
+                rollups.apply()
+                # Core UPDATEs bypass the flush events the analytics cache listens to
+                mark_changed(db.session, {chunk[i].organization_id for i in np.flatnonzero(changed)})
+                delta = float(np.nansum(results[changed] - np.nan_to_num(old_results[changed])))
+                db.session.add(AuditLog(
+                    actor_id=actor_id,
+                    organization_id=organization_id,
+                    action='RECALCULATE_EMISSIONS',
+                    entity_type='EmissionActivity',
+                    details=(
+                        f'Recalculated {len(mappings)} activities (#{ids[0]}–#{ids[-1]}) against '
+                        f'ADEME factors version {report.factor_version}; '
+                        f'net change {delta:+.4f} kgCO2e.'
+                    ),
+                ))
+            # Ends the transaction, releasing the chunk's row locks
+            db.session.commit()
+
+            report.updated += len(mappings)
+            report.missing_factor += int((~priced).sum())
+            report.unchanged += int((priced & ~changed).sum())
+            if progress:
+                progress(report)
+
+    report.done = True
+    if progress:
+        progress(report)
+    return report
+
+
+@contextmanager
+def _reader():
+    """
+    Connection to stream activities from while the session commits chunks
+
+    A server-side cursor ties up its connection (MySQL) or dies with its
+    transaction (PostgreSQL), so it gets a connection of its own. SQLite
+    would block the session's commits behind that reader's lock, but its
+    cursors survive commits on their own connection, so the session's is used.
+    """
+    if db.engine.dialect.name == 'sqlite':
+        yield db.session
+    else:
+        with db.engine.connect() as connection:
+            yield connection
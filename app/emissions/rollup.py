@@ -0,0 +1,412 @@
+"""
+Emission Rollups
+Keeps EmissionRollup rows — per-organization totals by scope, category,
+activity type, status and month — in step with EmissionActivity, so
+dashboards, analytics and reports read a few pre-aggregated rows instead of
+summing the whole activity history in Python. The platform tables — totals
+across all organizations, and breakdowns per organization, industry and
+country — are not touched by writers: every write would update the same few
+rows. The refresh_platform_rollups job recomputes them from the organization
+rollups every PLATFORM_ROLLUP_INTERVAL seconds instead, and readers rebuild
+them when no job runner did.
+
+Writers capture an activity's state before changing it and record the
+change afterwards, in the same transaction as the change itself:
+
+    before = rollup_state(activity)
+    activity.status = ActivityStatus.VALIDATED
+    record_change(before, activity)
+    db.session.commit()
+
+rebuild_rollups() recomputes the rows from scratch (repair after data was
+changed outside these paths). Readers call ensure_rollups() first, which
+backfills once when a database that predates the rollups has activities
+but no rollup rows yet.
+"""
+
+import time
+import weakref
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Mapping, Optional
+
+from flask import current_app
+from sqlalchemy import and_, case, delete, extract, func, insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app.extensions import db
+from app.models.emission_activity import ActivityStatus, EmissionActivity, EmissionScope
+from app.models.emission_factor_database import ActivityType
+from app.models.emission_rollup import (
+    EmissionRollup, PlatformEmissionBreakdown, PlatformEmissionRollup, PlatformRollupVersion
+)
+from app.models.organization import Organization
+
+
+RollupKey = namedtuple(
+    'RollupKey', 'organization_id scope category activity_type status period_month'
+)
+PlatformKey = namedtuple('PlatformKey', 'scope category activity_type status period_month')
+BreakdownKey = namedtuple('BreakdownKey', 'dimension value scope status')
+
+# Measure columns of every rollup table, in delta order
+MEASURES = ('co2e_kg', 'activity_count', 'priced_count', 'factor_count')
+
+# What one activity contributes to its rollup row
+RollupState = namedtuple('RollupState', 'key co2e_kg priced has_factor')
+
+
+def rollup_state(source) -> Optional[RollupState]:
+    """
+    The rollup contribution of an activity, given as an EmissionActivity or
+    a mapping of its column values (bulk insert mappings, Core rows)
+
+    Returns None for an activity that is not complete enough to be counted
+    (e.g. a half-built object without a scope or period).
+    """
+    get = source.get if isinstance(source, Mapping) else lambda name: getattr(source, name, None)
+
+    scope, status, period_start = get('scope'), get('status'), get('period_start')
+    if get('organization_id') is None or scope is None or status is None or period_start is None:
+        return None
+
+    key = RollupKey(
+        organization_id=get('organization_id'),
+        scope=EmissionScope(scope),
+        category=get('category') or '',
+        activity_type=ActivityType(get('activity_type') or ActivityType.SIMPLE),
+        status=ActivityStatus(status),
+        period_month=period_start.replace(day=1),
+    )
+    co2e = get('co2e_result')
+    return RollupState(key, co2e or 0.0, co2e is not None, bool(get('ademe_factor_id')))
+
+
+class RollupChanges:
+    """
+    Net rollup deltas of a batch of activity changes
+
+    Deltas are merged per rollup row, so a chunk of thousands of activities
+    costs one UPDATE per touched row, not one per activity.
+    """
+
+    def __init__(self):
+        self._deltas: Dict[RollupKey, List] = {}
+
+    def add(self, state: Optional[RollupState], sign: int = 1):
+        """Count an activity state in (sign=1) or out (sign=-1)"""
+        if state is None:
+            return
+        delta = self._deltas.setdefault(state.key, [0.0, 0, 0, 0])
+        delta[0] += sign * state.co2e_kg
+        delta[1] += sign
+        delta[2] += sign * state.priced
+        delta[3] += sign * state.has_factor
+
+    def change(self, before: Optional[RollupState], after: Optional[RollupState]):
+        """Move an activity's contribution from one state to another"""
+        self.add(before, -1)
+        self.add(after, 1)
+
+    def apply(self):
+        """Write the deltas to the organization rollup table (does NOT commit)"""
+        deltas = {key: delta for key, delta in self._deltas.items() if any(delta)}
+        self._deltas.clear()
+        # A fixed row order keeps concurrent writers from deadlocking
+        for key in sorted(deltas, key=_sort_key):
+            _apply_delta(EmissionRollup.__table__, key, *deltas[key])
+
+
+def record_change(before: Optional[RollupState], activity):
+    """Update the rollups for one activity that was created (before=None) or changed"""
+    changes = RollupChanges()
+    changes.change(before, rollup_state(activity))
+    changes.apply()
+
+
+def _merge(rows: Dict[tuple, List], key: tuple, delta: List):
+    total = rows.setdefault(key, [0.0, 0, 0, 0])
+    for i, value in enumerate(delta):
+        total[i] += value
+
+
+def _sort_key(key: tuple):
+    return tuple(getattr(value, 'value', value) for value in key)
+
+
+def _key_criteria(table, key: tuple):
+    return [table.c[name] == value for name, value in key._asdict().items()]
+
+
+def _apply_delta(table, key: tuple, co2e: float, count: int, priced: int, has_factor: int):
+    """Add a delta to a rollup row, creating the row on first use"""
+    statement = (
+        update(table)
+        .where(*_key_criteria(table, key))
+        .values(
+            co2e_kg=table.c.co2e_kg + co2e,
+            activity_count=table.c.activity_count + count,
+            priced_count=table.c.priced_count + priced,
+            factor_count=table.c.factor_count + has_factor,
+        )
+    )
+    if db.session.execute(statement).rowcount:
+        if count < 0:
+            # Drop emptied rows rather than keep float residue around
+            db.session.execute(
+                delete(table).where(*_key_criteria(table, key), table.c.activity_count <= 0)
+            )
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(table).values(
+                **key._asdict(),
+                co2e_kg=co2e,
+                activity_count=count,
+                priced_count=priced,
+                factor_count=has_factor,
+            ))
+    except IntegrityError:
+        # Another transaction created the row since our UPDATE
+        db.session.execute(statement)
+
+
+# ---------------------------------------------------------------------------
+# Rebuild
+# ---------------------------------------------------------------------------
+
+def rebuild_rollups(organization_id: Optional[int] = None) -> int:
+    """
+    Recompute the rollup rows from emission_activities with one GROUP BY,
+    then the platform tables from the organization rollups
+
+    Args:
+        organization_id: Rebuild a single organization (None = all)
+
+    Returns:
+        The number of rollup rows written
+    """
+    activity = EmissionActivity
+    year = extract('year', activity.period_start)
+    month = extract('month', activity.period_start)
+    has_factor = case(
+        (and_(activity.ademe_factor_id.isnot(None), activity.ademe_factor_id != ''), 1), else_=0
+    )
+    columns = (activity.organization_id, activity.scope, activity.category,
+               activity.activity_type, activity.status)
+    query = (
+        select(
+            *columns, year, month,
+            func.coalesce(func.sum(activity.co2e_result), 0.0),
+            func.count(activity.id),
+            func.count(activity.co2e_result),
+            func.coalesce(func.sum(has_factor), 0),
+        )
+        .group_by(*columns, year, month)
+    )
+    cleanup = delete(EmissionRollup.__table__)
+    if organization_id is not None:
+        query = query.where(activity.organization_id == organization_id)
+        cleanup = cleanup.where(EmissionRollup.__table__.c.organization_id == organization_id)
+
+    rows = [
+        {
+            **RollupKey(org_id, scope, category, activity_type, status,
+                        date(int(y), int(m), 1))._asdict(),
+            'co2e_kg': co2e,
+            'activity_count': count,
+            'priced_count': priced,
+            'factor_count': factors,
+        }
+        for org_id, scope, category, activity_type, status, y, m, co2e, count, priced, factors
+        in db.session.execute(query)
+    ]
+
+    db.session.execute(cleanup)
+    if rows:
+        db.session.execute(insert(EmissionRollup.__table__), rows)
+    rebuild_platform_rollups()
+    db.session.commit()
+    return len(rows)
+
+
+def rebuild_platform_rollups() -> int:
+    """
+    Recompute the platform tables from the organization rollups and bump
+    their PlatformRollupVersion (does NOT commit)
+
+    Returns:
+        The number of platform rows written
+    """
+    rollup = EmissionRollup
+    measures = (func.sum(rollup.co2e_kg), func.sum(rollup.activity_count),
+                func.sum(rollup.priced_count), func.sum(rollup.factor_count))
+
+    platform_columns = (rollup.scope, rollup.category, rollup.activity_type,
+                        rollup.status, rollup.period_month)
+    platform = [
+        {**PlatformKey(*row[:5])._asdict(), **dict(zip(MEASURES, row[5:]))}
+        for row in db.session.execute(
+            select(*platform_columns, *measures).group_by(*platform_columns)
+        )
+    ]
+
+    totals: Dict[tuple, List] = {}
+    organization_columns = (rollup.organization_id, Organization.industry, Organization.country,
+                            rollup.scope, rollup.status)
+    for org_id, industry, country, scope, status, *delta in db.session.execute(
+        select(*organization_columns, *measures)
+        .join(Organization, Organization.id == rollup.organization_id)
+        .group_by(*organization_columns)
+    ):
+        for dimension, value in (('organization', str(org_id)), ('industry', industry or ''),
+                                 ('country', country or '')):
+            _merge(totals, BreakdownKey(dimension, value, scope, status), delta)
+    breakdowns = [{**key._asdict(), **dict(zip(MEASURES, delta))} for key, delta in totals.items()]
+
+    for model, rows in ((PlatformEmissionRollup, platform), (PlatformEmissionBreakdown, breakdowns)):
+        db.session.execute(delete(model.__table__))
+        if rows:
+            db.session.execute(insert(model.__table__), rows)
+    _bump_platform_version()
+    return len(platform) + len(breakdowns)
+
+
+def _bump_platform_version():
+    table = PlatformRollupVersion.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == PlatformRollupVersion.ROW_ID)
+        .values(version=table.c.version + 1)
+    )
+    if db.session.execute(statement).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(table).values(id=PlatformRollupVersion.ROW_ID, version=1))
+    except IntegrityError:
+        # Another transaction created the row since our UPDATE
+        db.session.execute(statement)
+
+
+# Engines whose rollups are known to be populated (checked once per process)
+_backfilled = weakref.WeakKeyDictionary()
+# Engine -> time.monotonic() the platform tables were last found fresh
+_platform_checked = weakref.WeakKeyDictionary()
+
+
+def ensure_rollups():
+    """
+    Backfill the rollups on first use if the table is empty but activities
+    exist (deployments upgraded from before the rollup tables), and rebuild
+    the platform tables when they were never built or not refreshed for
+    PLATFORM_ROLLUP_INTERVAL seconds (no job runner refreshing them)
+
+    Costs two indexed lookups once per process and database, then one
+    primary-key read per interval. When several workers race, the losers
+    roll back and keep the winner's rows.
+    """
+    engine = db.engine
+    if engine not in _backfilled:
+        if (db.session.query(EmissionRollup.id).first() is None
+                and db.session.query(EmissionActivity.id).first() is not None):
+            try:
+                rebuild_rollups()
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                print(f"❌ Emission rollup backfill failed: {e}")
+                return
+        _backfilled[engine] = True
+
+    interval = current_app.config.get('PLATFORM_ROLLUP_INTERVAL', 0)
+    now = time.monotonic()
+    last_check = _platform_checked.get(engine)
+    if last_check is not None and (not interval or now - last_check < interval):
+        return
+    refreshed_at = db.session.scalar(
+        select(PlatformRollupVersion.updated_at)
+        .where(PlatformRollupVersion.id == PlatformRollupVersion.ROW_ID)
+    )
+    if refreshed_at is None or (
+            interval and refreshed_at < datetime.utcnow() - timedelta(seconds=interval)):
+        try:
+            rebuild_platform_rollups()
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            print(f"❌ Platform rollup refresh failed: {e}")
+            return
+    _platform_checked[engine] = now
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def rollup_totals(*group_by, organization_id: Optional[int] = None,
+                  statuses: Optional[Iterable[ActivityStatus]] = None,
+                  scope: Optional[EmissionScope] = None,
+                  category: Optional[str] = None,
+                  month_from: Optional[date] = None):
+    """
+    Sum rollup rows, grouped by the given EmissionRollup columns
+
+    Without an organization_id the platform table is read instead, so
+    platform-wide totals cost the same whatever the number of tenants (and
+    lag the activities by up to PLATFORM_ROLLUP_INTERVAL seconds).
+    Each result row holds the group columns followed by co2e_kg,
+    activity_count, priced_count and factor_count.
+
+    Example:
+        rollup_totals(EmissionRollup.scope, EmissionRollup.status, organization_id=org_id)
+    """
+    ensure_rollups()
+    rollup = EmissionRollup if organization_id is not None else PlatformEmissionRollup
+    group_by = [getattr(rollup, column.key) for column in group_by]
+    query = db.session.query(
+        *group_by,
+        func.coalesce(func.sum(rollup.co2e_kg), 0.0).label('co2e_kg'),
+        func.coalesce(func.sum(rollup.activity_count), 0).label('activity_count'),
+        func.coalesce(func.sum(rollup.priced_count), 0).label('priced_count'),
+        func.coalesce(func.sum(rollup.factor_count), 0).label('factor_count'),
+    )
+    if organization_id is not None:
+        query = query.filter(rollup.organization_id == organization_id)
+    if statuses is not None:
+        query = query.filter(rollup.status.in_(list(statuses)))
+    if scope is not None:
+        query = query.filter(rollup.scope == scope)
+    if category is not None:
+        query = query.filter(rollup.category == category)
+    if month_from is not None:
+        query = query.filter(rollup.period_month >= month_from)
+    if group_by:
+        query = query.group_by(*group_by)
+    return query.all()
+
+
+def platform_breakdown(dimension: str,
+                       statuses: Optional[Iterable[ActivityStatus]] = None,
+                       scope: Optional[EmissionScope] = None,
+                       limit: Optional[int] = 10):
+    """
+    Platform totals per organization, industry or country, largest first
+
+    Returns rows of (value, co2e_kg, priced_count); value is the
+    organization id as text for the "organization" dimension.
+    """
+    ensure_rollups()
+    breakdown = PlatformEmissionBreakdown
+    co2e = func.sum(breakdown.co2e_kg)
+    query = (
+        db.session.query(breakdown.value, co2e.label('co2e_kg'),
+                         func.sum(breakdown.priced_count).label('priced_count'))
+        .filter(breakdown.dimension == dimension)
+    )
+    if statuses is not None:
+        query = query.filter(breakdown.status.in_(list(statuses)))
+    if scope is not None:
+        query = query.filter(breakdown.scope == scope)
+    query = query.group_by(breakdown.value).having(func.sum(breakdown.priced_count) > 0)
+    return query.order_by(co2e.desc()).limit(limit).all()
@@ -15,6 +15,7 @@ from app.models.emission_activity import (
 )
 from app.models.emission_factor_database import ActivityType
 from app.models.audit_log import AuditLog
+from app.emissions.rollup import record_change, rollup_state
 from app.services.emission_factor_loader import get_loader, EmissionFactorData
 
 
@@ -145,6 +146,7 @@ def create_activity(user, form: dict, *, auto_validate: bool = False) -> Emissio
 
     db.session.add(activity)
     db.session.flush()
+    record_change(None, activity)
 
     action_label = "CREATE_EMISSION_VALIDATED" if auto_validate else "CREATE_EMISSION_DRAFT"
     _log(
@@ -177,7 +179,9 @@ def submit_activity(user, activity_id: int) -> EmissionActivity:
     if activity.status != ActivityStatus.DRAFT:
         raise ValueError("Only DRAFT activities can be submitted.")
 
+    before = rollup_state(activity)
     activity.status = ActivityStatus.SUBMITTED
+    record_change(before, activity)
     _log(
         actor_id=user.id,
         org_id=activity.organization_id,
@@ -204,7 +208,9 @@ def validate_activity(validator, activity_id: int) -> EmissionActivity:
     if activity.status != ActivityStatus.SUBMITTED:
         raise ValueError("Only SUBMITTED activities can be validated.")
 
+    before = rollup_state(activity)
     activity.status = ActivityStatus.VALIDATED
+    record_change(before, activity)
     _log(
         actor_id=validator.id,
         org_id=activity.organization_id,
@@ -223,8 +229,10 @@ def reject_activity(validator, activity_id: int, reason: str) -> EmissionActivit
     if activity.status != ActivityStatus.SUBMITTED:
         raise ValueError("Only SUBMITTED activities can be rejected.")
 
+    before = rollup_state(activity)
     activity.status = ActivityStatus.REJECTED
     activity.rejection_reason = reason.strip() if reason else None
+    record_change(before, activity)
     _log(
         actor_id=validator.id,
         org_id=activity.organization_id,
@@ -271,6 +279,7 @@ def update_activity(user, activity_id: int, form: dict,
 
     # -- re-resolve ADEME factor ------------------------------------------------
     factor, co2e_result = _resolve_factor(form)
+    before = rollup_state(activity)
 
     # -- update fields ---------------------------------------------------------
     activity.scope = EmissionScope(form["scope"])
@@ -307,6 +316,7 @@ def update_activity(user, activity_id: int, form: dict,
     activity.rejection_reason = None  # clear old rejection
     activity.proof_requested = False  # clear proof flag
     activity.auditor_notes = None     # clear auditor notes as they are addressing it
+    record_change(before, activity)
 
     _log(
         actor_id=user.id,
@@ -78,6 +78,40 @@ def create_app(config_name='default'):
     from app.api.v1.analytics import bp as api_analytics_bp
     app.register_blueprint(api_analytics_bp)
 
+    # API v1 — activity import
+    from app.api.v1.activities import bp as api_activities_bp
+    app.register_blueprint(api_activities_bp)
+
+    # API v1 — background jobs
+    from app.api.v1.jobs import bp as api_jobs_bp
+    app.register_blueprint(api_jobs_bp)
+
+    # --------------------
+    # Background jobs
+    # --------------------
+
+    from app.services.job_queue import job_queue
+    from app.services import job_handlers  # noqa: F401 — registers the job kinds
+    job_queue.init_app(app)
+
+    # Run queued and periodic jobs (platform rollup refresh) in this process
+    if app.config.get('JOB_AUTOSTART'):
+        job_queue.start()
+
+    # --------------------
+    # Emission factors
+    # --------------------
+
+    # Parse the ADEME Base Carbone off the request path
+    if app.config.get('FACTOR_WARMUP'):
+        from app.services.emission_factor_loader import start_warm_up
+        start_warm_up()
+
+    # Hot-reload factors when the CSV is replaced
+    if app.config.get('FACTOR_RELOAD_INTERVAL'):
+        from app.services.emission_factor_loader import start_file_watcher
+        start_file_watcher(app.config['FACTOR_RELOAD_INTERVAL'])
+
     # --------------------
     # Return app
     # --------------------
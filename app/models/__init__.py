@@ -15,6 +15,11 @@ from app.models.auditor_point_log import AuditorPointLog
 from app.models.secure_message import SecureMessage, MessageChannel
 from app.models.system_setting import SystemSetting
 from app.models.academy import AcademyProgress, Achievement
+from app.models.background_job import BackgroundJob, JobStatus
+from app.models.emission_rollup import (
+    AnalyticsVersion, EmissionRollup, PlatformEmissionBreakdown, PlatformEmissionRollup,
+    PlatformRollupVersion,
+)
 
 __all__ = [
     "BaseModel",
@@ -38,4 +43,11 @@ __all__ = [
     "SystemSetting",
     "AcademyProgress",
     "Achievement",
+    "BackgroundJob",
+    "JobStatus",
+    "EmissionRollup",
+    "PlatformEmissionRollup",
+    "PlatformEmissionBreakdown",
+    "AnalyticsVersion",
+    "PlatformRollupVersion",
 ]
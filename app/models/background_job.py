@@ -0,0 +1,62 @@
+import enum
+from app.extensions import db
+from app.models.base import BaseModel
+
+
+class JobStatus(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class BackgroundJob(BaseModel):
+    """A unit of work run off the request path by the job queue."""
+    __tablename__ = "background_jobs"
+
+    kind = db.Column(db.String(50), nullable=False, index=True)  # e.g. "import_activities", "export_report"
+    status = db.Column(db.Enum(JobStatus), default=JobStatus.QUEUED, nullable=False, index=True)
+
+    created_by_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="SET NULL"),
+        nullable=True
+    )
+    organization_id = db.Column(
+        db.Integer,
+        db.ForeignKey("organizations.id", ondelete="CASCADE"),
+        nullable=True
+    )
+
+    payload = db.Column(db.JSON, nullable=True)   # handler keyword arguments
+    result = db.Column(db.JSON, nullable=True)    # handler return value
+    error = db.Column(db.Text, nullable=True)
+
+    progress = db.Column(db.Integer, default=0, nullable=False)  # 0–100
+    progress_message = db.Column(db.String(255), nullable=True)
+
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    created_by = db.relationship("User")
+
+    @property
+    def is_finished(self):
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status.value,
+            'progress': self.progress,
+            'progress_message': self.progress_message,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f"<BackgroundJob {self.id} {self.kind} {self.status.value}>"
@@ -0,0 +1,142 @@
+from app.extensions import db
+from app.models.base import BaseModel
+from app.models.emission_activity import ActivityStatus, EmissionScope
+from app.models.emission_factor_database import ActivityType
+
+
+class RollupTotalsMixin:
+    """Measures shared by every rollup table"""
+    co2e_kg = db.Column(db.Float, default=0.0, nullable=False)          # sum of co2e_result
+    activity_count = db.Column(db.Integer, default=0, nullable=False)   # all activities
+    priced_count = db.Column(db.Integer, default=0, nullable=False)     # activities with a co2e_result
+    factor_count = db.Column(db.Integer, default=0, nullable=False)     # activities with an ADEME factor
+
+
+class EmissionRollup(RollupTotalsMixin, BaseModel):
+    """
+    Pre-aggregated emission totals for one organization
+
+    One row per (organization, scope, category, activity type, status,
+    month of period_start). Maintained incrementally by
+    app.emissions.rollup whenever an EmissionActivity is created, edited or
+    moves through the workflow, so dashboards and analytics sum a few dozen
+    rows instead of the full activity history.
+    """
+    __tablename__ = "emission_rollups"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "organization_id", "scope", "category", "activity_type", "status", "period_month",
+            name="uq_emission_rollups_key",
+        ),
+    )
+
+    organization_id = db.Column(
+        db.Integer,
+        db.ForeignKey("organizations.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    scope = db.Column(db.Enum(EmissionScope), nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    activity_type = db.Column(db.Enum(ActivityType), nullable=False)
+    status = db.Column(db.Enum(ActivityStatus), nullable=False)
+    period_month = db.Column(db.Date, nullable=False)  # first day of the period_start month
+
+    def __repr__(self):
+        return (f"<EmissionRollup org={self.organization_id} {self.scope.value} {self.category!r} "
+                f"{self.status.value} {self.period_month:%Y-%m}: {self.co2e_kg} kg>")
+
+
+class PlatformEmissionRollup(RollupTotalsMixin, BaseModel):
+    """
+    Emission totals across every organization
+
+    Same key as EmissionRollup without the organization, so its size
+    depends on categories and months, not on the number of tenants.
+    Recomputed from EmissionRollup by the refresh_platform_rollups job.
+    """
+    __tablename__ = "platform_emission_rollups"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "scope", "category", "activity_type", "status", "period_month",
+            name="uq_platform_emission_rollups_key",
+        ),
+    )
+
+    scope = db.Column(db.Enum(EmissionScope), nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    activity_type = db.Column(db.Enum(ActivityType), nullable=False)
+    status = db.Column(db.Enum(ActivityStatus), nullable=False)
+    period_month = db.Column(db.Date, nullable=False)
+
+    def __repr__(self):
+        return (f"<PlatformEmissionRollup {self.scope.value} {self.category!r} "
+                f"{self.status.value} {self.period_month:%Y-%m}: {self.co2e_kg} kg>")
+
+
+class PlatformEmissionBreakdown(RollupTotalsMixin, BaseModel):
+    """
+    Platform emission totals per organization, industry or country
+
+    dimension is one of BREAKDOWN_DIMENSIONS; value is the organization id
+    (as text), the industry or the country ('' when not set). Recomputed
+    with PlatformEmissionRollup.
+    """
+    __tablename__ = "platform_emission_breakdowns"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "dimension", "value", "scope", "status",
+            name="uq_platform_emission_breakdowns_key",
+        ),
+    )
+
+    BREAKDOWN_DIMENSIONS = ("organization", "industry", "country")
+
+    dimension = db.Column(db.String(20), nullable=False)
+    value = db.Column(db.String(150), nullable=False)
+    scope = db.Column(db.Enum(EmissionScope), nullable=False)
+    status = db.Column(db.Enum(ActivityStatus), nullable=False)
+
+    def __repr__(self):
+        return (f"<PlatformEmissionBreakdown {self.dimension}={self.value!r} {self.scope.value} "
+                f"{self.status.value}: {self.co2e_kg} kg>")
+
+
+class AnalyticsVersion(BaseModel):
+    """
+    Version of an organization's analytics data
+
+    Incremented in every transaction that changes the organization's
+    emission activities, so each worker's analytics cache can tell that a
+    payload it holds predates a commit made by another process.
+    """
+    __tablename__ = "analytics_versions"
+
+    organization_id = db.Column(
+        db.Integer,
+        db.ForeignKey("organizations.id", ondelete="CASCADE"),
+        nullable=False,
+        unique=True
+    )
+    version = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<AnalyticsVersion org={self.organization_id}: {self.version}>"
+
+
+class PlatformRollupVersion(BaseModel):
+    """
+    Version of the platform tables
+
+    A single row (ROW_ID), incremented by every rebuild of the platform
+    tables; updated_at is when they were last refreshed. Platform analytics
+    are cached per version, so checking them costs one primary-key read
+    whatever the number of tenants.
+    """
+    __tablename__ = "platform_rollup_versions"
+
+    ROW_ID = 1
+
+    version = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<PlatformRollupVersion {self.version} at {self.updated_at}>"
@@ -0,0 +1,199 @@
+"""
+Analytics Response Cache
+Caches /api/v1/analytics/emissions payloads per (view, organization,
+filters). Entries of an organization are dropped when a transaction that
+changed one of its EmissionActivity rows commits: ORM changes are picked up
+by SQLAlchemy session events, bulk writers that bypass the unit of work
+(import, recalculation) report the organizations they touched with
+mark_changed(). That only reaches the committing worker's cache, so the same
+transaction also increments the organization's AnalyticsVersion row, and
+lookups are keyed on the current shared version: a payload cached before
+another worker's commit is recomputed. Platform payloads are keyed on the
+PlatformRollupVersion row instead, bumped by each refresh of the platform
+tables, so they follow the refresh schedule.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy import event, insert, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.emission_activity import EmissionActivity
+from app.models.emission_rollup import AnalyticsVersion, PlatformRollupVersion
+from app.utils.cache import LRUCache
+
+
+analytics_cache = LRUCache(max_size=1024, ttl=300)
+
+# Columns that feed the analytics aggregates; other edits (notes, proof
+# requests...) leave cached payloads valid
+TRACKED_ATTRIBUTES = (
+    'organization_id', 'created_by_id', 'status', 'co2e_result', 'scope', 'category',
+    'activity_type', 'period_start', 'period_end',
+)
+
+# Session.info key collecting organizations changed in the open transaction
+_PENDING_KEY = 'analytics_changed_organizations'
+
+_lock = threading.Lock()
+_timings: Dict[str, list] = {'hit': [0, 0.0], 'miss': [0, 0.0]}
+# Bumped by every invalidation, so a payload computed across one is not stored
+_generation = 0
+
+_MISSING = object()
+
+
+def cache_key(view: str, organization_id: Optional[int], user_id: Optional[int] = None,
+              **filters) -> tuple:
+    """
+    Cache key of an analytics payload
+
+    Args:
+        view: "platform", "org" or "own" (a worker's own activities)
+        organization_id: Organization shown (None = every organization)
+        user_id: Worker whose activities are shown, for the "own" view
+        filters: Request filters (date_from, date_to, scope, ...)
+    """
+    return (view, organization_id, user_id, tuple(sorted(filters.items())))
+
+
+def get_or_compute(key: tuple, compute: Callable[[], Dict]) -> Dict:
+    """Serve a payload from the cache, computing and storing it on a miss"""
+    started = time.perf_counter()
+    # Entries of an older version, cached before a commit made by another
+    # worker, are never looked up again and age out of the LRU
+    key = (*key, current_version(key[1]))
+    value = analytics_cache.get(key, _MISSING)
+    hit = value is not _MISSING
+    if not hit:
+        generation = _generation
+        value = compute()
+        with _lock:
+            # Data read before a concurrent invalidating commit may be stale
+            if generation == _generation:
+                analytics_cache.set(key, value)
+    _record_timing(hit, time.perf_counter() - started)
+    return value
+
+
+def current_version(organization_id: Optional[int]) -> int:
+    """
+    Shared analytics version of an organization; for every organization
+    (None), the version of the platform rollup tables
+    """
+    if organization_id is None:
+        table = PlatformRollupVersion.__table__
+        statement = select(table.c.version).where(table.c.id == PlatformRollupVersion.ROW_ID)
+    else:
+        table = AnalyticsVersion.__table__
+        statement = select(table.c.version).where(table.c.organization_id == organization_id)
+    return db.session.execute(statement).scalar() or 0
+
+
+def _bump_versions(session: Session, organization_ids: Iterable[int]):
+    """Increment the shared version of these organizations in the session's transaction"""
+    table = AnalyticsVersion.__table__
+    # A fixed order keeps concurrent writers from locking rows in opposite orders
+    for organization_id in sorted(organization_ids):
+        statement = (
+            update(table)
+            .where(table.c.organization_id == organization_id)
+            .values(version=table.c.version + 1)
+        )
+        if session.execute(statement).rowcount:
+            continue
+        try:
+            with session.begin_nested():
+                session.execute(insert(table).values(organization_id=organization_id, version=1))
+        except IntegrityError:
+            # Another transaction created the row since our UPDATE
+            session.execute(statement)
+
+
+def _record_timing(hit: bool, seconds: float):
+    with _lock:
+        timing = _timings['hit' if hit else 'miss']
+        timing[0] += 1
+        timing[1] += seconds
+
+
+def stats() -> Dict:
+    """Cache counters plus the average latency of hits and misses in ms"""
+    with _lock:
+        latency = {
+            f'avg_{kind}_ms': round(total / count * 1000, 3) if count else None
+            for kind, (count, total) in _timings.items()
+        }
+    return {**analytics_cache.stats(), **latency}
+
+
+def invalidate_organizations(organization_ids: Iterable[int]) -> int:
+    """Drop the cached payloads of these organizations and the platform-wide ones"""
+    global _generation
+    organization_ids = set(organization_ids)
+    if not organization_ids:
+        return 0
+    with _lock:
+        _generation += 1
+    return analytics_cache.delete_where(
+        lambda key: key[1] is None or key[1] in organization_ids
+    )
+
+
+def mark_changed(session: Session, organization_ids: Iterable[int]):
+    """Invalidate these organizations when the session's transaction commits"""
+    session.info.setdefault(_PENDING_KEY, set()).update(
+        org_id for org_id in organization_ids if org_id is not None
+    )
+
+
+def _changed_organizations(activity, always: bool = False):
+    """Organizations whose analytics a flushed activity change affects"""
+    state = inspect(activity)
+    if not always and not any(state.attrs[name].history.has_changes() for name in TRACKED_ATTRIBUTES):
+        return set()
+    # An activity moved to another organization changes both
+    history = state.attrs.organization_id.history
+    return {activity.organization_id, *(history.deleted or ())}
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_activities(session, flush_context):
+    changed = set()
+    for activities, always in ((session.new, True), (session.deleted, True), (session.dirty, False)):
+        for activity in activities:
+            if isinstance(activity, EmissionActivity):
+                changed |= _changed_organizations(activity, always)
+    if changed:
+        mark_changed(session, changed)
+
+
+def _has_pending_activities(session) -> bool:
+    return any(
+        isinstance(obj, EmissionActivity)
+        for objects in (session.new, session.deleted, session.dirty) for obj in objects
+    )
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_on_commit(session):
+    # Collect activity changes not flushed yet; commits that touch no
+    # activity skip the flush. The rows are locked from here to the commit
+    if _has_pending_activities(session):
+        session.flush()
+    changed = session.info.get(_PENDING_KEY)
+    if changed:
+        _bump_versions(session, changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    # Organizations noted by a rolled-back flush are invalidated at the next
+    # commit, which costs a recomputation but never serves stale data
+    changed = session.info.pop(_PENDING_KEY, None)
+    if changed:
+        invalidate_organizations(changed)
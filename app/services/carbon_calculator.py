@@ -47,7 +47,7 @@ class CarbonCalculator:
         if factor is None:
             raise ValueError("Emission factor is required for calculation")
         
-        if factor.factor < 0 and 'recycle' not in factor.name.lower():
+        if factor.factor < 0 and 'recycle' not in factor.name_fr.lower():
             # Allow negative factors for recycling (avoided emissions)
             raise ValueError(f"Invalid emission factor: {factor.factor}")
         
@@ -76,10 +76,10 @@ class CarbonCalculator:
         # Save result to activity (in kgCO2e for database storage)
         activity.co2e_result = emissions * 1000  # Convert back to kg for storage
         
-        # Copy ADEME fields from factor for audit trail
-        if factor.poste_emission:
+        # Copy ADEME fields from factor for audit trail (database factors only)
+        if getattr(factor, 'poste_emission', None):
             activity.poste_emission = factor.poste_emission
-        if factor.perimetre:
+        if getattr(factor, 'perimetre', None):
             activity.perimetre = factor.perimetre
         
         return emissions
@@ -5,13 +5,26 @@ Includes advanced search engine with fuzzy matching for factor selection
 """
 
 import csv
+import gc
+import heapq
 import os
-from typing import List, Optional, Dict, Tuple
-from dataclasses import dataclass
+import threading
+import time
+from typing import List, Optional, Dict, Iterable, Sequence, Tuple
+from dataclasses import dataclass, fields, replace
 from difflib import SequenceMatcher
 
+from app.services.factor_categories import CategoryTree
+from app.services.factor_index import FacetIndex, InvertedIndex, PrefixIndex, TrigramIndex, fold_text
+from app.services.factor_matcher import FactorMatcher
+from app.services.factor_snapshot import (
+    csv_fingerprint, default_snapshot_path, read_snapshot, write_snapshot
+)
+from app.services.factor_store import FactorTable, default_store_path, open_store, write_store
+from app.services.factor_table import CompactFactorTable
 
-@dataclass
+
+@dataclass(slots=True)
 class EmissionFactorData:
     """
     Data class for emission factor loaded from ADEME Base Carbone CSV
@@ -74,6 +87,26 @@ class EmissionFactorData:
             'comment_fr': self.comment_fr,
             'comment_en': self.comment_en,
         }
+    
+    def to_row(self) -> Tuple:
+        """Convert to a tuple in field order (snapshot storage)"""
+        return tuple(getattr(self, name) for name in FACTOR_FIELDS)
+
+
+# Field order used by to_row(), the binary snapshot and the shared store
+FACTOR_FIELDS = tuple(f.name for f in fields(EmissionFactorData))
+NUMERIC_FIELDS = tuple(f.name for f in fields(EmissionFactorData) if f.type in (float, Optional[float]))
+
+# Factors scored at most for a query the token index cannot shortlist
+MAX_FALLBACK_CANDIDATES = 500
+
+# Facet name -> factor field, for search filters and counts
+FACET_FIELDS = {
+    'category': 'category',
+    'source': 'source',
+    'location': 'geographic_location',
+    'unit': 'unit_fr',
+}
 
 
 class EmissionFactorSearchEngine:
@@ -82,84 +115,424 @@ class EmissionFactorSearchEngine:
     Prepares for future AI-powered automatic factor selection
     """
     
-    def __init__(self, factors: List[EmissionFactorData]):
-        """Initialize search engine with factors"""
+    def __init__(self, factors: Sequence[EmissionFactorData]):
+        """
+        Initialize search engine with factors
+        
+        ``factors`` may be a plain list or a column-backed table (compact or
+        memory-mapped); the indexes hold positions into it rather than factor
+        objects, so a table is only decoded for the rows a caller actually gets.
+        """
         self.factors = factors
         self._build_indexes()
     
+    def _column(self, name: str) -> List:
+        """Read one field for every factor"""
+        if isinstance(self.factors, (CompactFactorTable, FactorTable)):
+            return self.factors.column(name)
+        return [getattr(f, name) for f in self.factors]
+    
+    def _column_value(self, position: int, name: str):
+        """Read one field of one factor"""
+        if isinstance(self.factors, (CompactFactorTable, FactorTable)):
+            return self.factors.value(position, name)
+        return getattr(self.factors[position], name)
+    
     def _build_indexes(self):
-        """Build search indexes for fast lookups"""
-        self.by_id = {f.id: f for f in self.factors}
-        self.by_category = {}
-        self.by_source = {}
-        
-        for factor in self.factors:
-            # Index by category
-            if factor.category not in self.by_category:
-                self.by_category[factor.category] = []
-            self.by_category[factor.category].append(factor)
-            
-            # Index by source
-            if factor.source not in self.by_source:
-                self.by_source[factor.source] = []
-            self.by_source[factor.source].append(factor)
+        """Build search indexes for fast lookups (factor positions)"""
+        ids = self._column('id')
+        names = {'fr': self._column('name_fr'), 'en': self._column('name_en')}
+        tags = {'fr': self._column('tags_fr'), 'en': self._column('tags_en')}
+        categories = self._column('category')
+        
+        self.by_id = {factor_id: position for position, factor_id in enumerate(ids)}
+        
+        # Facet posting lists (category and source double as lookup indexes)
+        self.facets = {name: FacetIndex(self._column(field)) for name, field in FACET_FIELDS.items()}
+        self.by_category = self.facets['category'].postings
+        self.by_source = self.facets['source'].postings
+        self.category_tree = CategoryTree(self.by_category)
+        self._archived = [status == 'Archivé' for status in self._column('status')]
+        self.archived_positions = [p for p, archived in enumerate(self._archived) if archived]
+        
+        # Lowercased text columns reused by every query's scoring pass
+        self._names_lower = {lang: [n.lower() for n in names[lang]] for lang in names}
+        self._tags_lower = {lang: [t.lower() if t else '' for t in tags[lang]] for lang in tags}
+        self._categories_lower = [c.lower() for c in categories]
+        
+        # Trigram index over name, tag and category terms, shared by both languages
+        self.trigram_index = TrigramIndex()
+        
+        # Accent-folded token index per language (name + tags + category),
+        # partitioned so that valid-only searches never see archived factors
+        self.token_index = {
+            'fr': InvertedIndex(self.trigram_index),
+            'en': InvertedIndex(self.trigram_index),
+        }
+        self.archived_token_index = {
+            'fr': InvertedIndex(self.trigram_index),
+            'en': InvertedIndex(self.trigram_index),
+        }
+        
+        for position in range(len(ids)):
+            token_index = self.archived_token_index if self._archived[position] else self.token_index
+            for lang in ('fr', 'en'):
+                token_index[lang].add(position, names[lang][position], tags[lang][position],
+                                      categories[position])
+            self.trigram_index.add(names['fr'][position], names['en'][position],
+                                   tags['fr'][position], tags['en'][position], categories[position])
+        
+        for index in (*self.token_index.values(), *self.archived_token_index.values()):
+            index.finalize()
+        
+        self._build_suggest_indexes(names, tags)
+        self.matcher = FactorMatcher(self)
+    
+    def _build_suggest_indexes(self, names: Dict[str, List[str]], tags: Dict[str, List[str]]):
+        """
+        Build the typeahead prefix index per language
+        
+        Tags come before factor names and rank by how many factors carry
+        them; names, and tags used equally often, rank shortest (most
+        generic) first. Archived factors are not suggested.
+        """
+        self.suggest_index = {}
+        for lang in ('fr', 'en'):
+            index = PrefixIndex()
+            tag_counts: Dict[str, List] = {}
+            for position, name in enumerate(names[lang]):
+                if self._archived[position]:
+                    continue
+                index.add(name, (1, len(name)), ('factor', position))
+                for tag in (tags[lang][position] or '').split(','):
+                    tag = tag.strip()
+                    if tag:
+                        # First spelling seen is the one suggested
+                        tag_counts.setdefault(fold_text(tag), [tag, 0])[1] += 1
+            for tag, count in tag_counts.values():
+                index.add(tag, (0, -count, len(tag)), ('tag', tag, count))
+            index.finalize()
+            self.suggest_index[lang] = index
+    
+    def _materialize(self, positions: List[int]) -> List[EmissionFactorData]:
+        """Factor records for a list of positions"""
+        return [self.factors[p] for p in positions]
+    
+    def count_archived(self) -> int:
+        """Number of archived factors"""
+        return len(self.archived_positions)
+    
+    def _candidates(self, query: str, lang: str, valid_only: bool, fallback: bool = True) -> List[int]:
+        """Shortlist positions from the valid partition, plus the archived one if asked"""
+        positions = self.token_index[lang].candidates(query)
+        if not valid_only:
+            archived = self.archived_token_index[lang].candidates(query)
+            positions = sorted(positions + archived) if archived else positions
+        if not positions and fallback:
+            positions = self._fallback_candidates(query, lang, valid_only)
+        return positions
+    
+    def shortlists(self, query: str, language: str = 'fr', valid_only: bool = True) -> bool:
+        """Whether the token index finds candidates for query (no fallback scan needed)"""
+        lang = 'fr' if language == 'fr' else 'en'
+        return bool(self._candidates(query, lang, valid_only, fallback=False))
+    
+    def _fallback_candidates(self, query: str, lang: str, valid_only: bool) -> List[int]:
+        """
+        Bounded stand-in for the full scan, for queries the token index
+        cannot shortlist (one-letter tokens, fragments spanning words...)
+        
+        Factors whose name, tags or category contain the query, which the
+        scoring rewards, come first (names, then tags, then categories);
+        without any, the names closest in length to the query, whose fuzzy
+        ratio can be highest. Within a tier, shorter names are kept first.
+        
+        Returns:
+            Sorted list of at most MAX_FALLBACK_CANDIDATES positions
+        """
+        query_lower = query.lower()
+        if not query_lower.strip():
+            return []
+        
+        names = self._names_lower[lang]
+        tags = self._tags_lower[lang]
+        categories = self._categories_lower
+        archived = self._archived
+        
+        tiers = ([], [], [])
+        others = []
+        for position, name in enumerate(names):
+            if valid_only and archived[position]:
+                continue
+            if query_lower in name:
+                tiers[0].append(position)
+            elif query_lower in tags[position]:
+                tiers[1].append(position)
+            elif query_lower in categories[position]:
+                tiers[2].append(position)
+            else:
+                others.append(position)
+        
+        positions = []
+        for tier in tiers:
+            room = MAX_FALLBACK_CANDIDATES - len(positions)
+            if len(tier) > room:
+                tier = heapq.nsmallest(room, tier, key=lambda p: (len(names[p]), p))
+            positions.extend(tier)
+            if len(positions) >= MAX_FALLBACK_CANDIDATES:
+                break
+        
+        if not positions:
+            positions = heapq.nsmallest(
+                MAX_FALLBACK_CANDIDATES, others,
+                key=lambda p: (abs(len(names[p]) - len(query_lower)), p),
+            )
+        return sorted(positions)
+    
+    def _facet_filters(self, filters: Optional[Dict[str, Iterable[str]]]) -> Dict[str, Tuple]:
+        """(value_ids array, accepted value ids) per filtered facet"""
+        resolved = {}
+        for name, values in (filters or {}).items():
+            if name not in self.facets:
+                raise ValueError(f"Unknown facet: {name}")
+            if values:
+                facet = self.facets[name]
+                resolved[name] = (facet.value_ids, facet.ids_for(values))
+        return resolved
+    
+    @staticmethod
+    def _filter(positions: List[int], resolved: Iterable[Tuple]) -> List[int]:
+        """Keep positions accepted by every facet filter"""
+        for value_ids, accepted in resolved:
+            positions = [p for p in positions if value_ids[p] in accepted]
+        return positions
     
-    def search(self, query: str, language: str = 'fr', max_results: int = 20) -> List[Tuple[EmissionFactorData, float]]:
+    def search(self, query: str, language: str = 'fr', max_results: int = 20,
+               valid_only: bool = True, filters: Optional[Dict[str, Iterable[str]]] = None,
+               fallback: bool = True) -> List[Tuple[EmissionFactorData, float]]:
         """
         Search for emission factors with fuzzy matching
         
+        Candidates are shortlisted through the token index, with misspelt
+        tokens corrected through the trigram index, and then scored exactly
+        as before. Queries with no usable token get a bounded scan instead
+        (see _fallback_candidates). A top-k heap with ``quick_ratio`` upper bounds skips the
+        full ``SequenceMatcher.ratio`` for candidates that cannot make the cut.
+        
         Args:
             query: Search query
             language: 'fr' or 'en'
             max_results: Maximum number of results to return
+            valid_only: Skip archived factors (their index partition is not read)
+            filters: Facet name (see FACET_FIELDS) -> accepted values; values
+                of one facet are OR-ed, facets are AND-ed
+            fallback: Scan when the token index finds nothing (callers
+                searching several engines decide this across all of them)
         
         Returns:
             List of (factor, score) tuples, sorted by relevance score (0-1)
         """
-        query_lower = query.lower()
-        results = []
+        lang = 'fr' if language == 'fr' else 'en'
+        positions = self._candidates(query, lang, valid_only, fallback)
+        positions = self._filter(positions, self._facet_filters(filters).values())
+        return self._rank(query, lang, positions, max_results)
+    
+    def faceted_search(self, query: str, language: str = 'fr', max_results: int = 20,
+                       valid_only: bool = True, filters: Optional[Dict[str, Iterable[str]]] = None,
+                       fallback: bool = True
+                       ) -> Tuple[List[Tuple[EmissionFactorData, float]], Dict[str, Dict[str, int]]]:
+        """
+        Search with facet filters and return facet counts alongside the hits
         
-        for factor in self.factors:
-            # Skip archived factors
-            if factor.status == 'Archivé':
-                continue
-            
-            # Get name based on language
-            name = factor.name_fr if language == 'fr' else factor.name_en
-            tags = factor.tags_fr if language == 'fr' else factor.tags_en
-            
-            # Calculate relevance score
-            score = 0.0
-            
-            # Exact match in name (highest priority)
-            if query_lower in name.lower():
-                score += 1.0
-            
-            # Fuzzy match in name
-            name_similarity = SequenceMatcher(None, query_lower, name.lower()).ratio()
-            score += name_similarity * 0.8
-            
-            # Match in tags
-            if tags and query_lower in tags.lower():
-                score += 0.5
-            
-            # Match in category
-            if query_lower in factor.category.lower():
-                score += 0.3
+        Counts cover every factor matching the query, not only the returned
+        hits. Each facet is counted under the filters of the other facets
+        only, so the alternatives to a selected value keep their counts.
+        
+        Returns:
+            (hits as returned by search(), {facet: {value: count}})
+        """
+        lang = 'fr' if language == 'fr' else 'en'
+        positions = self._candidates(query, lang, valid_only, fallback)
+        resolved = self._facet_filters(filters)
+        
+        counts = {}
+        for name, facet in self.facets.items():
+            others = [f for other, f in resolved.items() if other != name]
+            counts[name] = facet.count(self._filter(positions, others))
+        
+        hits = self._rank(query, lang, self._filter(positions, resolved.values()), max_results)
+        return hits, counts
+    
+    def search_many(self, queries: Sequence[str], language: str = 'fr', max_results: int = 20,
+                    valid_only: bool = True, fallback: bool = True) -> List[List[Tuple[EmissionFactorData, float]]]:
+        """
+        Run several searches in one pass over their shortlisted factors
+        
+        Each factor name is prepared for fuzzy matching once and compared
+        with every query that shortlisted it; repeated queries are scored
+        once. Results are identical to calling search() per query.
+        
+        Returns:
+            One result list per query, in query order
+        """
+        lang = 'fr' if language == 'fr' else 'en'
+        distinct = list(dict.fromkeys(queries))
+        ranked = self._rank_many(
+            [q.lower() for q in distinct], lang,
+            [self._candidates(q, lang, valid_only, fallback) for q in distinct], max_results,
+        )
+        by_query = dict(zip(distinct, ranked))
+        return [by_query[q] for q in queries]
+    
+    def _rank(self, query: str, lang: str, positions: List[int],
+              max_results: int) -> List[Tuple[EmissionFactorData, float]]:
+        """Score shortlisted positions and keep the best max_results"""
+        return self._rank_many([query.lower()], lang, [positions], max_results)[0]
+    
+    def _rank_many(self, queries_lower: List[str], lang: str, candidate_lists: List[List[int]],
+                   max_results: int) -> List[List[Tuple[EmissionFactorData, float]]]:
+        """Score each query's shortlisted positions, visiting every position once"""
+        if max_results <= 0:
+            return [[] for _ in queries_lower]
+        
+        names = self._names_lower[lang]
+        tags = self._tags_lower[lang]
+        categories = self._categories_lower
+        
+        if len(queries_lower) == 1:
+            visits = ((position, (0,)) for position in candidate_lists[0])
+        else:
+            wanted: Dict[int, List[int]] = {}
+            for index, positions in enumerate(candidate_lists):
+                for position in positions:
+                    wanted.setdefault(position, []).append(index)
+            visits = sorted(wanted.items())
+        
+        # The name is the matcher's second sequence, whose analysis is cached
+        matcher = SequenceMatcher(None, '')
+        # Min-heaps of (score, -position): each root is the weakest kept result
+        heaps: List[List[Tuple[float, int]]] = [[] for _ in queries_lower]
+        
+        for position, indexes in visits:
+            name = names[position]
+            matcher.set_seq2(name)
             
-            # Only include if score is above threshold
-            if score > 0.2:
-                results.append((factor, score))
+            for index in indexes:
+                query_lower = queries_lower[index]
+                heap = heaps[index]
+                
+                # Exact match in name (highest priority)
+                name_bonus = 1.0 if query_lower in name else 0.0
+                # Match in tags
+                tags_bonus = 0.5 if tags[position] and query_lower in tags[position] else 0.0
+                # Match in category
+                category_bonus = 0.3 if query_lower in categories[position] else 0.0
+                
+                matcher.set_seq1(query_lower)
+                floor = heap[0][0] if len(heap) >= max_results else 0.2
+                
+                # quick_ratio() >= ratio(), so this bounds the final score
+                bound = name_bonus + matcher.quick_ratio() * 0.8 + tags_bonus + category_bonus
+                if bound <= floor:
+                    continue
+                
+                # Fuzzy match in name
+                score = name_bonus + matcher.ratio() * 0.8 + tags_bonus + category_bonus
+                
+                # Only include if score is above threshold
+                if score <= floor:
+                    continue
+                
+                if len(heap) >= max_results:
+                    heapq.heapreplace(heap, (score, -position))
+                else:
+                    heapq.heappush(heap, (score, -position))
         
-        # Sort by score (descending)
-        results.sort(key=lambda x: x[1], reverse=True)
+        # Sort by score (descending), ties in load order
+        results = []
+        for heap in heaps:
+            ranked = sorted(heap, key=lambda item: (-item[0], -item[1]))
+            results.append([(self.factors[-neg_position], score) for score, neg_position in ranked])
+        return results
+    
+    def suggest(self, prefix: str, language: str = 'fr', limit: int = 10) -> List[Dict]:
+        """
+        Typeahead completions for a partially typed query
         
-        return results[:max_results]
+        Args:
+            prefix: Text typed so far; its last word may be incomplete
+            language: 'fr' or 'en'
+            limit: Maximum number of completions
+        
+        Returns:
+            List of {'type': 'tag', 'text', 'count'} and
+            {'type': 'factor', 'text', 'id'} dicts, best first
+        """
+        lang = 'fr' if language == 'fr' else 'en'
+        completions = []
+        for payload in self.suggest_index[lang].complete(prefix, limit):
+            if payload[0] == 'tag':
+                completions.append({'type': 'tag', 'text': payload[1], 'count': payload[2]})
+            else:
+                position = payload[1]
+                completions.append({
+                    'type': 'factor',
+                    'text': self._column_value(position, f'name_{lang}'),
+                    'id': self._column_value(position, 'id'),
+                })
+        return completions
+    
+    def find_factor(self, activity_name: str, unit: str, scope=None) -> Optional[EmissionFactorData]:
+        """
+        Automatic factor selection for an activity
+        
+        Only valid factors whose unit converts to ``unit`` are considered.
+        A factor expressed in another unit of the same dimension (per MWh
+        for a quantity in kWh) is returned rescaled to ``unit``.
+        
+        Args:
+            activity_name: Activity description to match against factor names
+            unit: Unit of the activity quantity (aliases such as "litres" accepted)
+            scope: Optional GHG Protocol scope, preferred when breaking ties
+        
+        Returns:
+            Best matching factor, or None
+        """
+        match = self.match_factor(activity_name, unit, scope)
+        return match[0] if match else None
+    
+    def match_factor(self, activity_name: str, unit: str,
+                     scope=None) -> Optional[Tuple[EmissionFactorData, float]]:
+        """Like find_factor(), also returning the match score (for comparing engines)"""
+        match = self.matcher.match(activity_name, unit, scope)
+        if match is None:
+            return None
+        
+        position, score, conversion = match
+        factor = self.factors[position]
+        if conversion == 1.0:
+            return factor, score
+        
+        unit_label = unit.strip()
+        return replace(
+            factor,
+            unit_fr=f"kgCO2e/{unit_label}",
+            unit_en=f"kgCO2e/{unit_label}",
+            **{name: getattr(factor, name) * conversion
+               for name in NUMERIC_FIELDS if getattr(factor, name) is not None},
+        ), score
     
     def search_by_category(self, category: str, exact: bool = False) -> List[EmissionFactorData]:
         """
         Search factors by category
         
+        A non-exact search for the path of a category-tree node
+        ("Combustibles > Fossiles", matched case-sensitively) returns that
+        node's subtree: categories that only contain the path further down
+        ("Achats > Combustibles > Fossiles") are not included. Any other
+        fragment falls back to a case-insensitive substring match on the
+        category codes.
+        
         Args:
             category: Category to search for
             exact: If True, exact match; if False, partial match
@@ -168,22 +541,27 @@ class EmissionFactorSearchEngine:
             List of matching factors
         """
         if exact:
-            return self.by_category.get(category, [])
+            return self._materialize(self.by_category.get(category, []))
+        elif category.strip() and self.category_tree.node(category) is not None:
+            return self._materialize(self.category_tree.positions_under(category))
         else:
             results = []
             category_lower = category.lower()
-            for cat, factors in self.by_category.items():
+            for cat, positions in self.by_category.items():
                 if category_lower in cat.lower():
-                    results.extend(factors)
-            return results
+                    results.extend(positions)
+            return self._materialize(results)
     
     def search_by_source(self, source: str) -> List[EmissionFactorData]:
         """Get all factors from a specific source"""
-        return self.by_source.get(source, [])
+        return self._materialize(self.by_source.get(source, []))
     
     def get_by_id(self, factor_id: str) -> Optional[EmissionFactorData]:
         """Get factor by ADEME ID"""
-        return self.by_id.get(factor_id)
+        position = self.by_id.get(factor_id)
+        if position is None:
+            return None
+        return self.factors[position]
     
     def get_categories(self) -> List[str]:
         """Get all unique categories"""
@@ -194,35 +572,114 @@ class EmissionFactorSearchEngine:
         return sorted(list(self.by_source.keys()))
 
 
+def default_csv_path() -> str:
+    """Official ADEME CSV shipped with the application"""
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_dir, 'data', 'Base_Carbone_V23.6.csv')
+
+
+def reload_stamp_path(csv_path: str) -> str:
+    """Stamp file whose change asks every process to reload (stored alongside the CSV)"""
+    return f"{csv_path}.reload"
+
+
 class ADEMEEmissionFactorLoader:
     """
     Loads and manages emission factors from official ADEME Base Carbone CSV
     """
     
-    def __init__(self, csv_path: Optional[str] = None):
+    def __init__(self, csv_path: Optional[str] = None, snapshot_path: Optional[str] = None,
+                 use_snapshot: bool = True, shared_store: Optional[bool] = None):
         """
         Initialize the loader
         
         Args:
             csv_path: Path to ADEME CSV file. If None, uses default
+            snapshot_path: Path to the binary snapshot. If None, stored next to the CSV
+            use_snapshot: Read and write the snapshot cache
+            shared_store: Serve factors from a memory-mapped store shared by
+                all worker processes. If None, enabled by the
+                FACTOR_SHARED_STORE=1 environment variable
         """
         if csv_path is None:
-            # Default to official ADEME CSV
-            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            csv_path = os.path.join(base_dir, 'data', 'Base_Carbone_V23.6.csv')
+            csv_path = default_csv_path()
+        
+        if shared_store is None:
+            shared_store = os.environ.get('FACTOR_SHARED_STORE', '0') == '1'
         
         self.csv_path = csv_path
-        self.factors: List[EmissionFactorData] = []
+        self.snapshot_path = snapshot_path or default_snapshot_path(csv_path)
+        self.store_path = default_store_path(csv_path)
+        self.use_snapshot = use_snapshot
+        self.shared_store = shared_store
+        self.factors: Sequence[EmissionFactorData] = []
         self.search_engine: Optional[EmissionFactorSearchEngine] = None
         
         if os.path.exists(csv_path):
             self.load_factors()
     
     def load_factors(self):
-        """Load emission factors from official ADEME CSV"""
-        self.factors = []
+        """
+        Load emission factors from official ADEME CSV
+        
+        Reuses the binary snapshot when it matches the CSV (same mtime and
+        hash); otherwise parses the CSV and refreshes the snapshot. Factors
+        are held in a CompactFactorTable or, with the shared store enabled,
+        served from the memory-mapped store file, which is (re)built from
+        the parsed rows when stale.
+        """
+        factors = self._open_shared_store() if self.shared_store else None
+        
+        if factors is None:
+            rows = self._load_rows()
+            if self.shared_store:
+                write_store(self.store_path, csv_fingerprint(self.csv_path), FACTOR_FIELDS,
+                            NUMERIC_FIELDS, rows)
+                factors = self._open_shared_store()
+            if factors is None:
+                factors = CompactFactorTable(FACTOR_FIELDS, NUMERIC_FIELDS, rows, EmissionFactorData)
+        
+        # Build search engine, then publish factors and engine together
+        search_engine = EmissionFactorSearchEngine(factors)
+        self.factors = factors
+        self.search_engine = search_engine
+        
+        print(f"✅ Loaded {len(self.factors)} emission factors from ADEME Base Carbone V23.6")
+        
+        # Print statistics
+        archived_count = self.search_engine.count_archived()
+        valid_count = len(self.factors) - archived_count
+        print(f"   - Valid: {valid_count}")
+        print(f"   - Archived: {archived_count}")
+        print(f"   - Categories: {len(self.search_engine.get_categories())}")
+        print(f"   - Sources: {len(self.search_engine.get_sources())}")
+        print(f"   - Indexed terms: {len(self.search_engine.trigram_index.term_sizes)}")
+    
+    def _open_shared_store(self) -> Optional[FactorTable]:
+        """Map the shared store if it was built from the current CSV"""
+        store = open_store(self.store_path, csv_fingerprint(self.csv_path))
+        if store is None:
+            return None
+        print(f"📂 Mapping shared ADEME factor store: {self.store_path}")
+        return FactorTable(store, EmissionFactorData)
+    
+    def _load_rows(self) -> List[Tuple]:
+        """Load factor rows from the snapshot, or parse the CSV and refresh it"""
+        rows = read_snapshot(self.csv_path, self.snapshot_path) if self.use_snapshot else None
+        
+        if rows is not None:
+            print(f"📂 Loading ADEME Base Carbone snapshot from: {self.snapshot_path}")
+            return rows
         
         print(f"📂 Loading ADEME Base Carbone from: {self.csv_path}")
+        rows = [f.to_row() for f in self._parse_csv()]
+        if self.use_snapshot:
+            write_snapshot(self.csv_path, self.snapshot_path, rows)
+        return rows
+    
+    def _parse_csv(self) -> List[EmissionFactorData]:
+        """Parse emission factors from the ADEME CSV"""
+        factors = []
         
         # ADEME CSV uses latin-1 encoding (ISO-8859-1)
         with open(self.csv_path, 'r', encoding='latin-1') as f:
@@ -278,32 +735,56 @@ class ADEMEEmissionFactorLoader:
                         comment_en=row.get('Commentaire anglais', ''),
                     )
                     
-                    self.factors.append(factor)
+                    factors.append(factor)
                     
                 except Exception as e:
                     # Skip invalid rows
                     continue
         
-        # Build search engine
-        self.search_engine = EmissionFactorSearchEngine(self.factors)
-        
-        print(f"✅ Loaded {len(self.factors)} emission factors from ADEME Base Carbone V23.6")
-        
-        # Print statistics
-        valid_count = sum(1 for f in self.factors if f.status != 'Archivé')
-        archived_count = len(self.factors) - valid_count
-        print(f"   - Valid: {valid_count}")
-        print(f"   - Archived: {archived_count}")
-        print(f"   - Categories: {len(self.search_engine.get_categories())}")
-        print(f"   - Sources: {len(self.search_engine.get_sources())}")
+        return factors
     
-    def search(self, query: str, language: str = 'fr', max_results: int = 20) -> List[Tuple[EmissionFactorData, float]]:
+    def search(self, query: str, language: str = 'fr', max_results: int = 20,
+               valid_only: bool = True,
+               filters: Optional[Dict[str, Iterable[str]]] = None) -> List[Tuple[EmissionFactorData, float]]:
         """Search for emission factors"""
         if not self.search_engine:
             return []
-        return self.search_engine.search(query, language, max_results)
+        return self.search_engine.search(query, language, max_results, valid_only, filters)
+    
+    def search_many(self, queries: Sequence[str], language: str = 'fr', max_results: int = 20,
+                    valid_only: bool = True) -> List[List[Tuple[EmissionFactorData, float]]]:
+        """Run several searches in one pass"""
+        if not self.search_engine:
+            return [[] for _ in queries]
+        return self.search_engine.search_many(queries, language, max_results, valid_only)
+    
+    def faceted_search(self, query: str, language: str = 'fr', max_results: int = 20,
+                       valid_only: bool = True, filters: Optional[Dict[str, Iterable[str]]] = None
+                       ) -> Tuple[List[Tuple[EmissionFactorData, float]], Dict[str, Dict[str, int]]]:
+        """Search for emission factors, with facet counts"""
+        if not self.search_engine:
+            return [], {}
+        return self.search_engine.faceted_search(query, language, max_results, valid_only, filters)
+    
+    def suggest(self, prefix: str, language: str = 'fr', limit: int = 10) -> List[Dict]:
+        """Typeahead completions for factor names and tags"""
+        if not self.search_engine:
+            return []
+        return self.search_engine.suggest(prefix, language, limit)
+    
+    def find_factor(self, activity_name: str, unit: str, scope=None) -> Optional[EmissionFactorData]:
+        """Best valid factor for an activity name, unit and scope"""
+        if not self.search_engine:
+            return None
+        return self.search_engine.find_factor(activity_name, unit, scope)
     
-    def get_all_factors(self) -> List[EmissionFactorData]:
+    def get_category_tree(self) -> Optional[CategoryTree]:
+        """Category hierarchy of the loaded factors"""
+        if not self.search_engine:
+            return None
+        return self.search_engine.category_tree
+    
+    def get_all_factors(self) -> Sequence[EmissionFactorData]:
         """Get all loaded emission factors"""
         return self.factors
     
@@ -314,20 +795,264 @@ class ADEMEEmissionFactorLoader:
         return self.search_engine.get_by_id(factor_id)
 
 
-# Global loader instance (lazy-loaded)
+# Global loader instance (built once, by a single warm-up thread, and
+# replaced wholesale by reloads; never mutated while readers hold it)
 _global_loader: Optional[ADEMEEmissionFactorLoader] = None
+_loader_version = 0
+_stamp_seen: Optional[str] = None  # reload stamp the current loader was built after
+_loader_error: Optional[BaseException] = None
+_loader_lock = threading.Lock()
+_loader_ready = threading.Event()
+_warm_up_thread: Optional[threading.Thread] = None
+_reload_lock = threading.Lock()
+_reload_thread: Optional[threading.Thread] = None
+_watcher_thread: Optional[threading.Thread] = None
+_reload_listeners: List = []
+
+
+def _read_stamp(csv_path: str) -> Optional[str]:
+    try:
+        with open(reload_stamp_path(csv_path), 'r') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _warm_up():
+    """Build the global loader (runs on the warm-up thread)"""
+    global _global_loader, _loader_error, _loader_version, _stamp_seen
+    try:
+        version = _loader_version
+        csv_path = default_csv_path()
+        stamp = _read_stamp(csv_path)
+        loader = ADEMEEmissionFactorLoader(csv_path)
+        with _loader_lock:
+            # A reload finished meanwhile: its loader is newer, keep it
+            if _loader_version == version:
+                _global_loader = loader
+                _loader_version += 1
+                _stamp_seen = stamp
+    except Exception as e:
+        _loader_error = e
+        print(f"❌ Failed to load ADEME emission factors: {e}")
+    finally:
+        _loader_ready.set()
+
+
+def start_warm_up() -> Optional[threading.Thread]:
+    """
+    Start loading the global loader on a background thread
+    
+    Idempotent: while a warm-up is running, or once the loader is ready,
+    no new thread is started. A failed warm-up is retried.
+    
+    Returns:
+        The warm-up thread, or None if the loader is already available
+    """
+    global _warm_up_thread, _loader_error
+    with _loader_lock:
+        if _global_loader is not None:
+            return None
+        if _warm_up_thread is not None and _warm_up_thread.is_alive():
+            return _warm_up_thread
+        
+        _loader_error = None
+        _loader_ready.clear()
+        _warm_up_thread = threading.Thread(target=_warm_up, name='factor-warm-up', daemon=True)
+        _warm_up_thread.start()
+        return _warm_up_thread
 
 
-def get_loader() -> ADEMEEmissionFactorLoader:
-    """Get global ADEME emission factor loader instance"""
-    global _global_loader
+def preload_factors() -> Optional[ADEMEEmissionFactorLoader]:
+    """
+    Build the global loader in the calling thread, before workers are forked
+    
+    Meant for the gunicorn master (see gunicorn.conf.py): forked workers
+    inherit the factor table, every search index and the lowercased columns
+    as copy-on-write pages instead of each building a private copy. The
+    collector is then frozen, so that workers' GC passes do not write to
+    (and so copy) the pages holding those objects.
+    
+    Returns:
+        The loader, or None if it failed to load
+    """
     if _global_loader is None:
-        _global_loader = ADEMEEmissionFactorLoader()
+        _warm_up()
+    if _global_loader is not None:
+        gc.freeze()
     return _global_loader
 
 
-def reload_factors():
-    """Reload emission factors from CSV"""
-    global _global_loader
+def get_loader(timeout: Optional[float] = None) -> ADEMEEmissionFactorLoader:
+    """
+    Get global ADEME emission factor loader instance
+    
+    Starts the warm-up if nobody has yet and waits for it, so concurrent
+    first requests share a single CSV parse.
+    
+    Raises:
+        RuntimeError: If the loader failed or is not ready within timeout
+    """
     if _global_loader is not None:
-        _global_loader.load_factors()
+        return _global_loader
+    
+    start_warm_up()
+    if not _loader_ready.wait(timeout):
+        raise RuntimeError("ADEME emission factors are still loading")
+    if _global_loader is None:
+        raise RuntimeError("ADEME emission factors failed to load") from _loader_error
+    return _global_loader
+
+
+def loader_status() -> Dict:
+    """Readiness of the global loader (for health checks)"""
+    loader = _global_loader
+    return {
+        'ready': loader is not None,
+        'loading': loader is None and _warm_up_thread is not None and _warm_up_thread.is_alive(),
+        'error': str(_loader_error) if _loader_error else None,
+        'factors': len(loader.factors) if loader else 0,
+        'version': _loader_version,
+        'reloading': _reload_thread is not None and _reload_thread.is_alive(),
+    }
+
+
+def get_loader_version() -> int:
+    """Version counter, incremented each time a new loader is published"""
+    return _loader_version
+
+
+def on_reload(callback):
+    """Register a callback run after reload_factors() publishes a new loader"""
+    _reload_listeners.append(callback)
+    return callback
+
+
+def _reset_after_fork():
+    """Forked workers do not inherit background threads; let them start their own"""
+    global _loader_lock, _loader_ready, _warm_up_thread, _reload_lock, _reload_thread, _watcher_thread
+    if _global_loader is None:
+        _loader_lock = threading.Lock()
+        _loader_ready = threading.Event()
+        _warm_up_thread = None
+    _reload_lock = threading.Lock()
+    _reload_thread = None
+    _watcher_thread = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def reload_factors() -> int:
+    """
+    Reload emission factors from CSV (copy-on-write)
+    
+    The new loader and all its indexes are built off to the side while
+    readers keep using the current one, then published with a single
+    reference swap. Requests holding the old loader finish on a consistent
+    view; new requests see the new one.
+    
+    Returns:
+        The new loader version
+    """
+    global _global_loader, _loader_version, _loader_error, _stamp_seen
+    with _reload_lock:
+        current = _global_loader
+        csv_path = current.csv_path if current else default_csv_path()
+        stamp = _read_stamp(csv_path)
+        new_loader = ADEMEEmissionFactorLoader(csv_path)
+        
+        with _loader_lock:
+            _global_loader = new_loader
+            _loader_version += 1
+            version = _loader_version
+            _stamp_seen = stamp
+            _loader_error = None
+            _loader_ready.set()
+        
+        print(f"🔄 ADEME emission factors reloaded (version {version})")
+        for callback in _reload_listeners:
+            callback()
+        return version
+
+
+def start_reload() -> threading.Thread:
+    """Run reload_factors() on a background thread (idempotent while running)"""
+    global _reload_thread
+    with _loader_lock:
+        if _reload_thread is not None and _reload_thread.is_alive():
+            return _reload_thread
+        _reload_thread = threading.Thread(target=reload_factors, name='factor-reload', daemon=True)
+        _reload_thread.start()
+        return _reload_thread
+
+
+def request_reload() -> threading.Thread:
+    """
+    Reload emission factors in every worker process
+    
+    Writes a new token to the reload stamp file, which the file watcher of
+    each process polls, then starts this process's reload right away (its
+    watcher sees the stamp as already handled).
+    
+    Returns:
+        The local reload thread
+    """
+    loader = _global_loader
+    csv_path = loader.csv_path if loader else default_csv_path()
+    path = reload_stamp_path(csv_path)
+    try:
+        with open(f"{path}.{os.getpid()}", 'w') as f:
+            f.write(f"{os.getpid()}-{time.time_ns()}")
+        os.replace(f"{path}.{os.getpid()}", path)
+    except OSError as e:
+        print(f"❌ Failed to signal the other workers to reload: {e}")
+    return start_reload()
+
+
+def _csv_signature(csv_path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(csv_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _watch(interval: float):
+    """Poll the CSV and the reload stamp, and reload when either changes (runs on the watcher thread)"""
+    loader = get_loader()
+    last_seen = _csv_signature(loader.csv_path)
+    last_stamp = _stamp_seen
+    while True:
+        time.sleep(interval)
+        csv_path = get_loader().csv_path
+        signature = _csv_signature(csv_path)
+        stamp = _read_stamp(csv_path)
+        changed = signature is not None and signature != last_seen
+        requested = stamp is not None and stamp not in (last_stamp, _stamp_seen)
+        if changed or requested:
+            if changed:
+                last_seen = signature
+            last_stamp = stamp
+            try:
+                reload_factors()
+            except Exception as e:
+                print(f"❌ Failed to reload ADEME emission factors: {e}")
+
+
+def start_file_watcher(interval: float) -> threading.Thread:
+    """
+    Reload emission factors whenever the CSV's mtime or size changes, or
+    another process asks for it with request_reload()
+    
+    Args:
+        interval: Polling period in seconds
+    """
+    global _watcher_thread
+    with _loader_lock:
+        if _watcher_thread is not None and _watcher_thread.is_alive():
+            return _watcher_thread
+        _watcher_thread = threading.Thread(target=_watch, args=(interval,), name='factor-watcher', daemon=True)
+        _watcher_thread.start()
+        return _watcher_thread
@@ -0,0 +1,103 @@
+"""
+ADEME Category Tree
+Parses the "A > B > C" category codes of the Base Carbone into a tree whose
+nodes cover contiguous ranges of a single position array, so "every factor
+under this node" is one slice and "children of this node" one dict lookup.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+CATEGORY_SEPARATOR = '>'
+
+
+def split_category(category: str) -> Tuple[str, ...]:
+    """Split a category code into its stripped, non-empty parts"""
+    return tuple(part.strip() for part in (category or '').split(CATEGORY_SEPARATOR) if part.strip())
+
+
+class CategoryNode:
+    """One level of the category tree"""
+
+    __slots__ = ('name', 'path', 'children', 'start', 'end')
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.children: Dict[str, 'CategoryNode'] = {}
+        self.start = 0
+        self.end = 0
+
+    @property
+    def count(self) -> int:
+        """Number of factors under this node"""
+        return self.end - self.start
+
+    def to_dict(self) -> Dict:
+        """Convert to dictionary (without descendants)"""
+        return {
+            'name': self.name,
+            'path': self.path,
+            'count': self.count,
+            'has_children': bool(self.children),
+        }
+
+
+class CategoryTree:
+    """
+    Category hierarchy over factor positions
+
+    Positions are stored in depth-first order of their category, so each
+    node's factors are ``positions[node.start:node.end]``. Nodes are found
+    by path in a dict keyed on the exact path parts, so categories that
+    differ only in case stay separate nodes.
+    """
+
+    def __init__(self, postings: Dict[str, Iterable[int]]):
+        """
+        Args:
+            postings: Category code -> positions of the factors in it
+        """
+        self.root = CategoryNode('', '')
+        self.positions: List[int] = []
+        self._nodes: Dict[Tuple[str, ...], CategoryNode] = {(): self.root}
+        self._leaf_positions: Dict[Tuple[str, ...], List[int]] = {}
+
+        for category, positions in postings.items():
+            parts = split_category(category)
+            if not parts:
+                continue
+            node = self.root
+            for depth, part in enumerate(parts, start=1):
+                child = node.children.get(part)
+                if child is None:
+                    child = node.children[part] = CategoryNode(part, ' > '.join(parts[:depth]))
+                    self._nodes[parts[:depth]] = child
+                node = child
+            self._leaf_positions.setdefault(parts, []).extend(positions)
+
+        self._assign_ranges(self.root, ())
+        self._leaf_positions = {}
+
+    def _assign_ranges(self, node: CategoryNode, parts: Tuple[str, ...]):
+        """Lay out positions depth-first, recording each node's range"""
+        node.start = len(self.positions)
+        self.positions.extend(sorted(self._leaf_positions.get(parts, ())))
+        node.children = dict(sorted(node.children.items()))
+        for name, child in node.children.items():
+            self._assign_ranges(child, parts + (name,))
+        node.end = len(self.positions)
+
+    def node(self, path: str) -> Optional[CategoryNode]:
+        """Node for a category path ("" is the root), spaces around ">" ignored"""
+        return self._nodes.get(split_category(path))
+
+    def children(self, path: str) -> List[CategoryNode]:
+        """Child nodes of a path, by name (empty for unknown paths)"""
+        node = self.node(path)
+        return list(node.children.values()) if node else []
+
+    def positions_under(self, path: str) -> List[int]:
+        """Positions of every factor in the path's subtree"""
+        node = self.node(path)
+        return self.positions[node.start:node.end] if node else []
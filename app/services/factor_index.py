@@ -0,0 +1,324 @@
+"""
+Text Indexing for the Emission Factor Search Engine
+Accent-folded tokenisation, an inverted token index with prefix lookup and
+a character-trigram index for typo-tolerant term matching, used to shortlist
+candidate factors before fuzzy scoring, a sorted-array prefix index
+serving typeahead completions and facet indexes for filtering and counts
+"""
+
+import heapq
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+
+# Tokens shorter than this are too common to narrow the candidate set
+MIN_TOKEN_LENGTH = 2
+
+# Minimum Dice coefficient for a term to count as a typo of the query token
+TRIGRAM_THRESHOLD = 0.5
+
+# Maximum number of corrections considered per unknown query token
+MAX_TERM_EXPANSIONS = 10
+
+# Prefixes matching more keys than this get precomputed top completions
+MAX_SCANNED_KEYS = 64
+
+# Completions kept per precomputed prefix (upper bound for a suggest limit)
+MAX_COMPLETIONS = 20
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Ligatures that NFKD does not decompose
+_LIGATURES = str.maketrans({'œ': 'oe', 'æ': 'ae', 'ß': 'ss'})
+
+
+def fold_text(text: str) -> str:
+    """Lowercase and strip accents (e.g. "Électricité" -> "electricite")"""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text.lower().translate(_LIGATURES))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into accent-folded alphanumeric tokens"""
+    return [t for t in _TOKEN_RE.findall(fold_text(text)) if len(t) >= MIN_TOKEN_LENGTH]
+
+
+def trigrams(token: str) -> Set[str]:
+    """Padded character trigrams of a token ("gaz" -> "  g", " ga", "gaz", "az ")"""
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Character-trigram index over the term vocabulary
+
+    Maps each trigram to the terms containing it, so the closest spellings
+    of a misspelt token are found with one probe per trigram rather than a
+    scan of every factor.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, List[str]] = {}
+        self.term_sizes: Dict[str, int] = {}
+
+    def add(self, *texts: str):
+        """Index every token of the given texts"""
+        for text in texts:
+            for token in tokenize(text):
+                if token in self.term_sizes:
+                    continue
+                grams = trigrams(token)
+                self.term_sizes[token] = len(grams)
+                for gram in grams:
+                    self.postings.setdefault(gram, []).append(token)
+
+    def similar(self, token: str, threshold: float = TRIGRAM_THRESHOLD,
+                limit: int = MAX_TERM_EXPANSIONS) -> List[Tuple[str, float]]:
+        """
+        Find indexed terms similar to a token
+
+        Returns:
+            List of (term, dice) tuples with Dice coefficient >= threshold,
+            best first
+        """
+        grams = trigrams(token)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+
+        results = []
+        for term, count in shared.items():
+            dice = 2 * count / (len(grams) + self.term_sizes[term])
+            if dice >= threshold:
+                results.append((term, dice))
+
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results[:limit]
+
+    def containing(self, fragment: str) -> List[str]:
+        """
+        Find indexed terms containing a fragment anywhere ("lectri" -> "electricite")
+
+        Candidate terms are those holding every trigram of the fragment, so
+        fragments shorter than three characters find nothing.
+        """
+        grams = {fragment[i:i + 3] for i in range(len(fragment) - 2)}
+        if not grams:
+            return []
+        postings = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+        terms = set(postings[0])
+        for terms_with_gram in postings[1:]:
+            if not terms:
+                break
+            terms.intersection_update(terms_with_gram)
+        return [term for term in terms if fragment in term]
+
+
+class InvertedIndex:
+    """
+    Inverted index mapping folded tokens to sorted lists of document positions
+
+    Query tokens are matched as prefixes of indexed tokens so that partial
+    words typed in the factor wizard ("elec", "gaz") already hit, and through
+    the optional trigram index as fragments anywhere in a token ("lectri",
+    "gaz" in "biogaz"). Tokens with no match are corrected through the
+    trigram index.
+    """
+
+    def __init__(self, trigram_index: Optional[TrigramIndex] = None):
+        self.postings: Dict[str, List[int]] = {}
+        self.vocabulary: List[str] = []
+        self.trigram_index = trigram_index
+
+    def add(self, doc_id: int, *texts: str):
+        """Index a document; doc_ids must be added in increasing order"""
+        tokens = set()
+        for text in texts:
+            tokens.update(tokenize(text))
+        for token in tokens:
+            self.postings.setdefault(token, []).append(doc_id)
+
+    def finalize(self):
+        """Sort the vocabulary for prefix lookups (call once after all adds)"""
+        self.vocabulary = sorted(self.postings)
+
+    def expand_prefix(self, prefix: str) -> List[str]:
+        """Return all indexed tokens starting with prefix"""
+        start = bisect_left(self.vocabulary, prefix)
+        matches = []
+        for token in self.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            matches.append(token)
+        return matches
+
+    def lookup(self, token: str) -> Set[int]:
+        """Return positions of documents with a token starting with, or containing, token"""
+        positions: Set[int] = set()
+        for match in self.expand_prefix(token):
+            positions.update(self.postings[match])
+        if self.trigram_index is not None:
+            for match in self.trigram_index.containing(token):
+                positions.update(self.postings.get(match, ()))
+        return positions
+
+    def lookup_fuzzy(self, token: str) -> Set[int]:
+        """Like lookup, falling back to trigram-similar terms for typos"""
+        positions = self.lookup(token)
+        if positions or self.trigram_index is None:
+            return positions
+        for term, _ in self.trigram_index.similar(token):
+            positions.update(self.postings.get(term, ()))
+        return positions
+
+    def candidates(self, query: str) -> List[int]:
+        """
+        Shortlist document positions for a free-text query
+
+        Documents matching every recognised query token are preferred; if no
+        document matches them all, the union is returned instead. Query tokens
+        unknown to the index, even after typo correction, are ignored.
+
+        Returns:
+            Sorted list of positions (empty if no query token is indexed)
+        """
+        token_sets = [s for s in (self.lookup_fuzzy(t) for t in set(tokenize(query))) if s]
+        if not token_sets:
+            return []
+
+        token_sets.sort(key=len)
+        result = set(token_sets[0])
+        for positions in token_sets[1:]:
+            result &= positions
+            if not result:
+                break
+
+        if not result:
+            result = set().union(*token_sets)
+
+        return sorted(result)
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index for typeahead completions
+
+    Each phrase (a factor name or tag) is keyed by its folded text from every
+    word start, so "mix" completes "Électricité - mix moyen". A query is one
+    bisect into the sorted keys followed by a scan of at most MAX_SCANNED_KEYS
+    keys; the best completions of prefixes matching more keys than that are
+    precomputed in finalize(). Lower ranks come first.
+    """
+
+    def __init__(self):
+        self.payloads: List[Any] = []
+        self._ranks: List[Any] = []
+        self._entries: List[Tuple[str, int]] = []
+        self.keys: List[str] = []
+        self._frequent: Dict[str, List[int]] = {}
+
+    def add(self, text: str, rank: Any, payload: Any):
+        """Index a phrase under a comparable rank; payload is what complete() returns"""
+        folded = ' '.join(_TOKEN_RE.findall(fold_text(text)))
+        if not folded:
+            return
+        entry = len(self.payloads)
+        self.payloads.append(payload)
+        self._ranks.append(rank)
+        for match in _TOKEN_RE.finditer(folded):
+            self._entries.append((folded[match.start():], entry))
+
+    def finalize(self):
+        """Sort the keys and precompute frequent prefixes (call once after all adds)"""
+        self._entries.sort()
+        self.keys = keys = [key for key, _ in self._entries]
+        self._frequent = {}
+
+        # Split key ranges one character at a time, descending only into
+        # ranges too large to scan at query time
+        ranges = [('', 0, len(keys))]
+        while ranges:
+            prefix, start, end = ranges.pop()
+            length = len(prefix) + 1
+            position = start
+            while position < end:
+                if len(keys[position]) < length:
+                    position += 1
+                    continue
+                extended = keys[position][:length]
+                stop = bisect_left(keys, extended + '\uffff', position, end)
+                if stop - position > MAX_SCANNED_KEYS:
+                    self._frequent[extended] = self._best(
+                        {entry for _, entry in self._entries[position:stop]}, MAX_COMPLETIONS
+                    )
+                    ranges.append((extended, position, stop))
+                position = stop
+
+    def _best(self, entries, limit: int) -> List[int]:
+        ranks = self._ranks
+        return heapq.nsmallest(limit, entries, key=lambda entry: (ranks[entry], entry))
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Any]:
+        """
+        Return payloads of the best phrases with a word starting with prefix
+
+        Returns:
+            Up to limit (at most MAX_COMPLETIONS) payloads, lowest rank first
+        """
+        query = ' '.join(_TOKEN_RE.findall(fold_text(prefix)))
+        if not query or limit <= 0:
+            return []
+
+        limit = min(limit, MAX_COMPLETIONS)
+        entries = self._frequent.get(query)
+        if entries is not None:
+            entries = entries[:limit]
+        else:
+            start = bisect_left(self.keys, query)
+            end = bisect_left(self.keys, query + '\uffff', start)
+            entries = self._best({entry for _, entry in self._entries[start:end]}, limit)
+
+        return [self.payloads[entry] for entry in entries]
+
+
+class FacetIndex:
+    """
+    Posting lists and per-position value ids for one facet field
+
+    ``postings`` maps each value to the sorted positions carrying it;
+    ``value_ids`` maps each position to its value's id, so filtering or
+    counting a hit list costs one array read per hit rather than a scan of
+    every factor.
+    """
+
+    def __init__(self, column: Sequence[str]):
+        self.values: List[str] = []
+        self.postings: Dict[str, List[int]] = {}
+        self.value_ids = array('I')
+        ids: Dict[str, int] = {}
+        for position, value in enumerate(column):
+            value_id = ids.get(value)
+            if value_id is None:
+                value_id = ids[value] = len(self.values)
+                self.values.append(value)
+                self.postings[value] = []
+            self.postings[value].append(position)
+            self.value_ids.append(value_id)
+        self._ids = ids
+
+    def ids_for(self, values: Iterable[str]) -> Set[int]:
+        """Value ids of the given values (unknown values are ignored)"""
+        return {self._ids[v] for v in values if v in self._ids}
+
+    def count(self, positions: Iterable[int]) -> Dict[str, int]:
+        """Number of positions per value, most frequent first"""
+        counts = Counter(self.value_ids[p] for p in positions)
+        return {self.values[value_id]: n for value_id, n in
+                sorted(counts.items(), key=lambda item: (-item[1], self.values[item[0]]))}
@@ -0,0 +1,243 @@
+"""
+Unit-Aware Emission Factor Matcher
+Automatic factor selection for an (activity name, unit, scope) triple, as
+needed by bulk imports. Units are normalised through an alias table so that
+"MWh", "litres" or "tonne-km" meet the ADEME spellings, factors are indexed
+by unit dimension and by the scope implied by their category, and only the
+token-index candidates of the requested dimension with the best score upper
+bounds have their names compared in full. Results are memoised per triple,
+so the repeated rows of an import cost a dict lookup each.
+"""
+
+import heapq
+import re
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from app.services.factor_categories import split_category
+from app.services.factor_index import fold_text, tokenize
+from app.utils.cache import LRUCache
+
+
+# Canonical unit -> (dimension, size in the dimension's base unit), with aliases
+UNIT_ALIASES = {
+    'kwh': (('energy', 1.0), ('kwh', 'kilowattheure', 'kilowatt-hour', 'kwhpci', 'kwhpcs')),
+    'mwh': (('energy', 1e3), ('mwh', 'megawattheure', 'megawatt-hour', 'mwhpci', 'mwhpcs')),
+    'gwh': (('energy', 1e6), ('gwh', 'gwhpci', 'gwhpcs')),
+    'gj': (('energy', 1e3 / 3.6), ('gj', 'gigajoule', 'gjpci', 'gjpcs')),
+    'l': (('volume', 1.0), ('l', 'litre', 'litres', 'liter', 'liters')),
+    'm3': (('volume', 1e3), ('m3', 'metrecube', 'cubicmetre', 'cubicmeter')),
+    'kg': (('mass', 1.0), ('kg', 'kilogramme', 'kilogram', 'kilo')),
+    't': (('mass', 1e3), ('t', 'tonne', 'tonnes', 'ton', 'tons')),
+    'km': (('distance', 1.0), ('km', 'kilometre', 'kilometer', 'vehicule.km', 'vehicle.km')),
+    't.km': (('freight', 1.0), ('t.km', 'tkm', 'tonne.km', 'tonnes.km', 'tonne-km', 'tonnekm',
+                                'tonne-kilometre', 't-km')),
+    'p.km': (('passenger', 1.0), ('p.km', 'pkm', 'passager.km', 'passenger.km', 'voyageur.km')),
+    'eur': (('money', 1.0), ('eur', 'euro', 'euros', '€')),
+    'keur': (('money', 1e3), ('keur', 'k€', 'keuro', 'keuros')),
+}
+
+_UNITS = {
+    alias: (canonical, dimension)
+    for canonical, (dimension, aliases) in UNIT_ALIASES.items()
+    for alias in aliases
+}
+
+# ADEME category roots -> the GHG Protocol scope their factors usually fall in
+CATEGORY_SCOPES = {
+    'combustibles': 1,
+    'process et emissions fugitives': 1,
+    'electricite': 2,
+    'reseaux de chaleur / froid': 2,
+    'reseaux de chaleur': 2,
+    'transport de marchandises': 3,
+    'transport de personnes': 3,
+    'achats de biens': 3,
+    'achats de services': 3,
+    'traitement des dechets': 3,
+    'dechets': 3,
+}
+
+# Name similarity (mean of the SequenceMatcher ratio and the share of query
+# words found in the name) below this is not an acceptable automatic match
+MIN_MATCH_SCORE = 0.4
+
+# Bonus for factors whose category implies the requested scope
+SCOPE_BONUS = 0.2
+
+# Bonus for factors already in the requested unit (no conversion needed)
+SAME_UNIT_BONUS = 0.1
+
+# Most candidates whose names are compared in full, best upper bounds first
+MAX_SCORED_CANDIDATES = 64
+
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_unit(unit: str) -> Tuple[Optional[str], Optional[Tuple[str, float]]]:
+    """
+    Normalise a unit or an ADEME factor unit ("kgCO2e/kWh PCI")
+
+    Returns:
+        (canonical unit, (dimension, size)), or (None, None) if unknown
+    """
+    text = fold_text(unit or '')
+    if '/' in text:
+        text = text.rsplit('/', 1)[1]
+    text = _SPACES_RE.sub('', text)
+    return _UNITS.get(text, (None, None))
+
+
+def normalize_scope(scope: Union[int, str, None, object]) -> Optional[int]:
+    """Scope number from 1, "Scope 1" or an EmissionScope member"""
+    value = getattr(scope, 'value', scope)
+    match = re.search(r"[123]", str(value)) if value is not None else None
+    return int(match.group()) if match else None
+
+
+def scope_for_category(category: str) -> Optional[int]:
+    """Scope implied by an ADEME category's root, if any"""
+    parts = split_category(category)
+    return CATEGORY_SCOPES.get(fold_text(parts[0])) if parts else None
+
+
+def _coverage(tokens: List[str], words: List[str]) -> float:
+    """Share of query tokens that start one of the words"""
+    if not tokens:
+        return 0.0
+    return sum(any(w.startswith(t) for w in words) for t in tokens) / len(tokens)
+
+
+def _length_ratio(a: int, b: int) -> float:
+    """SequenceMatcher.real_quick_ratio() of strings of these lengths"""
+    return 2.0 * min(a, b) / (a + b) if a + b else 1.0
+
+
+class FactorMatcher:
+    """
+    Best valid factor for an activity name, unit and scope
+
+    Valid factors are indexed once into posting sets per (unit dimension,
+    scope), with their accent-folded names and words. A lookup intersects
+    the token-index candidates with the posting set of the requested
+    dimension, ranks them by an upper bound of their score computed from
+    name lengths and word coverage, and compares at most
+    MAX_SCORED_CANDIDATES names in full, stopping as soon as no remaining
+    bound can beat the best match.
+    """
+
+    def __init__(self, engine, cache_size: int = 4096):
+        """
+        Args:
+            engine: EmissionFactorSearchEngine whose factors are matched
+            cache_size: Memoised (name, unit, scope) lookups
+        """
+        self.engine = engine
+        unit_facet = engine.facets['unit']
+        category_facet = engine.facets['category']
+        self._unit_ids = unit_facet.value_ids
+        self._category_ids = category_facet.value_ids
+        self._value_units = [normalize_unit(value) for value in unit_facet.values]
+        self._value_scopes = [scope_for_category(value) for value in category_facet.values]
+
+        # (dimension, scope) -> positions of the valid factors; scope None holds them all
+        self.postings: Dict[Tuple[str, Optional[int]], Set[int]] = {}
+        # Per language, (folded name, words) of every factor in the postings
+        self._names: Dict[str, List[Optional[Tuple[str, List[str]]]]] = {
+            lang: [None] * len(self._unit_ids) for lang in ('fr', 'en')
+        }
+        archived = engine._archived
+        for position in range(len(self._unit_ids)):
+            if archived[position]:
+                continue
+            _, unit = self._value_units[self._unit_ids[position]]
+            if unit is None:
+                continue
+            scope = self._value_scopes[self._category_ids[position]]
+            for key in ((unit[0], scope), (unit[0], None)) if scope else ((unit[0], None),):
+                self.postings.setdefault(key, set()).add(position)
+            for lang, names in self._names.items():
+                folded = fold_text(engine._names_lower[lang][position])
+                names[position] = (folded, tokenize(folded))
+
+        self._cache = LRUCache(cache_size)
+
+    def match(self, activity_name: str, unit: str,
+              scope=None) -> Optional[Tuple[int, float, float]]:
+        """
+        Find the best factor for an activity
+
+        Args:
+            activity_name: Free-text activity description
+            unit: Unit the activity quantity is expressed in
+            scope: Optional GHG Protocol scope (preferred, not required)
+
+        Returns:
+            (position, score, conversion) where conversion is the number of
+            factor units per activity unit, or None if nothing matches
+        """
+        name = ' '.join(fold_text(activity_name or '').split())
+        canonical, requested = normalize_unit(unit)
+        scope = normalize_scope(scope)
+        if not name or requested is None or (requested[0], None) not in self.postings:
+            return None
+
+        key = (name, canonical, scope)
+        return self._cache.get_or_set(key, lambda: self._match(name, canonical, requested, scope))
+
+    def _match(self, name: str, canonical: str, requested: Tuple[str, float],
+               scope: Optional[int]) -> Optional[Tuple[int, float, float]]:
+        dimension, size = requested
+        engine = self.engine
+        preferred = self.postings.get((dimension, scope), ()) if scope is not None else ()
+        candidates = (set(engine.token_index['fr'].candidates(name))
+                      | set(engine.token_index['en'].candidates(name))) & self.postings[(dimension, None)]
+
+        tokens = tokenize(name)
+        shortlist = []
+        for position in candidates:
+            factor_canonical, factor_unit = self._value_units[self._unit_ids[position]]
+            scope_bonus = SCOPE_BONUS if position in preferred else 0.0
+            unit_bonus = SAME_UNIT_BONUS if factor_canonical == canonical else 0.0
+            names = []
+            for lang in ('fr', 'en'):
+                folded, words = self._names[lang][position]
+                names.append((folded, _coverage(tokens, words)))
+            # real_quick_ratio() >= quick_ratio() >= ratio(), from lengths alone
+            bound = max((_length_ratio(len(name), len(folded)) + coverage) / 2
+                        for folded, coverage in names)
+            if bound >= MIN_MATCH_SCORE:
+                # Among equal bounds the factor named exactly like the activity comes first
+                exact = any(folded == name for folded, _ in names)
+                shortlist.append((bound + scope_bonus + unit_bonus, exact, -position,
+                                  scope_bonus, unit_bonus, names, factor_unit))
+
+        matcher = SequenceMatcher(None, name)
+        best = None
+        for bound, _, neg_position, scope_bonus, unit_bonus, names, factor_unit in heapq.nlargest(
+                MAX_SCORED_CANDIDATES, shortlist):
+            position = -neg_position
+            # Ties go to the first factor, as in a scan in position order
+            if best is not None and bound < best[1]:
+                break
+
+            def acceptable(similarity):
+                """Whether a name similarity (or an upper bound of it) can become the new best"""
+                return similarity >= MIN_MATCH_SCORE and (
+                    best is None
+                    or (similarity + scope_bonus + unit_bonus, neg_position) > (best[1], -best[0])
+                )
+
+            similarity = None
+            for folded, coverage in names:
+                matcher.set_seq2(folded)
+                if not acceptable((matcher.quick_ratio() + coverage) / 2):
+                    continue
+                value = (matcher.ratio() + coverage) / 2
+                similarity = value if similarity is None else max(similarity, value)
+            if similarity is None or not acceptable(similarity):
+                continue
+
+            best = (position, similarity + scope_bonus + unit_bonus, size / factor_unit[1])
+
+        return best
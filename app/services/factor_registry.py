@@ -0,0 +1,459 @@
+"""
+Multi-Database Emission Factor Registry
+Pluggable sources (the ADEME CSV, plus DEFRA, EPA, IPCC, GHG Protocol and
+custom factors stored in the emission_factors table) each indexed into a
+segment: an EmissionFactorSearchEngine over that source's factors. Sources
+are built lazily one at a time and reloaded individually; queries fan out
+to the segments, which partition the factors, so a search over every
+database scores the same candidates one combined index would. Stamps of
+database-backed sources are checked every STAMP_TTL seconds, and at once
+after EmissionFactor edits committed by this process.
+"""
+
+import abc
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.emission_factor_database import EmissionFactorDatabase
+from app.services.emission_factor_loader import (
+    EmissionFactorData, EmissionFactorSearchEngine, FACTOR_FIELDS, NUMERIC_FIELDS,
+    get_loader, get_loader_version
+)
+from app.services.factor_table import CompactFactorTable
+
+
+# Separates the database prefix from the row id in non-ADEME factor ids
+ID_SEPARATOR = ':'
+
+# Seconds between stamp checks of database-backed sources
+STAMP_TTL = 30
+
+# Session.info key collecting sources whose factors changed in the open transaction
+_PENDING_KEY = 'factor_registry_changed_sources'
+
+_Segment = namedtuple('_Segment', 'engine stamp')
+
+
+class FactorSource(abc.ABC):
+    """
+    A pluggable emission factor database
+
+    Subclasses return rows in FACTOR_FIELDS order from load_rows(), or
+    override build() to supply a ready-made search engine. Factor ids must
+    be unique across sources; non-ADEME sources prefix them with
+    ``<name>:``.
+    """
+
+    name = ''
+    # Seconds a checked stamp is trusted (0: check it on every query)
+    stamp_ttl = 0
+
+    @abc.abstractmethod
+    def load_rows(self) -> List[Tuple]:
+        """Factor rows, in FACTOR_FIELDS order"""
+
+    def stamp(self):
+        """Value that changes when a built segment is stale (None: only on reload)"""
+        return None
+
+    def build(self) -> Optional[EmissionFactorSearchEngine]:
+        """Index the source's factors (None if it has none)"""
+        rows = self.load_rows()
+        if not rows:
+            return None
+        table = CompactFactorTable(FACTOR_FIELDS, NUMERIC_FIELDS, rows, EmissionFactorData)
+        return EmissionFactorSearchEngine(table)
+
+
+class ADEMECSVSource(FactorSource):
+    """The ADEME Base Carbone CSV, shared with the global loader"""
+
+    name = EmissionFactorDatabase.ADEME.value
+
+    def stamp(self):
+        return get_loader_version()
+
+    def load_rows(self) -> List[Tuple]:
+        return [factor.to_row() for factor in get_loader().factors]
+
+    def build(self) -> Optional[EmissionFactorSearchEngine]:
+        # Reuses the loader's engine; a loader reload makes the stamp stale
+        return get_loader().search_engine
+
+
+class DatabaseFactorSource(FactorSource):
+    """Factors of one database stored in the emission_factors table"""
+
+    # The stamp is a query; ORM edits made in this process invalidate the
+    # source at once, this bounds how long other processes miss them
+    stamp_ttl = STAMP_TTL
+
+    def __init__(self, database: EmissionFactorDatabase):
+        self.database = database
+        self.name = database.value
+
+    def stamp(self):
+        # Edits move max(updated_at), deletions change the count
+        from app.models.emission_factor import EmissionFactor
+
+        return tuple(
+            db.session.query(func.max(EmissionFactor.updated_at), func.count(EmissionFactor.id))
+            .filter(EmissionFactor.database_source == self.database)
+            .one()
+        )
+
+    def load_rows(self) -> List[Tuple]:
+        from app.models.emission_factor import EmissionFactor
+
+        factors = (EmissionFactor.query
+                   .filter_by(database_source=self.database)
+                   .order_by(EmissionFactor.id))
+        return [
+            EmissionFactorData(
+                id=f"{self.name}{ID_SEPARATOR}{f.id}",
+                name_fr=f.name,
+                name_en=f.name,
+                factor=f.factor,
+                unit_fr=f"kgCO2e/{f.unit}",
+                unit_en=f"kgCO2e/{f.unit}",
+                category=f.category or '',
+                tags_fr='',
+                tags_en='',
+                source=f.source or self.name,
+                geographic_location=f.region or '',
+                validity_period=str(f.year) if f.year else '',
+                status='Valide',
+                comment_fr=f.notes,
+                comment_en=f.notes,
+            ).to_row()
+            for f in factors
+        ]
+
+
+class FactorSelection:
+    """
+    The engines of some sources, resolved once
+
+    Queries on a selection reuse its engines, so a request checks the
+    sources' stamps once however many searches it runs. ``version`` is the
+    registry version the engines belong to.
+    """
+
+    def __init__(self, engines: List[EmissionFactorSearchEngine], version: int):
+        self.engines = engines
+        self.version = version
+
+    @staticmethod
+    def _merge(result_lists: Sequence[List[Tuple[EmissionFactorData, float]]],
+               max_results: int) -> List[Tuple[EmissionFactorData, float]]:
+        """Best hits across segments; ties keep segment order, then rank"""
+        hits = [
+            (-score, order, rank, factor)
+            for order, results in enumerate(result_lists)
+            for rank, (factor, score) in enumerate(results)
+        ]
+        hits.sort(key=lambda hit: hit[:3])
+        return [(factor, -neg_score) for neg_score, _, _, factor in hits[:max_results]]
+
+    def _fallback(self, query: str, language: str, valid_only: bool) -> bool:
+        """Scan only if no segment shortlists the query, as one combined index would"""
+        return not any(engine.shortlists(query, language, valid_only) for engine in self.engines)
+
+    def search(self, query: str, language: str = 'fr', max_results: int = 20,
+               valid_only: bool = True, filters: Optional[Dict[str, Iterable[str]]] = None
+               ) -> List[Tuple[EmissionFactorData, float]]:
+        """Search every selected database"""
+        fallback = self._fallback(query, language, valid_only)
+        return self._merge([
+            engine.search(query, language, max_results, valid_only, filters, fallback)
+            for engine in self.engines
+        ], max_results)
+
+    def search_many(self, queries: Sequence[str], language: str = 'fr', max_results: int = 20,
+                    valid_only: bool = True) -> List[List[Tuple[EmissionFactorData, float]]]:
+        """Run several searches over every selected database"""
+        distinct = list(dict.fromkeys(queries))
+        scanned = {q for q in distinct if self._fallback(q, language, valid_only)}
+
+        merged = {}
+        for fallback in (False, True):
+            group = [q for q in distinct if (q in scanned) == fallback]
+            if not group:
+                continue
+            per_engine = [
+                engine.search_many(group, language, max_results, valid_only, fallback)
+                for engine in self.engines
+            ]
+            for index, query in enumerate(group):
+                merged[query] = self._merge([results[index] for results in per_engine], max_results)
+        return [merged[q] for q in queries]
+
+    def faceted_search(self, query: str, language: str = 'fr', max_results: int = 20,
+                       valid_only: bool = True, filters: Optional[Dict[str, Iterable[str]]] = None
+                       ) -> Tuple[List[Tuple[EmissionFactorData, float]], Dict[str, Dict[str, int]]]:
+        """Search every selected database, summing facet counts"""
+        hit_lists = []
+        totals: Dict[str, Dict[str, int]] = {}
+        fallback = self._fallback(query, language, valid_only)
+        for engine in self.engines:
+            hits, counts = engine.faceted_search(query, language, max_results, valid_only, filters,
+                                                 fallback)
+            hit_lists.append(hits)
+            for facet, values in counts.items():
+                facet_totals = totals.setdefault(facet, {})
+                for value, count in values.items():
+                    facet_totals[value] = facet_totals.get(value, 0) + count
+
+        counts = {
+            facet: dict(sorted(values.items(), key=lambda item: (-item[1], item[0])))
+            for facet, values in totals.items()
+        }
+        return self._merge(hit_lists, max_results), counts
+
+    def suggest(self, prefix: str, language: str = 'fr', limit: int = 10) -> List[Dict]:
+        """Typeahead completions, in segment order, without repeated texts"""
+        completions = []
+        seen = set()
+        for engine in self.engines:
+            for completion in engine.suggest(prefix, language, limit):
+                if completion['text'] not in seen:
+                    seen.add(completion['text'])
+                    completions.append(completion)
+        return completions[:limit]
+
+    def find_factor(self, activity_name: str, unit: str, scope=None) -> Optional[EmissionFactorData]:
+        """Best automatic match across every selected database"""
+        best = None
+        for engine in self.engines:
+            match = engine.match_factor(activity_name, unit, scope)
+            if match is not None and (best is None or match[1] > best[1]):
+                best = match
+        return best[0] if best else None
+
+
+class FactorRegistry:
+    """
+    Segmented index over every registered factor source
+
+    Segments are replaced copy-on-write, like the global loader: a reload
+    builds the new segment off to the side and swaps it in, so queries in
+    flight keep a consistent view. ``version`` increments on every swap.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, FactorSource] = {}
+        self._segments: Dict[str, _Segment] = {}
+        self._lock = threading.Lock()
+        self.errors: Dict[str, str] = {}
+        self._error_stamps: Dict[str, object] = {}
+        # Source name -> time.monotonic() of its last stamp check
+        self._checked: Dict[str, float] = {}
+        self.version = 0
+
+    def register(self, source: FactorSource):
+        """Add (or replace) a source; it is indexed on first use"""
+        with self._lock:
+            self._sources[source.name] = source
+            segments = dict(self._segments)
+            segments.pop(source.name, None)
+            self._segments = segments
+            self.errors.pop(source.name, None)
+            self._checked.pop(source.name, None)
+            self.version += 1
+
+    def invalidate(self, name: str):
+        """Check a source's stamp on its next use, whatever its stamp_ttl"""
+        self._checked.pop(name, None)
+
+    def reload(self, name: str) -> int:
+        """
+        Rebuild one source's segment, leaving the others untouched
+
+        Raises:
+            ValueError: If no source is registered under name
+
+        Returns:
+            The new registry version
+        """
+        source = self._sources.get(name)
+        if source is None:
+            raise ValueError(f"Unknown factor source: {name}")
+        return self._rebuild(name, source.stamp())
+
+    def _rebuild(self, name: str, stamp) -> int:
+        try:
+            engine = self._sources[name].build()
+        except Exception as e:
+            self.errors[name] = str(e)
+            self._error_stamps[name] = stamp
+            print(f"❌ Failed to load {name} emission factors: {e}")
+            raise
+
+        with self._lock:
+            segments = dict(self._segments)
+            segments[name] = _Segment(engine, stamp)
+            self._segments = segments
+            self.errors.pop(name, None)
+            self.version += 1
+            return self.version
+
+    def select(self, databases: Optional[Iterable[str]] = None) -> FactorSelection:
+        """
+        The selected sources (all when databases is None), in registration
+        order, with their missing and stale segments rebuilt
+
+        A source's stamp is checked at most every ``stamp_ttl`` seconds, or
+        on the next use after invalidate(). A source that failed to load is
+        skipped until it is reloaded explicitly or its stamp changes.
+        """
+        selected = set(databases) if databases is not None else None
+        names = [name for name in list(self._sources) if selected is None or name in selected]
+        now = time.monotonic()
+        for name in names:
+            source = self._sources[name]
+            segment = self._segments.get(name)
+            if segment is not None and segment.stamp is None:
+                continue
+            checked = self._checked.get(name)
+            if (checked is not None and now - checked < source.stamp_ttl
+                    and (segment is not None or name in self.errors)):
+                continue
+            stamp = source.stamp()
+            self._checked[name] = now
+            if segment is not None and segment.stamp == stamp:
+                continue
+            if name in self.errors and self._error_stamps.get(name) == stamp:
+                continue
+            try:
+                self._rebuild(name, stamp)
+            except Exception:
+                continue
+
+        with self._lock:
+            segments, version = self._segments, self.version
+        return FactorSelection([
+            segments[name].engine for name in names
+            if name in segments and segments[name].engine is not None
+        ], version)
+
+    def search(self, query: str, language: str = 'fr', max_results: int = 20,
+               valid_only: bool = True, filters: Optional[Dict[str, Iterable[str]]] = None,
+               databases: Optional[Iterable[str]] = None) -> List[Tuple[EmissionFactorData, float]]:
+        """Search every selected database (all when databases is None)"""
+        return self.select(databases).search(query, language, max_results, valid_only, filters)
+
+    def search_many(self, queries: Sequence[str], language: str = 'fr', max_results: int = 20,
+                    valid_only: bool = True,
+                    databases: Optional[Iterable[str]] = None) -> List[List[Tuple[EmissionFactorData, float]]]:
+        """Run several searches over every selected database"""
+        return self.select(databases).search_many(queries, language, max_results, valid_only)
+
+    def faceted_search(self, query: str, language: str = 'fr', max_results: int = 20,
+                       valid_only: bool = True, filters: Optional[Dict[str, Iterable[str]]] = None,
+                       databases: Optional[Iterable[str]] = None
+                       ) -> Tuple[List[Tuple[EmissionFactorData, float]], Dict[str, Dict[str, int]]]:
+        """Search every selected database, summing facet counts"""
+        return self.select(databases).faceted_search(query, language, max_results, valid_only,
+                                                     filters)
+
+    def suggest(self, prefix: str, language: str = 'fr', limit: int = 10,
+                databases: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Typeahead completions, in segment order, without repeated texts"""
+        return self.select(databases).suggest(prefix, language, limit)
+
+    def get_by_id(self, factor_id: str) -> Optional[EmissionFactorData]:
+        """Factor by id (ADEME ids as is, others as "<database>:<id>")"""
+        name, separator, _ = factor_id.partition(ID_SEPARATOR)
+        database = name if separator else EmissionFactorDatabase.ADEME.value
+        for engine in self.select([database]).engines:
+            return engine.get_by_id(factor_id)
+        return None
+
+    def find_factor(self, activity_name: str, unit: str, scope=None,
+                    databases: Optional[Iterable[str]] = None) -> Optional[EmissionFactorData]:
+        """Best automatic match across every selected database"""
+        return self.select(databases).find_factor(activity_name, unit, scope)
+
+    def status(self) -> Dict[str, Dict]:
+        """Factor count or load error per registered source"""
+        segments = self._segments
+        return {
+            name: {
+                'loaded': name in segments,
+                'factors': len(segments[name].engine.factors)
+                if name in segments and segments[name].engine is not None else 0,
+                'error': self.errors.get(name),
+            }
+            for name in self._sources
+        }
+
+
+_registry: Optional[FactorRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def default_sources() -> List[FactorSource]:
+    """The ADEME CSV plus the database-backed factors of every other database"""
+    return [ADEMECSVSource()] + [
+        DatabaseFactorSource(database)
+        for database in EmissionFactorDatabase if database is not EmissionFactorDatabase.ADEME
+    ]
+
+
+def get_registry() -> FactorRegistry:
+    """Global registry, created with the default sources"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = FactorRegistry()
+                for source in default_sources():
+                    registry.register(source)
+                _registry = registry
+    return _registry
+
+
+def register_source(source: FactorSource):
+    """Plug an additional factor source into the global registry"""
+    get_registry().register(source)
+
+
+def reload_source(name: str) -> int:
+    """Reload one source of the global registry (e.g. after custom factors change)"""
+    return get_registry().reload(name)
+
+
+def _changed_sources(factor) -> set:
+    """Source names a flushed EmissionFactor change affects (both, when it moved)"""
+    history = inspect(factor).attrs.database_source.history
+    return {
+        database.value for database in (factor.database_source, *(history.deleted or ()))
+        if database is not None
+    }
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_factors(session, flush_context):
+    from app.models.emission_factor import EmissionFactor
+
+    changed = set()
+    for factors in (session.new, session.dirty, session.deleted):
+        for factor in factors:
+            if isinstance(factor, EmissionFactor):
+                changed |= _changed_sources(factor)
+    if changed:
+        session.info.setdefault(_PENDING_KEY, set()).update(changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    changed = session.info.pop(_PENDING_KEY, None)
+    if changed and _registry is not None:
+        for name in changed:
+            _registry.invalidate(name)
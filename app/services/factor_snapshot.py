@@ -0,0 +1,98 @@
+"""
+Binary Snapshot Cache for the ADEME Base Carbone CSV
+Stores parsed emission factor rows next to the CSV so that later worker
+starts skip the latin-1 csv.DictReader pass entirely
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import List, Optional, Tuple
+
+
+# Bump whenever the row layout of EmissionFactorData changes
+SNAPSHOT_VERSION = 1
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def default_snapshot_path(csv_path: str) -> str:
+    """Snapshot file used for a given CSV (stored alongside it)"""
+    return f"{csv_path}.snapshot"
+
+
+def _csv_hash(csv_path: str) -> str:
+    """SHA-256 of the CSV contents"""
+    digest = hashlib.sha256()
+    with open(csv_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def csv_fingerprint(csv_path: str) -> dict:
+    """Identify the CSV a cache file was built from"""
+    stat = os.stat(csv_path)
+    return {
+        'version': SNAPSHOT_VERSION,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': _csv_hash(csv_path),
+    }
+
+
+def read_snapshot(csv_path: str, snapshot_path: str) -> Optional[List[Tuple]]:
+    """
+    Load parsed rows from a snapshot if it still matches the CSV
+
+    The snapshot holds two pickles: a small header (format version, CSV
+    mtime, size and SHA-256) followed by the rows, so a stale snapshot is
+    rejected without unpickling the rows.
+
+    Returns:
+        List of row tuples, or None if the snapshot is missing or stale
+    """
+    if not os.path.exists(snapshot_path) or not os.path.exists(csv_path):
+        return None
+
+    try:
+        with open(snapshot_path, 'rb') as f:
+            header = pickle.load(f)
+            stat = os.stat(csv_path)
+            if (
+                header.get('version') != SNAPSHOT_VERSION
+                or header.get('mtime_ns') != stat.st_mtime_ns
+                or header.get('size') != stat.st_size
+                or header.get('sha256') != _csv_hash(csv_path)
+            ):
+                return None
+            return pickle.load(f)
+    except Exception:
+        # Corrupt or unreadable snapshot: fall back to parsing the CSV
+        return None
+
+
+def write_snapshot(csv_path: str, snapshot_path: str, rows: List[Tuple]) -> bool:
+    """
+    Write parsed rows to a snapshot (atomically, via a temporary file)
+
+    Returns:
+        True if the snapshot was written
+    """
+    directory = os.path.dirname(os.path.abspath(snapshot_path))
+    try:
+        header = csv_fingerprint(csv_path)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(rows, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, snapshot_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        # Read-only deployments simply run without a snapshot
+        return False
+    return True
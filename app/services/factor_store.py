@@ -0,0 +1,216 @@
+"""
+Shared Memory-Mapped Factor Store
+Columnar, read-only file representation of the emission factor table.
+Every gunicorn worker maps the same file, so the factor data lives once in
+the OS page cache instead of once per worker as Python objects.
+
+File layout:
+    magic (4 bytes) | header offset (uint64) | column sections | JSON header
+
+Numeric columns are float64 arrays (NaN encodes None). String columns are
+an int64 offset array, a UTF-8 blob and a one-byte-per-row null mask.
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+
+STORE_MAGIC = b'GLFS'
+STORE_VERSION = 1
+
+_PREAMBLE = struct.Struct('<4sQ')
+
+
+def default_store_path(csv_path: str) -> str:
+    """Store file used for a given CSV (stored alongside it)"""
+    return f"{csv_path}.store"
+
+
+def _align(f, boundary: int = 8):
+    """Pad the file so the next section starts on an aligned offset"""
+    padding = -f.tell() % boundary
+    if padding:
+        f.write(b'\0' * padding)
+
+
+def write_store(path: str, fingerprint: dict, fields: Sequence[str],
+                numeric_fields: Iterable[str], rows: Sequence[Tuple]) -> bool:
+    """
+    Write rows to a columnar store file (atomically, via a temporary file)
+
+    Args:
+        path: Destination file
+        fingerprint: Identity of the source data, checked by open_store()
+        fields: Column names, in row tuple order
+        numeric_fields: Columns holding Optional[float] values
+        rows: Row tuples
+
+    Returns:
+        True if the store was written
+    """
+    numeric_fields = set(numeric_fields)
+    count = len(rows)
+    sections = {}
+
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_PREAMBLE.pack(STORE_MAGIC, 0))
+
+                for index, name in enumerate(fields):
+                    column = [row[index] for row in rows]
+                    _align(f)
+
+                    if name in numeric_fields:
+                        sections[name] = {'kind': 'float64', 'values': f.tell()}
+                        array('d', (math.nan if v is None else v for v in column)).tofile(f)
+                        continue
+
+                    encoded = [b'' if v is None else v.encode('utf-8') for v in column]
+                    offsets = array('q', [0])
+                    for value in encoded:
+                        offsets.append(offsets[-1] + len(value))
+
+                    section = {'kind': 'str', 'offsets': f.tell()}
+                    offsets.tofile(f)
+                    section['nulls'] = f.tell()
+                    f.write(bytes(1 if v is None else 0 for v in column))
+                    section['blob'] = f.tell()
+                    f.write(b''.join(encoded))
+                    sections[name] = section
+
+                header_offset = f.tell()
+                header = {
+                    'version': STORE_VERSION,
+                    'count': count,
+                    'fields': list(fields),
+                    'sections': sections,
+                    'fingerprint': fingerprint,
+                }
+                f.write(json.dumps(header).encode('utf-8'))
+                f.seek(0)
+                f.write(_PREAMBLE.pack(STORE_MAGIC, header_offset))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        return False
+    return True
+
+
+class MappedFactorStore:
+    """
+    Read-only view over a store file mapped into memory
+
+    Values are decoded on access; nothing is copied into the process heap
+    until a row is requested.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, header_offset = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != STORE_MAGIC:
+            raise ValueError(f"Not a factor store: {path}")
+
+        header = json.loads(self._mmap[header_offset:].decode('utf-8'))
+        self.path = path
+        self.version = header['version']
+        self.count = header['count']
+        self.fields = tuple(header['fields'])
+        self.fingerprint = header['fingerprint']
+
+        view = memoryview(self._mmap)
+        self._numeric = {}
+        self._strings = {}
+        for name, section in header['sections'].items():
+            if section['kind'] == 'float64':
+                start = section['values']
+                self._numeric[name] = view[start:start + 8 * self.count].cast('d')
+            else:
+                start = section['offsets']
+                offsets = view[start:start + 8 * (self.count + 1)].cast('q')
+                nulls = view[section['nulls']:section['nulls'] + self.count]
+                self._strings[name] = (offsets, nulls, section['blob'])
+
+    def __len__(self) -> int:
+        return self.count
+
+    def value(self, position: int, name: str):
+        """Decode a single cell"""
+        numeric = self._numeric.get(name)
+        if numeric is not None:
+            v = numeric[position]
+            return None if math.isnan(v) else v
+
+        offsets, nulls, blob = self._strings[name]
+        if nulls[position]:
+            return None
+        start = blob + offsets[position]
+        end = blob + offsets[position + 1]
+        return self._mmap[start:end].decode('utf-8')
+
+    def row(self, position: int) -> Tuple:
+        """Decode a full row, in field order"""
+        if not 0 <= position < self.count:
+            raise IndexError(position)
+        return tuple(self.value(position, name) for name in self.fields)
+
+
+def open_store(path: str, fingerprint: dict) -> Optional[MappedFactorStore]:
+    """
+    Map a store file if it exists and was built from the given source
+
+    Returns:
+        The mapped store, or None if it is missing, stale or corrupt
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        store = MappedFactorStore(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    if store.version != STORE_VERSION or store.fingerprint != fingerprint:
+        return None
+    return store
+
+
+class FactorTable(Sequence):
+    """
+    Sequence of factor records backed by a MappedFactorStore
+
+    Records are built on demand with ``factory(*row)`` and not retained, so
+    the per-worker footprint stays constant however many factors exist.
+    """
+
+    def __init__(self, store: MappedFactorStore, factory: Callable):
+        self.store = store
+        self.factory = factory
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        return self.factory(*self.store.row(position))
+
+    def value(self, position: int, name: str):
+        """Read one field without building the full record"""
+        return self.store.value(position, name)
+
+    def column(self, name: str) -> List:
+        """Read one field for every row"""
+        return [self.store.value(i, name) for i in range(len(self))]
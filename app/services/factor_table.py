@@ -0,0 +1,105 @@
+"""
+Compact In-Memory Factor Table
+Struct-of-arrays storage for emission factors: one column per field instead
+of one object per ADEME row. Numeric columns are float arrays, low-cardinality
+strings are interned and long comments stay compressed until a row is read.
+"""
+
+import math
+import sys
+import zlib
+from array import array
+from typing import Callable, Iterable, List, Sequence, Tuple
+
+
+# Low-cardinality columns shared by thousands of rows
+INTERNED_FIELDS = (
+    'unit_fr', 'unit_en', 'category', 'source',
+    'geographic_location', 'validity_period', 'status',
+)
+
+# Long free-text columns kept compressed until a row is materialized
+LAZY_FIELDS = ('comment_fr', 'comment_en')
+
+# Shorter texts are not worth compressing
+_COMPRESS_MIN_LENGTH = 64
+
+
+def _pack_text(value):
+    if value is None or len(value) < _COMPRESS_MIN_LENGTH:
+        return value
+    return zlib.compress(value.encode('utf-8'))
+
+
+def _unpack_text(value):
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode('utf-8')
+    return value
+
+
+class CompactFactorTable(Sequence):
+    """
+    Sequence of factor records stored column by column
+
+    Records are built on demand with ``factory(*row)`` and not retained;
+    the search engine reads indexed text through column() without building
+    records at all.
+    """
+
+    def __init__(self, fields: Sequence[str], numeric_fields: Iterable[str],
+                 rows: Sequence[Tuple], factory: Callable):
+        """
+        Args:
+            fields: Column names, in row tuple order
+            numeric_fields: Columns holding Optional[float] values
+            rows: Row tuples
+            factory: Callable building a record from a row's values
+        """
+        numeric_fields = set(numeric_fields)
+        self.fields = tuple(fields)
+        self.factory = factory
+        self._count = len(rows)
+        self._columns = {}
+
+        for index, name in enumerate(self.fields):
+            column = [row[index] for row in rows]
+            if name in numeric_fields:
+                # NaN encodes None
+                self._columns[name] = array('d', (math.nan if v is None else v for v in column))
+            elif name in LAZY_FIELDS:
+                self._columns[name] = [_pack_text(v) for v in column]
+            elif name in INTERNED_FIELDS:
+                self._columns[name] = [sys.intern(v) if v else v for v in column]
+            else:
+                self._columns[name] = column
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < self._count:
+            raise IndexError(position)
+        return self.factory(*self.row(position))
+
+    def value(self, position: int, name: str):
+        """Read one field without building the full record"""
+        v = self._columns[name][position]
+        if isinstance(v, float):
+            return None if math.isnan(v) else v
+        if name in LAZY_FIELDS:
+            return _unpack_text(v)
+        return v
+
+    def row(self, position: int) -> Tuple:
+        """Decode a full row, in field order"""
+        return tuple(self.value(position, name) for name in self.fields)
+
+    def column(self, name: str) -> List:
+        """Read one field for every row (string columns are shared, do not mutate)"""
+        if name in LAZY_FIELDS or isinstance(self._columns[name], array):
+            return [self.value(i, name) for i in range(self._count)]
+        return self._columns[name]
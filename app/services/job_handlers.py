@@ -0,0 +1,78 @@
+"""
+Background Job Handlers
+The operations run through the job queue. Imported by the app factory so
+every process that runs jobs knows every kind.
+"""
+
+import os
+
+from app.extensions import db
+from app.models.user import User
+from app.services.job_queue import job_file_path, job_handler, report_progress
+
+
+@job_handler('import_activities')
+def import_activities(job, path: str, filename: str, auto_validate: bool = False):
+    """Bulk activity import from a file saved by the upload request"""
+    from app.emissions.importer import import_activities as run_import
+
+    user = db.session.get(User, job.created_by_id)
+    size = os.path.getsize(path) or 1
+    try:
+        with open(path, 'rb') as stream:
+            report = run_import(
+                user, stream, filename, auto_validate=auto_validate,
+                progress=lambda r: report_progress(
+                    job, stream.tell(), size, f"{r.rows} rows read, {r.imported} imported"
+                ),
+            )
+    finally:
+        os.remove(path)
+    return report.to_dict()
+
+
+@job_handler('recalculate_emissions')
+def recalculate_emissions(job, chunk_size: int = None):
+    """Re-price non-audited activities against the current ADEME factors"""
+    from app.emissions.recalculation import DEFAULT_CHUNK_SIZE, recalculate_activities
+
+    report = recalculate_activities(
+        job.created_by_id,
+        chunk_size=chunk_size or DEFAULT_CHUNK_SIZE,
+        progress=lambda r: report_progress(
+            job, r.processed, r.total, f"{r.processed} / {r.total} activities, {r.updated} updated"
+        ),
+    )
+    return report.to_dict()
+
+
+@job_handler('refresh_platform_rollups')
+def refresh_platform_rollups(job):
+    """Recompute the platform-wide rollup tables (scheduled, see JOB_SCHEDULE)"""
+    from app.emissions.rollup import rebuild_platform_rollups
+
+    rows = rebuild_platform_rollups()
+    db.session.commit()
+    return {'rows': rows}
+
+
+@job_handler('export_report')
+def export_report(job, report_id: int, format: str):
+    """Render a report to a file for /api/v1/jobs/<id>/download"""
+    from app.models.report import Report
+    from app.services.report_generator import REPORT_FORMATS
+
+    report = db.session.get(Report, report_id)
+    if report is None:
+        raise ValueError(f"Report {report_id} not found")
+    generator_class, mimetype = REPORT_FORMATS[format]
+    buffer = generator_class().generate(report_id)
+
+    path = job_file_path(f"job-{job.id}.{format}")
+    with open(path, 'wb') as f:
+        f.write(buffer.getvalue())
+    return {
+        'file': os.path.basename(path),
+        'filename': f"GreenLedger_Report_{report.period_label or report.id}.{format}",
+        'mimetype': mimetype,
+    }
@@ -0,0 +1,331 @@
+"""
+Background Job Queue
+Database-backed queue for work too slow for a request handler (bulk
+imports, report exports, recalculations). Routes enqueue a BackgroundJob
+row and return its id straight away; runner threads in every process claim
+queued rows with a conditional UPDATE, so a job runs exactly once whichever
+gunicorn worker picks it up. A maintenance thread per process heartbeats
+the jobs it is running, fails RUNNING jobs whose worker died (no heartbeat
+for JOB_STALE_AFTER seconds), deletes job files older than
+JOB_FILES_RETENTION and enqueues the periodic jobs of JOB_SCHEDULE. Needs
+nothing beyond the application database.
+"""
+
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import select, update
+
+from app.extensions import db
+from app.models.background_job import BackgroundJob, JobStatus
+
+
+# Job kind -> handler(job, **payload) returning a JSON-serialisable result
+_handlers: Dict[str, Callable] = {}
+
+
+def job_handler(kind: str):
+    """Register the function that runs jobs of the given kind"""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def report_progress(job: BackgroundJob, done: int, total: int, message: Optional[str] = None):
+    """Record a running job's progress (commits the session)"""
+    percent = int(done * 100 / total) if total else 100
+    db.session.execute(
+        update(BackgroundJob)
+        .where(BackgroundJob.id == job.id)
+        .values(progress=min(percent, 100), progress_message=message)
+    )
+    db.session.commit()
+
+
+def job_file_path(name: str) -> str:
+    """Path in JOB_FILES_DIR for a file produced or consumed by a job"""
+    from flask import current_app
+
+    directory = current_app.config['JOB_FILES_DIR']
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, os.path.basename(name))
+
+
+class JobQueue:
+    """
+    Enqueues jobs and runs them on a pool of daemon threads
+
+    Runner threads are started by start(): from create_app() (JOB_AUTOSTART),
+    the gunicorn worker hook (see gunicorn.conf.py), or lazily on the first
+    enqueue() of a process.
+    With JOB_INLINE the job runs synchronously inside enqueue() instead,
+    which keeps tests deterministic.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._threads: List[threading.Thread] = []
+        self._maintenance: Optional[threading.Thread] = None
+        self._running: Set[int] = set()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['job_queue'] = self
+
+    def _reset_after_fork(self):
+        """Forked workers do not inherit the runner threads"""
+        self._threads = []
+        self._maintenance = None
+        self._running = set()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def enqueue(self, kind: str, user=None, organization_id: Optional[int] = None,
+                **payload) -> BackgroundJob:
+        """
+        Persist a queued job and hand it to the runners
+
+        Raises:
+            ValueError: If no handler is registered for kind
+        """
+        if kind not in _handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        job = BackgroundJob(
+            kind=kind,
+            status=JobStatus.QUEUED,
+            created_by_id=user.id if user else None,
+            organization_id=organization_id if organization_id is not None
+            else getattr(user, 'organization_id', None),
+            payload=payload,
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        if self.app.config.get('JOB_INLINE'):
+            if self._claim(job.id):
+                self._execute(job.id)
+            db.session.refresh(job)
+        else:
+            self.start()
+            self._wake.set()
+        return job
+
+    def start(self):
+        """Start the runner and maintenance threads of this process (idempotent)"""
+        workers = self.app.config.get('JOB_WORKERS', 0)
+        with self._lock:
+            self._stopping.clear()
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < workers:
+                thread = threading.Thread(
+                    target=self._run, name=f'job-runner-{len(self._threads)}', daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            if workers and (self._maintenance is None or not self._maintenance.is_alive()):
+                self._maintenance = threading.Thread(target=self._maintain, name='job-maintenance',
+                                                     daemon=True)
+                self._maintenance.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Let the runner threads finish their current job and exit"""
+        with self._lock:
+            self._stopping.set()
+            self._wake.set()
+            threads, self._threads = self._threads, []
+            if self._maintenance is not None:
+                threads.append(self._maintenance)
+                self._maintenance = None
+        for thread in threads:
+            thread.join(timeout)
+
+    def _run(self):
+        """Runner loop: claim and execute jobs, sleeping while the queue is empty"""
+        interval = self.app.config.get('JOB_POLL_INTERVAL', 2)
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    ran = self.run_next()
+            except Exception as e:
+                print(f"❌ Job runner error: {e}")
+                ran = False
+            if not ran:
+                self._wake.wait(interval)
+                self._wake.clear()
+
+    def _maintain(self):
+        """Maintenance loop: heartbeat, stale job recovery, job file cleanup and periodic jobs"""
+        interval = self.app.config.get('JOB_HEARTBEAT_INTERVAL', 30)
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    self.heartbeat()
+                    self.fail_stale()
+                    self.purge_files()
+                    self.schedule()
+            except Exception as e:
+                print(f"❌ Job maintenance error: {e}")
+            self._stopping.wait(interval)
+
+    def heartbeat(self):
+        """Touch the jobs this process is running, so they are not taken for dead"""
+        running = list(self._running)
+        if running:
+            db.session.execute(
+                update(BackgroundJob)
+                .where(BackgroundJob.id.in_(running), BackgroundJob.status == JobStatus.RUNNING)
+                .values(updated_at=datetime.utcnow())
+            )
+            db.session.commit()
+
+    def fail_stale(self) -> int:
+        """
+        Fail RUNNING jobs without a heartbeat for JOB_STALE_AFTER seconds
+
+        Their worker was killed mid-job. They are failed rather than
+        requeued: a handler may have committed part of its work.
+
+        Returns:
+            The number of jobs failed
+        """
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=self.app.config.get('JOB_STALE_AFTER', 300))
+        statement = update(BackgroundJob).where(
+            BackgroundJob.status == JobStatus.RUNNING, BackgroundJob.updated_at < cutoff
+        )
+        running = list(self._running)
+        if running:
+            statement = statement.where(BackgroundJob.id.not_in(running))
+        failed = db.session.execute(statement.values(
+            status=JobStatus.FAILED, finished_at=now,
+            error='The worker running this job stopped before it finished',
+        )).rowcount
+        db.session.commit()
+        return failed
+
+    def purge_files(self) -> int:
+        """
+        Delete files in JOB_FILES_DIR older than JOB_FILES_RETENTION seconds
+
+        Returns:
+            The number of files deleted
+        """
+        directory = self.app.config['JOB_FILES_DIR']
+        cutoff = time.time() - self.app.config.get('JOB_FILES_RETENTION', 7 * 24 * 3600)
+        deleted = 0
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    deleted += 1
+            except FileNotFoundError:
+                continue
+        return deleted
+
+    def schedule(self) -> List[BackgroundJob]:
+        """
+        Enqueue the periodic jobs of JOB_SCHEDULE that are due
+
+        A job is due when none of its kind is queued or running and the last
+        one finished at least its interval ago. Every process checks, so two
+        may enqueue the same run; periodic jobs must be safe to repeat.
+
+        Returns:
+            The jobs enqueued
+        """
+        now = datetime.utcnow()
+        enqueued = []
+        for kind, setting in self.app.config.get('JOB_SCHEDULE', {}).items():
+            interval = self.app.config.get(setting, 0)
+            if not interval:
+                continue
+            last = db.session.execute(
+                select(BackgroundJob.finished_at).where(BackgroundJob.kind == kind)
+                .order_by(BackgroundJob.id.desc()).limit(1)
+            ).first()
+            db.session.commit()
+            # Queued and running jobs have no finished_at yet
+            if last is not None and (last.finished_at is None
+                                     or last.finished_at > now - timedelta(seconds=interval)):
+                continue
+            enqueued.append(self.enqueue(kind))
+        return enqueued
+
+    def run_next(self) -> bool:
+        """Claim and execute the oldest queued job; False when there is none"""
+        while True:
+            job_id = db.session.scalar(
+                select(BackgroundJob.id)
+                .where(BackgroundJob.status == JobStatus.QUEUED)
+                .order_by(BackgroundJob.id)
+                .limit(1)
+            )
+            db.session.commit()
+            if job_id is None:
+                return False
+            # Another runner may claim it first; then try the next one
+            if self._claim(job_id):
+                self._execute(job_id)
+                return True
+
+    def _claim(self, job_id: int) -> bool:
+        """Atomically move a job from QUEUED to RUNNING"""
+        claimed = db.session.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id, BackgroundJob.status == JobStatus.QUEUED)
+            .values(status=JobStatus.RUNNING, started_at=datetime.utcnow())
+        ).rowcount
+        db.session.commit()
+        return claimed == 1
+
+    def _execute(self, job_id: int):
+        """Run a claimed job's handler and record its outcome"""
+        self._running.add(job_id)
+        try:
+            self._run_handler(job_id)
+        finally:
+            self._running.discard(job_id)
+
+    def _run_handler(self, job_id: int):
+        job = db.session.get(BackgroundJob, job_id)
+        try:
+            result = _handlers[job.kind](job, **(job.payload or {}))
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(BackgroundJob, job_id)
+            job.status = JobStatus.FAILED
+            job.error = str(e) or e.__class__.__name__
+            print(f"❌ Job {job_id} ({job.kind}) failed: {e}\n{traceback.format_exc()}")
+        else:
+            job = db.session.get(BackgroundJob, job_id)
+            job.status = JobStatus.SUCCEEDED
+            job.result = result
+            job.progress = 100
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+
+job_queue = JobQueue()
+
+
+def enqueue(kind: str, user=None, organization_id: Optional[int] = None, **payload) -> BackgroundJob:
+    """Enqueue a job on the application's queue"""
+    return job_queue.enqueue(kind, user, organization_id, **payload)
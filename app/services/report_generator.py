@@ -13,6 +13,8 @@ import pandas as pd
 
 from app.models.report import Report
 from app.models.emission_activity import EmissionActivity, ActivityStatus, EmissionScope
+from app.models.emission_rollup import EmissionRollup
+from app.emissions.rollup import rollup_totals
 
 
 class ReportDataExtractor:
@@ -23,25 +25,31 @@ class ReportDataExtractor:
         if not report:
             raise ValueError(f"Report {report_id} not found")
 
+        reported_statuses = [ActivityStatus.VALIDATED, ActivityStatus.AUDITED]
+
         # Get all validated/audited activities for the organization
         activities = EmissionActivity.query.filter(
             EmissionActivity.organization_id == report.organization_id,
-            EmissionActivity.status.in_([ActivityStatus.VALIDATED, ActivityStatus.AUDITED])
+            EmissionActivity.status.in_(reported_statuses)
         ).all()
 
-        # Calculate breakdown by scope and category
+        # Breakdown by scope and category, read from the rollup table
         scope_totals = {
             "Scope 1": 0.0,
             "Scope 2": 0.0,
             "Scope 3": 0.0
         }
         category_totals = {}
-        
-        for a in activities:
-            if not a.co2e_result:
+
+        for t in rollup_totals(EmissionRollup.scope, EmissionRollup.category,
+                               organization_id=report.organization_id,
+                               statuses=reported_statuses):
+            if not t.co2e_kg:
                 continue
-            scope_totals[a.scope.value] += a.co2e_result
-            category_totals[a.category] = category_totals.get(a.category, 0.0) + a.co2e_result
+            scope_totals[t.scope.value] += t.co2e_kg
+            # Rollups store a missing category as ''; activities have None
+            category = t.category or None
+            category_totals[category] = category_totals.get(category, 0.0) + t.co2e_kg
 
         total_emissions = sum(scope_totals.values())
         
@@ -526,3 +534,11 @@ class ExcelReportGenerator:
         wb.save(buffer)
         buffer.seek(0)
         return buffer
+
+
+# Download format -> (generator class, MIME type)
+REPORT_FORMATS = {
+    'pdf': (PDFReportGenerator, 'application/pdf'),
+    'docx': (DocxReportGenerator, 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    'xlsx': (ExcelReportGenerator, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
@@ -0,0 +1,26 @@
+"""Gunicorn configuration (picked up automatically from the working directory)."""
+
+
+def on_starting(server):
+    """Build the ADEME emission factor indexes once, in the master, for every worker to share."""
+    from app.services.emission_factor_loader import preload_factors
+    preload_factors()
+
+
+def post_fork(server, worker):
+    """Start loading the ADEME emission factors if the master could not preload them."""
+    from app.services.emission_factor_loader import start_warm_up
+    start_warm_up()
+
+
+def post_worker_init(worker):
+    """Start the background job runners as soon as the worker has loaded the app."""
+    from app.services.job_queue import job_queue
+    job_queue.start()
+
+
+def worker_exit(server, worker):
+    """Let the job runners finish their current job before the worker exits."""
+    from app.services.job_queue import job_queue
+    if job_queue.app is not None:
+        job_queue.stop(server.cfg.graceful_timeout)
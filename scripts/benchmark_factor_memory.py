@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for the in-memory ADEME factor store.
+
+Compares the legacy representation (one plain dataclass per row) with the
+slotted EmissionFactorData records and the CompactFactorTable used by the
+loader. Uses the real Base Carbone CSV when present, synthetic rows otherwise.
+
+Usage: python scripts/benchmark_factor_memory.py [rows]
+"""
+
+import gc
+import random
+import sys
+import tracemalloc
+from dataclasses import make_dataclass, fields
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.emission_factor_loader import (
+    ADEMEEmissionFactorLoader, EmissionFactorData, FACTOR_FIELDS, NUMERIC_FIELDS
+)
+from app.services.factor_table import CompactFactorTable
+
+# The pre-compaction record: a regular (dict-backed) dataclass
+LegacyFactorData = make_dataclass(
+    'LegacyFactorData', [(f.name, f.type) for f in fields(EmissionFactorData)]
+)
+
+WORDS = (
+    "electricite gaz naturel gazole fioul transport routier camion boeuf acier "
+    "aluminium papier carton verre plastique chauffage reseau urbain bois granules"
+).split()
+
+
+def synthetic_rows(count):
+    """Rows shaped like the Base Carbone (fresh string objects, as csv yields)"""
+    random.seed(42)
+    rows = []
+    for i in range(count):
+        name = " ".join(random.choice(WORDS) for _ in range(5))
+        comment = " ".join(random.choice(WORDS) for _ in range(60))
+        rows.append((
+            str(10000 + i), name, name.upper(), random.random() * 10,
+            "kgCO2e/" + "kWh", "kgCO2e/" + "kWh",
+            " > ".join(["Combustibles", random.choice(WORDS), random.choice(WORDS)]),
+            ",".join(random.sample(WORDS, 3)), ",".join(random.sample(WORDS, 3)),
+            "Base " + "Carbone", "France " + "continentale", "20" + "24",
+            random.choice(["Valide " + "générique", "Archiv" + "é"]),
+            random.random(), random.random(), None, random.random(), None, None,
+            "Source : " + comment, "Source: " + comment,
+        ))
+    return rows
+
+
+def load_rows(count):
+    csv_path = Path(__file__).parent.parent / 'app' / 'data' / 'Base_Carbone_V23.6.csv'
+    if count is None and csv_path.exists():
+        loader = ADEMEEmissionFactorLoader(str(csv_path), use_snapshot=False)
+        return [f.to_row() for f in loader._parse_csv()], f"ADEME CSV ({csv_path.name})"
+    count = count or 20000
+    return synthetic_rows(count), f"{count} synthetic rows"
+
+
+def measure(build, rows):
+    """Bytes still allocated by the structure build(rows) returns"""
+    gc.collect()
+    tracemalloc.start()
+    structure = build(rows)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del structure
+    return size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    rows, label = load_rows(count)
+
+    # Copy strings per structure so no variant benefits from another's objects
+    def fresh(rows):
+        return [tuple((v + '.')[:-1] if isinstance(v, str) else v for v in row) for row in rows]
+
+    variants = [
+        ("list[dataclass] (legacy)", lambda r: [LegacyFactorData(*row) for row in fresh(r)]),
+        ("list[EmissionFactorData] (slots)", lambda r: [EmissionFactorData(*row) for row in fresh(r)]),
+        ("CompactFactorTable", lambda r: CompactFactorTable(
+            FACTOR_FIELDS, NUMERIC_FIELDS, fresh(r), EmissionFactorData)),
+    ]
+
+    print(f"Factor store memory footprint — {label}")
+    baseline = None
+    for name, build in variants:
+        size = measure(build, rows)
+        baseline = baseline or size
+        print(f"  {name:<34} {size / 1024 / 1024:8.2f} MiB  ({size / baseline:6.1%} of legacy)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Per-worker memory benchmark for the ADEME factor search engine.
+
+Forks N "workers" that each run a search workload, then reads their
+/proc/self/smaps_rollup (Linux only) and reports the memory private to each
+worker (USS) and its proportional share (PSS). Two set-ups are compared:
+
+  per-worker build   every worker builds the engine itself, from the
+                     shared memory-mapped store (FACTOR_SHARED_STORE=1)
+  pre-fork build     the parent builds it once with preload_factors(), as
+                     the gunicorn master does, and the workers inherit it
+
+Uses a synthetic Base Carbone CSV (random vocabulary, realistic index sizes).
+
+Usage: python scripts/benchmark_worker_memory.py [rows] [workers]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import emission_factor_loader
+from app.services.emission_factor_loader import ADEMEEmissionFactorLoader, preload_factors
+
+COLUMNS = (
+    'Type Ligne', "Identifiant de l'élément", 'Nom base français', 'Nom base anglais',
+    'Total poste non décomposé', 'Unité français', 'Unité anglais', 'Code de la catégorie',
+    'Tags français', 'Tags anglais', 'Programme', 'Localisation géographique',
+    'Période de validité', "Statut de l'élément", 'Commentaire français', 'Commentaire anglais',
+)
+
+
+def write_csv(path, count):
+    """Synthetic ADEME CSV shaped like the Base Carbone (latin-1, ';'-separated)"""
+    random.seed(42)
+    letters = 'abcdefghijklmnopqrstuvwxyzéè'
+    vocabulary = [''.join(random.choice(letters) for _ in range(random.randint(4, 12)))
+                  for _ in range(8000)]
+    categories = [' > '.join(random.sample(vocabulary[:300], random.randint(2, 4))) for _ in range(600)]
+    with open(path, 'w', encoding='latin-1', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(COLUMNS)
+        for i in range(count):
+            name = ' '.join(random.sample(vocabulary, random.randint(3, 8)))
+            writer.writerow((
+                'Elément', str(10000 + i), name.capitalize(), name.upper(),
+                f"{random.random() * 10:.4f}".replace('.', ','), 'kgCO2e/kWh', 'kgCO2e/kWh',
+                random.choice(categories), ','.join(random.sample(vocabulary, 3)),
+                ','.join(random.sample(vocabulary, 3)), 'Base Carbone', 'France continentale',
+                '2024', random.choice(('Valide générique', 'Archivé')),
+                ' '.join(random.sample(vocabulary, 40)), ' '.join(random.sample(vocabulary, 40)),
+            ))
+    return vocabulary
+
+
+def memory():
+    """(USS, PSS) of the current process in KiB"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values['Private_Clean'] + values['Private_Dirty'], values['Pss']
+
+
+def workload(loader, vocabulary):
+    random.seed(os.getpid())
+    for _ in range(300):
+        word = random.choice(vocabulary)
+        loader.search(word)
+        loader.search(word[:4] + ' ' + random.choice(vocabulary)[:3])
+        loader.suggest(word[:3])
+
+
+def run_workers(workers, build, vocabulary):
+    """Fork workers running the workload; returns [(uss, pss)] in KiB"""
+    pipes = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            loader = build()
+            workload(loader, vocabulary)
+            os.write(write_fd, ('%d %d' % memory()).encode())
+            os._exit(0)
+        os.close(write_fd)
+        pipes.append((pid, read_fd))
+
+    results = []
+    for pid, read_fd in pipes:
+        with os.fdopen(read_fd) as f:
+            uss, pss = map(int, f.read().split())
+        os.waitpid(pid, 0)
+        results.append((uss, pss))
+    return results
+
+
+def report(label, results):
+    uss = sum(r[0] for r in results) / len(results) / 1024
+    pss = sum(r[1] for r in results) / len(results) / 1024
+    print(f"  {label:<20} USS {uss:7.1f} MiB/worker   PSS {pss:7.1f} MiB/worker")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    os.environ['FACTOR_SHARED_STORE'] = '1'
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'Base_Carbone.csv')
+        vocabulary = write_csv(csv_path, count)
+
+        # Write the snapshot and shared store in a throwaway process
+        run_workers(1, lambda: ADEMEEmissionFactorLoader(csv_path), vocabulary)
+
+        print(f"Worker memory — {count} synthetic factors, {workers} workers")
+        report('per-worker build', run_workers(
+            workers, lambda: ADEMEEmissionFactorLoader(csv_path), vocabulary))
+
+        # What the gunicorn master does, with the synthetic CSV in place of the default one
+        emission_factor_loader._global_loader = ADEMEEmissionFactorLoader(csv_path)
+        loader = preload_factors()
+        report('pre-fork build', run_workers(workers, lambda: loader, vocabulary))
+
+
+if __name__ == "__main__":
+    main()
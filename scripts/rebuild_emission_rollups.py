@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""Rebuild the emission rollup table from emission_activities.
+
+Run once after deploying the rollup table, or to repair the rollups after
+activities were changed outside the application.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.factory import create_app
+from app.extensions import db
+from app.emissions.rollup import rebuild_rollups
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--org', type=int, help='Rebuild a single organization')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        rows = rebuild_rollups(args.org)
+        print(f"Rebuilt {rows} emission rollup rows.")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import random
 from datetime import datetime, timedelta
 from app.factory import create_app
 from app.extensions import db
+from app.emissions.rollup import rebuild_rollups
 from app.models.user import User, UserRole
 from app.models.organization import Organization
 from werkzeug.security import generate_password_hash
@@ -103,6 +104,7 @@ def generate_data():
                 total_created += 1
 
         db.session.commit()
+        rebuild_rollups()
         print(f"Data generation complete! {total_created} emission activities created.")
 
 if __name__ == '__main__':
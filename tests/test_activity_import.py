@@ -0,0 +1,141 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+from openpyxl import Workbook
+
+from app.emissions.importer import import_activities, parse_row
+from app.emissions.services import calculate_co2e
+from app.extensions import db
+from app.factory import create_app
+from app.models.audit_log import AuditLog
+from app.models.emission_activity import ActivityStatus, EmissionActivity, EmissionScope
+from app.models.emission_factor_database import ActivityType
+from app.models.organization import Organization
+from app.models.user import User, UserRole
+from app.services import emission_factor_loader
+from tests.test_emission_factor_search import make_factor
+from tests.test_factors_api import install_loader
+
+
+HEADER = 'scope;category;activity_type;quantity;unit;tonnage;distance;transport_mode;period_start;period_end;ademe_factor_id'
+
+CSV_LINES = [
+    HEADER,
+    '2;Electricité;simple;1 000,5;kWh;;;;2024-01-01;2024-12-31;10',
+    'Scope 3;Fret;transport;;;12;450;truck;01/01/2024;31/12/2024;20',
+    '3;Fret;transport;;;12;;truck;2024-01-01;2024-12-31;20',
+    '1;Chauffage;simple;-5;;;;;2024-01-01;2024-12-31;10',
+    '',
+    '2;Electricité;simple;10;kWh;;;;2024-01-01;2024-12-31;999',
+]
+
+
+class ActivityImportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.app.config['JOB_FILES_DIR'] = tempfile.mkdtemp()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.previous_loader = emission_factor_loader._global_loader
+        install_loader([
+            make_factor('10', 'Électricité', factor=0.052),
+            make_factor('20', 'Transport routier', unit_fr='kgCO2e/t.km', factor=0.09),
+        ])
+
+        org = Organization(name='Acme')
+        db.session.add(org)
+        db.session.flush()
+        self.user = User(email='worker@acme.test', password_hash='x', organization_id=org.id,
+                         role=UserRole.WORKER)
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        emission_factor_loader._global_loader = self.previous_loader
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.app.config['JOB_FILES_DIR'])
+
+    def csv_file(self, lines=CSV_LINES):
+        return io.BytesIO('\n'.join(lines).encode('utf-8-sig'))
+
+    def test_csv_import(self):
+        report = import_activities(self.user, self.csv_file(), 'activities.csv', chunk_size=1)
+
+        self.assertEqual((report.rows, report.imported, report.rejected), (5, 2, 3))
+        self.assertEqual([error['line'] for error in report.errors], [4, 5, 7])
+        self.assertIn('positive distance', report.errors[0]['error'])
+        self.assertIn('negative', report.errors[1]['error'])
+        self.assertIn('Unknown ADEME factor id', report.errors[2]['error'])
+
+        electricity, freight = EmissionActivity.query.order_by(EmissionActivity.id).all()
+        self.assertEqual(electricity.quantity, 1000.5)
+        self.assertEqual(electricity.scope, EmissionScope.SCOPE_2)
+        self.assertEqual(electricity.status, ActivityStatus.DRAFT)
+        self.assertEqual(electricity.co2e_result, calculate_co2e('simple', 1000.5, 0.052))
+        self.assertEqual(electricity.activity_data, {'value': 1000.5})
+        self.assertEqual(electricity.ademe_factor_name, 'Électricité')
+        self.assertEqual(freight.activity_type, ActivityType.TRANSPORT)
+        self.assertEqual(freight.period_end, date(2024, 12, 31))
+        self.assertEqual(freight.co2e_result, calculate_co2e('transport', 0, 0.09, 12.0, 450.0))
+
+        self.assertEqual(AuditLog.query.filter_by(action='IMPORT_EMISSIONS').count(), 2)
+
+    def test_xlsx_import(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Scope', 'Category', 'Quantity', 'Period start', 'Period end', 'Factor ID'])
+        for _ in range(3):
+            sheet.append([1, 'Electricité', 250, date(2024, 1, 1), date(2024, 3, 31), '10'])
+        stream = io.BytesIO()
+        workbook.save(stream)
+        stream.seek(0)
+
+        report = import_activities(self.user, stream, 'activities.xlsx')
+        self.assertEqual((report.imported, report.rejected, report.chunks), (3, 0, 1))
+        self.assertEqual({a.co2e_result for a in EmissionActivity.query}, {13.0})
+
+    def test_unusable_files(self):
+        with self.assertRaises(ValueError):
+            import_activities(self.user, io.BytesIO(b''), 'activities.pdf')
+        with self.assertRaises(ValueError):
+            import_activities(self.user, self.csv_file(['scope,category', '1,x']), 'activities.csv')
+
+    def test_parse_row_defaults(self):
+        values = parse_row({'scope': 'Scope 1', 'category': 'Gaz', 'quantity': '0',
+                            'period_start': '2024-01-01', 'period_end': '2024-01-31',
+                            'ademe_factor_id': '10'})
+        self.assertEqual(values['activity_type'], ActivityType.SIMPLE)
+        self.assertIsNone(values['quantity'])
+
+    def test_api(self):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(self.user.id)
+
+        response = client.post('/api/v1/activities/import',
+                               data={'file': (self.csv_file(), 'activities.csv')})
+        # Queued as a background job (run inline under the testing config)
+        self.assertEqual(response.status_code, 202)
+        job = client.get(f"/api/v1/jobs/{response.json['id']}").json
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['result']['imported'], 2)
+        self.assertEqual(os.listdir(self.app.config['JOB_FILES_DIR']), [])
+
+        response = client.post('/api/v1/activities/import', data={})
+        self.assertEqual(response.status_code, 400)
+        response = client.post('/api/v1/activities/import',
+                               data={'file': (io.BytesIO(b'a,b\n1,2'), 'activities.csv')})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(os.listdir(self.app.config['JOB_FILES_DIR']), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import io
+import unittest
+from unittest import mock
+
+from flask import g
+
+from app.emissions.importer import import_activities
+from app.emissions.services import create_activity, submit_activity, validate_activity
+from app.extensions import db
+from app.factory import create_app
+from app.models.organization import Organization
+from app.models.user import User, UserRole
+from app.services import analytics_cache, emission_factor_loader
+from app.services.job_queue import enqueue
+from tests.test_emission_factor_search import make_factor
+from tests.test_emission_rollup import form
+from tests.test_factors_api import install_loader
+
+
+class AnalyticsCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        analytics_cache.analytics_cache.clear()
+        self.previous_loader = emission_factor_loader._global_loader
+        install_loader([make_factor('10', 'Électricité', factor=0.05)])
+
+        acme, other = Organization(name='Acme'), Organization(name='Other')
+        db.session.add_all([acme, other])
+        db.session.flush()
+        self.admin = User(email='admin@acme.test', password_hash='x', organization_id=acme.id,
+                          role=UserRole.ORG_ADMIN)
+        self.worker = User(email='worker@acme.test', password_hash='x', organization_id=acme.id,
+                           role=UserRole.WORKER)
+        self.other_admin = User(email='admin@other.test', password_hash='x',
+                                organization_id=other.id, role=UserRole.ORG_ADMIN)
+        self.platform_admin = User(email='root@greenledger.test', password_hash='x',
+                                   role=UserRole.PLATFORM_ADMIN)
+        db.session.add_all([self.admin, self.worker, self.other_admin, self.platform_admin])
+        db.session.commit()
+
+    def tearDown(self):
+        emission_factor_loader._global_loader = self.previous_loader
+        analytics_cache.analytics_cache.clear()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def get(self, user, url='/api/v1/analytics/emissions'):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+        g.pop('_login_user', None)
+        return client.get(url)
+
+    def total(self, user, url='/api/v1/analytics/emissions'):
+        return self.get(user, url).json['summary']['total_kg']
+
+    def hits(self):
+        return analytics_cache.stats()['hits']
+
+    def test_hits_and_precise_invalidation(self):
+        activity = create_activity(self.worker, form())
+        self.assertEqual(self.total(self.admin), 50.0)
+        hits = self.hits()
+        self.assertEqual(self.total(self.admin), 50.0)
+        self.assertEqual(self.total(self.other_admin), 0.0)
+        self.assertEqual(self.hits(), hits + 1)
+
+        # Another organization's change leaves Acme's entry alone
+        create_activity(self.other_admin, form(), auto_validate=True)
+        self.assertEqual(self.total(self.admin), 50.0)
+        self.assertEqual(self.hits(), hits + 2)
+        self.assertEqual(self.total(self.other_admin), 50.0)
+
+        # Edits outside the aggregated columns keep the entry too
+        validated_url = '/api/v1/analytics/emissions?status=validated'
+        self.assertEqual(self.total(self.admin, validated_url), 0.0)
+        activity.auditor_notes = 'Looks fine'
+        db.session.commit()
+        self.assertEqual(self.total(self.admin, validated_url), 0.0)
+        self.assertEqual(self.hits(), hits + 3)
+
+        submit_activity(self.worker, activity.id)
+        validate_activity(self.admin, activity.id)
+        self.assertEqual(self.total(self.admin, validated_url), 50.0)
+
+        # The other organization's entry survived Acme's workflow changes
+        self.assertEqual(self.total(self.other_admin), 50.0)
+        self.assertEqual(self.hits(), hits + 4)
+
+    def test_bulk_import_and_platform_view(self):
+        self.assertEqual(self.total(self.platform_admin), 0.0)
+        self.assertEqual(self.total(self.worker), 0.0)
+
+        stream = io.BytesIO(b'scope;category;quantity;period_start;period_end;ademe_factor_id\n'
+                            b'2;Electricite;200;2024-01-01;2024-01-31;10')
+        import_activities(self.worker, stream, 'activities.csv')
+        enqueue('refresh_platform_rollups')
+        self.assertEqual(self.total(self.platform_admin), 10.0)
+        self.assertEqual(self.total(self.worker), 10.0)
+
+    def test_commit_of_another_worker(self):
+        self.assertEqual(self.total(self.admin), 0.0)
+        self.assertEqual(self.total(self.platform_admin), 0.0)
+        self.assertEqual(self.total(self.other_admin), 0.0)
+        hits = self.hits()
+
+        # Committed by another process: this worker's cache is not invalidated
+        with mock.patch.object(analytics_cache, 'invalidate_organizations'):
+            create_activity(self.admin, form(), auto_validate=True)
+        self.assertEqual(analytics_cache.stats()['size'], 3)
+
+        self.assertEqual(self.total(self.admin), 50.0)
+        self.assertEqual(self.total(self.other_admin), 0.0)
+        self.assertEqual(self.hits(), hits + 1)
+
+        # Platform totals follow once another worker refreshed the platform tables
+        self.assertEqual(self.total(self.platform_admin), 0.0)
+        with mock.patch.object(analytics_cache, 'invalidate_organizations'):
+            enqueue('refresh_platform_rollups')
+        self.assertEqual(self.total(self.platform_admin), 50.0)
+
+    def test_stats_endpoint(self):
+        before = analytics_cache.stats()
+        self.get(self.admin)
+        self.get(self.admin)
+        self.assertEqual(self.get(self.admin, '/api/v1/analytics/stats').status_code, 403)
+
+        stats = self.get(self.platform_admin, '/api/v1/analytics/stats').json
+        self.assertEqual((stats['hits'] - before['hits'], stats['misses'] - before['misses']), (1, 1))
+        self.assertEqual(stats['size'], 1)
+        self.assertIsNotNone(stats['avg_hit_ms'])
+        self.assertIsNotNone(stats['avg_miss_ms'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+
+from flask import g
+from sqlalchemy import event
+
+from app.dashboard.services import activity_status_counts
+from app.emissions.services import create_activity, submit_activity
+from app.extensions import db
+from app.factory import create_app
+from app.models.auditor_contract import AuditorContract, AuditorType, ContractStatus
+from app.models.organization import Organization
+from app.models.report import Report, ReportStatus
+from app.models.user import User, UserRole
+from app.services import emission_factor_loader
+from tests.test_emission_factor_search import make_factor
+from tests.test_emission_rollup import form
+from tests.test_factors_api import install_loader
+
+
+class AuditorDashboardTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.previous_loader = emission_factor_loader._global_loader
+        install_loader([make_factor('10', 'Électricité', factor=0.052)])
+
+        self.auditor = User(email='auditor@audit.test', password_hash='x', role=UserRole.AUDITOR)
+        db.session.add(self.auditor)
+        db.session.commit()
+
+    def tearDown(self):
+        emission_factor_loader._global_loader = self.previous_loader
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_org(self, name, auditor_type=AuditorType.PRIMARY):
+        org = Organization(name=name)
+        db.session.add(org)
+        db.session.flush()
+        admin = User(email=f'admin@{name.lower()}.test', password_hash='x',
+                     organization_id=org.id, role=UserRole.ORG_ADMIN)
+        db.session.add_all([
+            admin,
+            AuditorContract(organization_id=org.id, auditor_id=self.auditor.id,
+                            auditor_type=auditor_type, status=ContractStatus.ACTIVE),
+        ])
+        db.session.commit()
+        return org, admin
+
+    def get(self, url):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(self.auditor.id)
+        g.pop('_login_user', None)
+        return client.get(url)
+
+    def count_queries(self, url):
+        statements = []
+
+        def record(*args):
+            statements.append(args[2])
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = self.get(url)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(response.status_code, 200)
+        return len(statements)
+
+    def test_status_counts_across_organizations(self):
+        acme, acme_admin = self.add_org('Acme')
+        globex, globex_admin = self.add_org('Globex', AuditorType.COLLATERAL)
+        create_activity(acme_admin, form(), auto_validate=True)
+        proof = create_activity(acme_admin, form())
+        submit_activity(acme_admin, proof.id)
+        proof.proof_requested = True
+        create_activity(globex_admin, form())
+        db.session.commit()
+
+        counts = activity_status_counts([acme.id, globex.id])
+        self.assertEqual((counts[acme.id]['validated'], counts[acme.id]['submitted'],
+                          counts[acme.id]['proof_requested']), (1, 1, 1))
+        self.assertEqual((counts[globex.id]['draft'], counts[globex.id]['proof_requested']), (1, 0))
+        self.assertEqual(activity_status_counts([]), {})
+
+        db.session.add(Report(summary='FY', status=ReportStatus.PENDING_COLLATERAL_REVIEW,
+                              organization_id=globex.id, created_by_id=globex_admin.id))
+        db.session.commit()
+        response = self.get('/dashboard/auditor/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(f'/dashboard/auditor/org/{acme.id}/review').status_code, 200)
+
+    def test_dashboard_queries_do_not_grow_with_contracts(self):
+        for name in ('Acme', 'Globex'):
+            self.add_org(name)
+        few = self.count_queries('/dashboard/auditor/')
+        for name in ('Initech', 'Umbrella', 'Hooli', 'Stark'):
+            self.add_org(name, AuditorType.COLLATERAL)
+        self.add_org('Wayne')
+        self.assertEqual(self.count_queries('/dashboard/auditor/'), few)
+
+
+if __name__ == '__main__':
+    unittest.main()
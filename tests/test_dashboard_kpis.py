@@ -0,0 +1,95 @@
+import unittest
+
+from flask import g
+
+from app.dashboard.services import organization_kpis, user_status_counts
+from app.emissions.services import create_activity, reject_activity, submit_activity
+from app.extensions import db
+from app.factory import create_app
+from app.models.emission_activity import ActivityStatus
+from app.models.organization import Organization
+from app.models.user import User, UserRole
+from app.services import emission_factor_loader
+from tests.test_emission_factor_search import make_factor
+from tests.test_emission_rollup import form
+from tests.test_factors_api import install_loader
+
+
+class DashboardKpisTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.previous_loader = emission_factor_loader._global_loader
+        install_loader([
+            make_factor('10', 'Électricité', factor=0.052),
+            make_factor('20', 'Gaz naturel', factor=0.227),
+        ])
+
+        acme, other = Organization(name='Acme'), Organization(name='Other')
+        db.session.add_all([acme, other])
+        db.session.flush()
+        self.worker = User(email='worker@acme.test', password_hash='x', organization_id=acme.id,
+                           role=UserRole.WORKER)
+        self.admin = User(email='admin@acme.test', password_hash='x', organization_id=acme.id,
+                          role=UserRole.ORG_ADMIN)
+        self.other_admin = User(email='admin@other.test', password_hash='x',
+                                organization_id=other.id, role=UserRole.ORG_ADMIN)
+        db.session.add_all([self.worker, self.admin, self.other_admin])
+        db.session.commit()
+        self.org = acme
+
+    def tearDown(self):
+        emission_factor_loader._global_loader = self.previous_loader
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def get(self, user, url):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+        g.pop('_login_user', None)
+        return client.get(url)
+
+    def test_organization_kpis(self):
+        empty = organization_kpis(self.org.id)
+        self.assertEqual((empty.total_kg, empty.activity_count, empty.user_count), (0, 0, 2))
+
+        create_activity(self.admin, form(), auto_validate=True)
+        create_activity(self.admin, form(scope='Scope 1', ademe_factor_id='20'), auto_validate=True)
+        submitted = create_activity(self.worker, form(ademe_factor_id=''))
+        submit_activity(self.worker, submitted.id)
+        rejected = create_activity(self.worker, form(quantity='500'))
+        submit_activity(self.worker, rejected.id)
+        reject_activity(self.admin, rejected.id, 'Wrong meter')
+        create_activity(self.worker, form())
+        create_activity(self.other_admin, form(quantity='99999'), auto_validate=True)
+
+        kpis = organization_kpis(self.org.id)
+        self.assertEqual((kpis.total_kg, kpis.scope1_kg, kpis.scope2_kg, kpis.scope3_kg),
+                         (279.0, 227.0, 52.0, 0))
+        self.assertEqual((kpis.val_total_kg, kpis.val_scope2_kg), (279.0, 52.0))
+        self.assertEqual(
+            (kpis.draft_count, kpis.submitted_count, kpis.validated_count, kpis.rejected_count),
+            (1, 1, 2, 1)
+        )
+        self.assertEqual((kpis.activity_count, kpis.with_factor), (5, 2))
+        self.assertEqual(user_status_counts(self.worker.id),
+                         {ActivityStatus.DRAFT: 1, ActivityStatus.SUBMITTED: 1,
+                          ActivityStatus.REJECTED: 1})
+
+    def test_dashboards_render(self):
+        create_activity(self.worker, form())
+        create_activity(self.admin, form(), auto_validate=True)
+
+        response = self.get(self.admin, '/dashboard/org-admin/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'2 active users', response.data)
+        self.assertIn(b'100% data completeness', response.data)
+        self.assertEqual(self.get(self.worker, '/dashboard/worker/').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
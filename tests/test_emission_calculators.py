@@ -0,0 +1,74 @@
+import random
+import struct
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.emissions.calculators import calculate_co2e_bulk, calculate_co2e_frame, round_half_even
+from app.emissions.services import calculate_co2e
+from app.models.emission_factor_database import ActivityType
+
+
+def bits(value):
+    return struct.pack('<d', value)
+
+
+class RoundHalfEvenTestCase(unittest.TestCase):
+    def test_matches_python_round(self):
+        rng = random.Random(7)
+        values = [rng.uniform(-1e4, 1e4) for _ in range(5000)]
+        # Decimal halfway points, which np.round gets wrong on its own
+        values += [n / 1e4 + 5e-5 for n in range(-3000, 3000)]
+        values += [1.00005, 2.675e-3, 0.00015, -0.00005, 1e300, float('inf'), -0.0]
+
+        rounded = round_half_even(values, 4)
+        self.assertEqual([bits(v) for v in rounded], [bits(round(v, 4)) for v in values])
+        self.assertTrue(np.isnan(round_half_even([float('nan')], 4)[0]))
+
+
+class CalculateCO2eBulkTestCase(unittest.TestCase):
+    def make_rows(self, count):
+        rng = random.Random(42)
+        types = [t.value for t in ActivityType]
+        rows = []
+        for _ in range(count):
+            rows.append((
+                rng.choice(types),
+                rng.choice([None, 0.0, round(rng.uniform(0, 1e5), rng.randint(0, 5))]),
+                round(rng.uniform(-1, 500), rng.randint(1, 6)),
+                rng.choice([None, 0.0, round(rng.uniform(0, 40), 3)]),
+                rng.choice([None, 0.0, round(rng.uniform(0, 2000), 1)]),
+            ))
+        return rows
+
+    def scalar(self, rows):
+        return [calculate_co2e(t, q or 0, f, tn, d) for t, q, f, tn, d in rows]
+
+    def test_matches_scalar_path(self):
+        rows = self.make_rows(20000)
+        types, quantities, factors, tonnages, distances = zip(*rows)
+
+        bulk = calculate_co2e_bulk(types, quantities, factors, tonnages, distances)
+        self.assertEqual([bits(v) for v in bulk], [bits(v) for v in self.scalar(rows)])
+
+    def test_transport_rules(self):
+        result = calculate_co2e_bulk(
+            [ActivityType.TRANSPORT, 'transport', 'transport', 'simple'],
+            [10, 10, None, 10],
+            [0.1, 0.1, 0.1, 0.1],
+            [2, None, 2, 2],
+            [100, 100, 0, 100],
+        )
+        self.assertEqual(list(result), [20.0, 1.0, 0.0, 1.0])
+
+    def test_dataframe(self):
+        rows = self.make_rows(500)
+        frame = pd.DataFrame(
+            rows, columns=['activity_type', 'quantity', 'ademe_factor_value', 'tonnage', 'distance']
+        )
+        self.assertEqual(list(calculate_co2e_frame(frame)), self.scalar(rows))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,302 @@
+import csv
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+import unittest
+from unittest import mock
+
+from app.services import emission_factor_loader
+from app.services.emission_factor_loader import (
+    ADEMEEmissionFactorLoader, EmissionFactorData, FACTOR_FIELDS, NUMERIC_FIELDS
+)
+from app.services.factor_store import FactorTable
+from app.services.factor_table import CompactFactorTable
+
+
+ADEME_COLUMNS = [
+    'Type Ligne', "Identifiant de l'élément", 'Nom base français', 'Nom base anglais',
+    'Total poste non décomposé', 'Unité français', 'Unité anglais', 'Code de la catégorie',
+    'Tags français', 'Tags anglais', 'Programme', 'Localisation géographique',
+    'Période de validité', "Statut de l'élément", 'CO2f', 'CH4f', 'CH4b', 'N2O', 'CO2b',
+    'Autres GES', 'Commentaire français', 'Commentaire anglais',
+]
+
+
+def ademe_row(id, name_fr, total, category='Energie > Electricite', status='Valide',
+              unit='kgCO2e/kWh', name_en='', tags='', source='Base Carbone',
+              location='France continentale'):
+    return {
+        'Type Ligne': 'Elément',
+        "Identifiant de l'élément": id,
+        'Nom base français': name_fr,
+        'Nom base anglais': name_en or name_fr,
+        'Total poste non décomposé': total,
+        'Unité français': unit,
+        'Unité anglais': unit,
+        'Code de la catégorie': category,
+        'Tags français': tags,
+        'Tags anglais': tags,
+        'Programme': source,
+        'Localisation géographique': location,
+        'Période de validité': '2024',
+        "Statut de l'élément": status,
+        'CO2f': '0,05',
+        'Commentaire français': 'Commentaire détaillé',
+        'Commentaire anglais': 'Detailed comment',
+    }
+
+
+DEFAULT_ROWS = [
+    ademe_row('1', 'Électricité - mix moyen', '0,052', tags='electricite'),
+    ademe_row('2', 'Gazole routier', '3,17', category='Combustibles > Fossiles', unit='kgCO2e/litre'),
+    ademe_row('3', 'Gaz naturel', '0,227', category='Combustibles > Fossiles'),
+    ademe_row('4', 'Gaz naturel 2015', '0,205', category='Combustibles > Fossiles', status='Archivé'),
+    {'Type Ligne': 'Poste', "Identifiant de l'élément": '5', 'Total poste non décomposé': '1'},
+]
+
+
+def write_ademe_csv(path, rows=DEFAULT_ROWS):
+    with open(path, 'w', encoding='latin-1', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=ADEME_COLUMNS, delimiter=';')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+
+class LoaderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, 'Base_Carbone.csv')
+        write_ademe_csv(self.csv_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parse_csv(self):
+        loader = ADEMEEmissionFactorLoader(self.csv_path, use_snapshot=False)
+        self.assertEqual([f.id for f in loader.factors], ['1', '2', '3', '4'])
+        self.assertAlmostEqual(loader.get_by_id('2').factor, 3.17)
+        self.assertEqual(loader.get_by_id('1').name_fr, 'Électricité - mix moyen')
+        self.assertFalse(os.path.exists(loader.snapshot_path))
+
+    def test_snapshot_roundtrip(self):
+        first = ADEMEEmissionFactorLoader(self.csv_path)
+        self.assertTrue(os.path.exists(first.snapshot_path))
+
+        # Later starts read the snapshot instead of the CSV
+        second = ADEMEEmissionFactorLoader(self.csv_path)
+        second._parse_csv = lambda: self.fail('CSV parsed despite a valid snapshot')
+        second.load_factors()
+        self.assertEqual(
+            [f.to_dict() for f in second.factors],
+            [f.to_dict() for f in first.factors],
+        )
+
+    def test_stale_snapshot_is_rebuilt(self):
+        ADEMEEmissionFactorLoader(self.csv_path)
+        write_ademe_csv(self.csv_path, DEFAULT_ROWS[:2])
+
+        loader = ADEMEEmissionFactorLoader(self.csv_path)
+        self.assertEqual([f.id for f in loader.factors], ['1', '2'])
+
+    def test_shared_store(self):
+        plain = ADEMEEmissionFactorLoader(self.csv_path, use_snapshot=False)
+        shared = ADEMEEmissionFactorLoader(self.csv_path, shared_store=True)
+        self.assertIsInstance(shared.factors, FactorTable)
+        self.assertEqual(
+            [f.to_dict() for f in shared.factors],
+            [f.to_dict() for f in plain.factors],
+        )
+        self.assertIsNone(shared.get_by_id('1').ch4_fossil)
+        self.assertEqual(shared.get_by_id('3').name_fr, 'Gaz naturel')
+        self.assertEqual(
+            [(f.id, s) for f, s in shared.search('gaz')],
+            [(f.id, s) for f, s in plain.search('gaz')],
+        )
+
+        # A second worker maps the existing file instead of rebuilding it
+        other = ADEMEEmissionFactorLoader(self.csv_path, shared_store=True)
+        other._load_rows = lambda: self.fail('Store rebuilt despite a valid file')
+        other.load_factors()
+        self.assertEqual(len(other.factors), 4)
+
+
+class CompactFactorTableTestCase(unittest.TestCase):
+    def make_rows(self, count):
+        comment = 'Facteur issu de la Base Carbone, valeur moyenne nationale. ' * 4
+        return [
+            (str(i), f'Facteur {i}', f'Factor {i}', 0.1 * i, 'kgCO2e/kWh', 'kgCO2e/kWh',
+             'Energie > Electricite', 'tag', 'tag', 'Base Carbone', 'France', '2024',
+             'Valide', 0.5, None, None, 0.01, None, None,
+             f'{comment}{i}', None)
+            for i in range(count)
+        ]
+
+    def test_roundtrip(self):
+        rows = self.make_rows(3)
+        table = CompactFactorTable(FACTOR_FIELDS, NUMERIC_FIELDS, rows, EmissionFactorData)
+        self.assertEqual(len(table), 3)
+        self.assertEqual([f.to_row() for f in table], rows)
+        self.assertEqual(table[-1].id, '2')
+        self.assertEqual(table.column('name_fr'), ['Facteur 0', 'Facteur 1', 'Facteur 2'])
+        with self.assertRaises(IndexError):
+            table[3]
+
+    def test_smaller_than_record_list(self):
+        def footprint(build):
+            tracemalloc.start()
+            structure = build()
+            size, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return size
+
+        # The table interns repeated strings; grow the process-wide interned
+        # dict beforehand so its resize is not billed to the table
+        CompactFactorTable(FACTOR_FIELDS, NUMERIC_FIELDS, self.make_rows(2000), EmissionFactorData)
+        # Rows are built inside each measurement, as the CSV parser would
+        records = footprint(lambda: [EmissionFactorData(*row) for row in self.make_rows(2000)])
+        compact = footprint(lambda: CompactFactorTable(
+            FACTOR_FIELDS, NUMERIC_FIELDS, self.make_rows(2000), EmissionFactorData
+        ))
+        self.assertLess(compact, records)
+
+
+class WarmUpTestCase(unittest.TestCase):
+    def setUp(self):
+        self.reset()
+        self.builds = 0
+
+        def slow_loader(csv_path=None, *args, **kwargs):
+            self.builds += 1
+            time.sleep(0.05)
+            return mock.Mock(factors=[1, 2, 3], csv_path=csv_path)
+
+        patcher = mock.patch.object(emission_factor_loader, 'ADEMEEmissionFactorLoader', slow_loader)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.reset)
+
+    def reset(self):
+        emission_factor_loader._global_loader = None
+        emission_factor_loader._loader_error = None
+        emission_factor_loader._warm_up_thread = None
+        emission_factor_loader._loader_ready.clear()
+
+    def test_concurrent_first_requests_share_one_load(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(emission_factor_loader.get_loader()))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(len({id(r) for r in results}), 1)
+
+    def test_status_reports_readiness(self):
+        thread = emission_factor_loader.start_warm_up()
+        self.assertTrue(emission_factor_loader.loader_status()['loading'])
+        thread.join()
+
+        status = emission_factor_loader.loader_status()
+        self.assertTrue(status['ready'])
+        self.assertEqual(status['factors'], 3)
+        self.assertIsNone(emission_factor_loader.start_warm_up())
+
+    def test_preload_before_fork(self):
+        with mock.patch.object(emission_factor_loader.gc, 'freeze') as freeze:
+            loader = emission_factor_loader.preload_factors()
+            self.assertIs(emission_factor_loader.preload_factors(), loader)
+
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(freeze.call_count, 2)
+        # Forked workers find it loaded and start no warm-up of their own
+        self.assertIsNone(emission_factor_loader.start_warm_up())
+        self.assertIs(emission_factor_loader.get_loader(), loader)
+
+    def test_reload_swaps_loader(self):
+        old_loader = emission_factor_loader.get_loader()
+        version = emission_factor_loader.get_loader_version()
+
+        new_version = emission_factor_loader.reload_factors()
+
+        self.assertEqual(new_version, version + 1)
+        self.assertIsNot(emission_factor_loader.get_loader(), old_loader)
+        # The previous loader is left intact for requests still using it
+        self.assertEqual(old_loader.factors, [1, 2, 3])
+        self.assertEqual(self.builds, 2)
+
+    def test_warm_up_keeps_newer_reload(self):
+        gate = threading.Event()
+        built = []
+
+        def gated_loader(csv_path=None):
+            loader = mock.Mock(factors=[len(built)], csv_path=csv_path)
+            built.append(loader)
+            if len(built) == 1:
+                gate.wait(5)
+            return loader
+
+        with mock.patch.object(emission_factor_loader, 'ADEMEEmissionFactorLoader', gated_loader):
+            thread = emission_factor_loader.start_warm_up()
+            while not built:
+                time.sleep(0.01)
+            emission_factor_loader.reload_factors()
+            gate.set()
+            thread.join()
+
+        self.assertIs(emission_factor_loader.get_loader(), built[1])
+
+    def test_reload_stamp_reaches_every_process(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        csv_path = os.path.join(directory, 'factors.csv')
+        patcher = mock.patch.object(emission_factor_loader, 'default_csv_path', return_value=csv_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        class Stop(Exception):
+            pass
+
+        def watch_once():
+            ticks = []
+            sleep = time.sleep
+
+            def tick(seconds):
+                if seconds != 1e-6:
+                    return sleep(seconds)
+                ticks.append(seconds)
+                if len(ticks) > 1:
+                    raise Stop
+
+            with mock.patch.object(emission_factor_loader.time, 'sleep', tick):
+                with self.assertRaises(Stop):
+                    emission_factor_loader._watch(1e-6)
+
+        emission_factor_loader.get_loader()
+        watch_once()
+        self.assertEqual(self.builds, 1)
+
+        # Another worker asked for a reload
+        with open(emission_factor_loader.reload_stamp_path(csv_path), 'w') as f:
+            f.write('other-worker')
+        watch_once()
+        self.assertEqual(self.builds, 2)
+        watch_once()
+        self.assertEqual(self.builds, 2)
+
+        # This worker asked: reloaded once, not again by its own watcher
+        emission_factor_loader.request_reload().join()
+        self.assertEqual(self.builds, 3)
+        watch_once()
+        self.assertEqual(self.builds, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
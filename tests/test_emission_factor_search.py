@@ -0,0 +1,208 @@
+import unittest
+from difflib import SequenceMatcher
+
+from app.services.emission_factor_loader import EmissionFactorData, EmissionFactorSearchEngine
+from app.services.factor_index import InvertedIndex, PrefixIndex, TrigramIndex, fold_text, tokenize
+
+
+def make_factor(id, name_fr, name_en='', category='Energie > Electricite', tags_fr='',
+                status='Valide', source='Base Carbone', unit_fr='kgCO2e/kWh', factor=1.0,
+                geographic_location='France continentale'):
+    return EmissionFactorData(
+        id=id, name_fr=name_fr, name_en=name_en or name_fr, factor=factor,
+        unit_fr=unit_fr, unit_en=unit_fr, category=category,
+        tags_fr=tags_fr, tags_en=tags_fr, source=source,
+        geographic_location=geographic_location, validity_period='2024', status=status,
+    )
+
+
+FACTORS = [
+    make_factor('1', 'Électricité - mix moyen', 'Electricity - average mix', tags_fr='electricite,reseau'),
+    make_factor('2', 'Électricité - usage chauffage', 'Electricity - heating', tags_fr='electricite'),
+    make_factor('3', 'Gazole routier', 'Road diesel', category='Combustibles > Fossiles', tags_fr='gazole,diesel'),
+    make_factor('4', 'Gaz naturel', 'Natural gas', category='Combustibles > Fossiles', tags_fr='gaz'),
+    make_factor('5', 'Fioul domestique', 'Heating oil', category='Combustibles > Fossiles', tags_fr='fioul'),
+    make_factor('6', 'Gaz naturel 2015', 'Natural gas 2015', category='Combustibles > Fossiles', status='Archivé'),
+    make_factor('7', 'Transport routier - camion', 'Road transport - truck', category='Transport > Marchandises'),
+    make_factor('8', 'Bœuf haché', 'Minced beef', category='Achats de biens > Alimentation'),
+]
+
+
+def brute_force_search(factors, query, language='fr', max_results=20):
+    """Reference implementation: the original full-scan scorer"""
+    query_lower = query.lower()
+    results = []
+    for factor in factors:
+        if factor.status == 'Archivé':
+            continue
+        name = factor.name_fr if language == 'fr' else factor.name_en
+        tags = factor.tags_fr if language == 'fr' else factor.tags_en
+        score = 0.0
+        if query_lower in name.lower():
+            score += 1.0
+        score += SequenceMatcher(None, query_lower, name.lower()).ratio() * 0.8
+        if tags and query_lower in tags.lower():
+            score += 0.5
+        if query_lower in factor.category.lower():
+            score += 0.3
+        if score > 0.2:
+            results.append((factor, score))
+    results.sort(key=lambda x: x[1], reverse=True)
+    return results[:max_results]
+
+
+class TokenIndexTestCase(unittest.TestCase):
+    def test_fold_text(self):
+        self.assertEqual(fold_text('Électricité'), 'electricite')
+        self.assertEqual(fold_text('Bœuf'), 'boeuf')
+        self.assertEqual(tokenize('Gaz naturel - 2015'), ['gaz', 'naturel', '2015'])
+
+    def test_prefix_candidates(self):
+        index = InvertedIndex()
+        index.add(0, 'Électricité mix')
+        index.add(1, 'Gaz naturel')
+        index.add(2, 'Gazole routier')
+        index.finalize()
+
+        self.assertEqual(index.candidates('elec'), [0])
+        self.assertEqual(index.candidates('gaz'), [1, 2])
+        self.assertEqual(index.candidates('gaz nat'), [1])
+        self.assertEqual(index.candidates('zzz'), [])
+
+    def test_trigram_similarity(self):
+        index = TrigramIndex()
+        index.add('Électricité', 'Gazole', 'Fioul domestique')
+
+        self.assertEqual(index.similar('electrisite')[0][0], 'electricite')
+        self.assertEqual(index.similar('gasole')[0][0], 'gazole')
+        self.assertEqual(index.similar('fiol')[0][0], 'fioul')
+        self.assertEqual(index.similar('zzzz'), [])
+
+    def test_prefix_completions(self):
+        index = PrefixIndex()
+        index.add('Gaz naturel', 11, 'gaz-naturel')
+        index.add('Gazole routier', 14, 'gazole')
+        index.add('Électricité - mix moyen', 23, 'mix')
+        index.add('gaz', -3, 'tag-gaz')
+        index.finalize()
+
+        self.assertEqual(index.complete('ga'), ['tag-gaz', 'gaz-naturel', 'gazole'])
+        self.assertEqual(index.complete('Gazo'), ['gazole'])
+        self.assertEqual(index.complete('gaz nat'), ['gaz-naturel'])
+        self.assertEqual(index.complete('élec'), ['mix'])
+        # Words other than the first complete too
+        self.assertEqual(index.complete('mix'), ['mix'])
+        self.assertEqual(index.complete('rout'), ['gazole'])
+        self.assertEqual(index.complete('ga', limit=1), ['tag-gaz'])
+        self.assertEqual(index.complete('zz'), [])
+
+
+class SearchEngineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = EmissionFactorSearchEngine(FACTORS)
+
+    def assertMatchesFullScan(self, query):
+        expected = [(f.id, score) for f, score in
+                    brute_force_search(FACTORS, query, max_results=len(FACTORS))]
+        actual = [(f.id, score) for f, score in self.engine.search(query, max_results=len(FACTORS))]
+        self.assertEqual(actual[0], expected[0], query)
+        # Same scores, in the same order, as the full scan
+        self.assertEqual(actual, [hit for hit in expected if hit in actual], query)
+        # Every factor containing the query is found, wherever the query starts
+        lower = query.lower()
+        containing = [(f.id, score) for f, score in
+                      brute_force_search(FACTORS, query, max_results=len(FACTORS))
+                      if lower in f'{f.name_fr} {f.tags_fr} {f.category}'.lower()]
+        self.assertTrue(containing, query)
+        self.assertEqual([hit for hit in actual if hit in containing], containing, query)
+
+    def test_matches_brute_force_ranking(self):
+        for query in ('élec', 'Gaz', 'gazole', 'fioul', 'transport', 'naturel', 'lectri', 'tricit'):
+            self.assertMatchesFullScan(query)
+
+    def test_fallback_without_indexed_tokens(self):
+        # One-letter tokens and fragments spanning words are not in the token index
+        for query in ('é', 'f', 'é - m', 'l d', 'té - u'):
+            self.assertEqual(self.engine.token_index['fr'].candidates(query), [], query)
+            self.assertMatchesFullScan(query)
+        self.assertEqual(self.engine.search(' '), [])
+        # Archived factors stay out of the fallback too
+        self.assertEqual(self.engine.search('l 2015'), [])
+        self.assertEqual(self.engine.search('l 2015', valid_only=False)[0][0].id, '6')
+
+    def test_fragment_inside_word(self):
+        index = InvertedIndex(TrigramIndex())
+        for position, text in enumerate(('Électricité mix', 'Biogaz', 'Gaz naturel')):
+            index.add(position, text)
+            index.trigram_index.add(text)
+        index.finalize()
+
+        self.assertEqual(index.candidates('lectri'), [0])
+        self.assertEqual(index.candidates('gaz'), [1, 2])
+        self.assertEqual(index.trigram_index.containing('ga'), [])
+
+    def test_accent_folded_lookup(self):
+        ids = [f.id for f, _ in self.engine.search('electricite')]
+        self.assertIn('1', ids)
+        self.assertIn('2', ids)
+
+    def test_typo_tolerant_lookup(self):
+        self.assertEqual(self.engine.search('gasole')[0][0].id, '3')
+        self.assertEqual(self.engine.search('fiol')[0][0].id, '5')
+        self.assertIn('1', [f.id for f, _ in self.engine.search('electrisite')])
+        self.assertEqual(self.engine.search('qwxz'), [])
+
+    def test_archived_factors_skipped(self):
+        ids = [f.id for f, _ in self.engine.search('gaz naturel')]
+        self.assertIn('4', ids)
+        self.assertNotIn('6', ids)
+
+    def test_archived_factors_included_on_request(self):
+        ids = [f.id for f, _ in self.engine.search('gaz naturel', valid_only=False)]
+        self.assertEqual(ids[:2], ['4', '6'])
+        self.assertEqual(self.engine.count_archived(), 1)
+        self.assertEqual(self.engine.search('2015'), [])
+
+    def test_facet_filters(self):
+        ids = [f.id for f, _ in self.engine.search('gaz', filters={'category': ['Combustibles > Fossiles']})]
+        self.assertEqual(sorted(ids), ['3', '4'])
+        ids = [f.id for f, _ in self.engine.search('routier', filters={'category': ['Transport > Marchandises']})]
+        self.assertEqual(ids, ['7'])
+        self.assertEqual(self.engine.search('gaz', filters={'source': ['Unknown']}), [])
+        with self.assertRaises(ValueError):
+            self.engine.search('gaz', filters={'colour': ['green']})
+
+    def test_facet_counts(self):
+        hits, counts = self.engine.faceted_search(
+            'routier', filters={'category': ['Transport > Marchandises']}
+        )
+        self.assertEqual([f.id for f, _ in hits], ['7'])
+        # The selected facet keeps the counts of its alternatives
+        self.assertEqual(counts['category'], {'Combustibles > Fossiles': 1, 'Transport > Marchandises': 1})
+        self.assertEqual(counts['source'], {'Base Carbone': 1})
+        self.assertEqual(counts['unit'], {'kgCO2e/kWh': 1})
+
+    def test_search_many_matches_search(self):
+        queries = ['gaz', 'élec', 'gasole', 'gaz', 'qwxz']
+        results = self.engine.search_many(queries, max_results=3)
+        self.assertEqual(
+            [[(f.id, score) for f, score in hits] for hits in results],
+            [[(f.id, score) for f, score in self.engine.search(q, max_results=3)] for q in queries],
+        )
+
+    def test_max_results(self):
+        self.assertEqual(len(self.engine.search('gaz', max_results=1)), 1)
+        self.assertEqual(self.engine.search('gaz', max_results=0), [])
+
+    def test_suggest(self):
+        suggestions = self.engine.suggest('gaz')
+        self.assertEqual(suggestions[0], {'type': 'tag', 'text': 'gaz', 'count': 1})
+        self.assertIn({'type': 'factor', 'text': 'Gaz naturel', 'id': '4'}, suggestions)
+        # Archived factors are not suggested
+        self.assertNotIn('6', [s.get('id') for s in suggestions])
+        self.assertEqual(self.engine.suggest('natural', language='en')[0]['id'], '4')
+        self.assertEqual(self.engine.suggest('qwxz'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import unittest
+from datetime import date
+
+from app.emissions.recalculation import recalculate_activities
+from app.emissions.rollup import rebuild_rollups, record_change, rollup_state
+from app.emissions.services import calculate_co2e
+from app.extensions import db
+from app.factory import create_app
+from app.models.audit_log import AuditLog
+from app.models.emission_activity import ActivityStatus, EmissionActivity, EmissionScope
+from app.models.emission_rollup import EmissionRollup
+from app.models.emission_factor_database import ActivityType
+from app.models.organization import Organization
+from app.models.user import User
+from app.services import emission_factor_loader
+from tests.test_emission_factor_search import make_factor
+from tests.test_factors_api import install_loader
+
+
+class RecalculationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.previous_loader = emission_factor_loader._global_loader
+        install_loader([
+            make_factor('10', 'Électricité', factor=0.06),
+            make_factor('20', 'Transport routier', unit_fr='kgCO2e/t.km', factor=0.1),
+        ])
+
+        org = Organization(name='Acme')
+        db.session.add(org)
+        db.session.flush()
+        user = User(email='worker@acme.test', password_hash='x', organization_id=org.id)
+        db.session.add(user)
+        db.session.flush()
+        self.org, self.user = org, user
+
+    def tearDown(self):
+        emission_factor_loader._global_loader = self.previous_loader
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_activity(self, factor_id, old_value, status=ActivityStatus.VALIDATED,
+                     activity_type=ActivityType.SIMPLE, quantity=1000.0, tonnage=None, distance=None):
+        activity = EmissionActivity(
+            organization_id=self.org.id, created_by_id=self.user.id, scope=EmissionScope.SCOPE_2,
+            category='Energie', activity_type=activity_type, quantity=quantity,
+            tonnage=tonnage, distance=distance, period_start=date(2024, 1, 1),
+            period_end=date(2024, 12, 31), status=status, ademe_factor_id=factor_id,
+            ademe_factor_value=old_value,
+            co2e_result=calculate_co2e(activity_type.value, quantity, old_value, tonnage, distance),
+        )
+        db.session.add(activity)
+        return activity
+
+    def test_recalculates_non_audited_activities(self):
+        simple = [self.add_activity('10', 0.052) for _ in range(5)]
+        transport = self.add_activity('20', 0.09, activity_type=ActivityType.TRANSPORT,
+                                      quantity=None, tonnage=12.0, distance=450.0)
+        audited = self.add_activity('10', 0.052, status=ActivityStatus.AUDITED)
+        current = self.add_activity('10', 0.06)
+        missing = self.add_activity('99', 1.5)
+        db.session.commit()
+
+        reports = []
+        report = recalculate_activities(actor_id=self.user.id, chunk_size=3,
+                                        progress=lambda r: reports.append(r.processed))
+
+        self.assertTrue(report.done)
+        self.assertEqual(report.total, 8)
+        self.assertEqual((report.updated, report.unchanged, report.missing_factor), (6, 1, 1))
+        self.assertEqual(report.chunks, 3)
+        self.assertEqual(reports, [3, 6, 8, 8])
+
+        db.session.expire_all()
+        for activity in simple:
+            self.assertEqual(activity.ademe_factor_value, 0.06)
+            self.assertEqual(activity.co2e_result, calculate_co2e('simple', 1000.0, 0.06))
+        self.assertEqual(transport.co2e_result, calculate_co2e('transport', 0, 0.1, 12.0, 450.0))
+        self.assertEqual(audited.ademe_factor_value, 0.052)
+        self.assertEqual(missing.ademe_factor_value, 1.5)
+        self.assertEqual(current.co2e_result, 60.0)
+
+        # One consolidated entry per chunk that changed something
+        entries = AuditLog.query.filter_by(action='RECALCULATE_EMISSIONS').all()
+        self.assertEqual(len(entries), 2)
+        self.assertTrue(all(entry.actor_id == self.user.id for entry in entries))
+
+    def test_second_run_is_a_no_op(self):
+        self.add_activity('10', 0.052)
+        db.session.commit()
+        recalculate_activities()
+
+        report = recalculate_activities()
+        self.assertEqual((report.updated, report.unchanged), (0, 1))
+        self.assertEqual(AuditLog.query.filter_by(action='RECALCULATE_EMISSIONS').count(), 1)
+
+    def rollups(self):
+        return sorted(
+            (r.scope.value, r.status.value, round(r.co2e_kg, 6), r.activity_count, r.priced_count)
+            for r in EmissionRollup.query.all()
+        )
+
+    def test_rows_changed_after_streaming(self):
+        first, audited, edited = (self.add_activity('10', 0.052) for _ in range(3))
+        db.session.commit()
+        rebuild_rollups()
+
+        def edit_others(report):
+            if report.chunks != 1:
+                return
+            # Another request audits one activity and edits the next one's quantity
+            before = rollup_state(audited)
+            audited.status = ActivityStatus.AUDITED
+            record_change(before, audited)
+            before = rollup_state(edited)
+            edited.quantity = 2000.0
+            edited.co2e_result = calculate_co2e('simple', 2000.0, 0.052)
+            record_change(before, edited)
+            db.session.commit()
+
+        report = recalculate_activities(chunk_size=1, progress=edit_others)
+
+        self.assertEqual((report.processed, report.updated), (3, 2))
+        db.session.expire_all()
+        self.assertEqual(audited.ademe_factor_value, 0.052)
+        self.assertEqual(edited.co2e_result, calculate_co2e('simple', 2000.0, 0.06))
+        # The incremental rollups match a full rebuild
+        incremental = self.rollups()
+        rebuild_rollups()
+        self.assertEqual(incremental, self.rollups())
+
+
+if __name__ == '__main__':
+    unittest.main()
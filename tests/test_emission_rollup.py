@@ -0,0 +1,277 @@
+import io
+import unittest
+from datetime import date, datetime, timedelta
+
+from flask import g
+from sqlalchemy import update
+
+from app.emissions.importer import import_activities
+from app.emissions.recalculation import recalculate_activities
+from app.emissions import rollup
+from app.emissions.rollup import rebuild_rollups
+from app.emissions.services import (
+    create_activity, reject_activity, submit_activity, update_activity, validate_activity
+)
+from app.extensions import db
+from app.factory import create_app
+from app.models.background_job import JobStatus
+from app.models.emission_activity import ActivityStatus, EmissionScope
+from app.models.emission_rollup import (
+    EmissionRollup, PlatformEmissionBreakdown, PlatformEmissionRollup, PlatformRollupVersion
+)
+from app.models.organization import Organization
+from app.models.user import User, UserRole
+from app.services import analytics_cache, emission_factor_loader
+from app.services.job_queue import enqueue, job_queue
+from tests.test_emission_factor_search import make_factor
+from tests.test_factors_api import install_loader
+
+
+def form(**values):
+    return {
+        'scope': 'Scope 2', 'category': 'Electricité', 'activity_type': 'simple',
+        'quantity': '1000', 'period_start': '2024-01-15', 'period_end': '2024-01-31',
+        'ademe_factor_id': '10', **values,
+    }
+
+
+class EmissionRollupTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        analytics_cache.analytics_cache.clear()
+        self.previous_loader = emission_factor_loader._global_loader
+        install_loader([
+            make_factor('10', 'Électricité', factor=0.052),
+            make_factor('20', 'Gaz naturel', factor=0.227),
+        ])
+
+        org = Organization(name='Acme', industry='Retail', country='France')
+        db.session.add(org)
+        db.session.flush()
+        self.worker = User(email='worker@acme.test', password_hash='x', organization_id=org.id,
+                           role=UserRole.WORKER)
+        self.admin = User(email='admin@acme.test', password_hash='x', organization_id=org.id,
+                          role=UserRole.ORG_ADMIN)
+        db.session.add_all([self.worker, self.admin])
+        db.session.commit()
+        self.org = org
+
+    def tearDown(self):
+        emission_factor_loader._global_loader = self.previous_loader
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def rollups(self):
+        return {
+            (r.scope, r.category, r.activity_type, r.status, r.period_month):
+                (round(r.co2e_kg, 6), r.activity_count, r.priced_count, r.factor_count)
+            for r in EmissionRollup.query.filter(EmissionRollup.activity_count > 0)
+        }
+
+    def platform(self):
+        return (
+            {(r.scope, r.category, r.activity_type, r.status, r.period_month):
+                (round(r.co2e_kg, 6), r.activity_count, r.priced_count, r.factor_count)
+             for r in PlatformEmissionRollup.query},
+            {(r.dimension, r.value, r.scope, r.status):
+                (round(r.co2e_kg, 6), r.activity_count, r.priced_count, r.factor_count)
+             for r in PlatformEmissionBreakdown.query},
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.rollups()
+        rebuild_rollups()
+        self.assertEqual(incremental, self.rollups())
+        return incremental
+
+    def test_workflow_keeps_rollups_in_step(self):
+        first = create_activity(self.worker, form())
+        second = create_activity(self.worker, form(period_start='2024-02-03', period_end='2024-02-28'))
+        create_activity(self.admin, form(scope='Scope 1', ademe_factor_id='20'), auto_validate=True)
+        create_activity(self.worker, form(ademe_factor_id=''))
+        self.assertMatchesRebuild()
+
+        submit_activity(self.worker, first.id)
+        submit_activity(self.worker, second.id)
+        validate_activity(self.admin, first.id)
+        reject_activity(self.admin, second.id, 'Wrong meter')
+        rollups = self.assertMatchesRebuild()
+
+        january = date(2024, 1, 1)
+        validated = rollups[(EmissionScope.SCOPE_2, 'Electricité', first.activity_type,
+                             ActivityStatus.VALIDATED, january)]
+        self.assertEqual(validated, (52.0, 1, 1, 1))
+
+        # Editing moves the activity to another month, value and status
+        update_activity(self.worker, second.id, form(quantity='2000', period_start='2024-03-01',
+                                                     period_end='2024-03-31'))
+        update_activity(self.admin, first.id, form(category='Electricité verte'), is_admin=True)
+        rollups = self.assertMatchesRebuild()
+        self.assertNotIn((EmissionScope.SCOPE_2, 'Electricité', first.activity_type,
+                          ActivityStatus.VALIDATED, january), rollups)
+        self.assertEqual(EmissionRollup.query.filter_by(activity_count=0).count(), 0)
+
+    def test_existing_activities_are_backfilled(self):
+        from app.dashboard.services import organization_kpis
+        from app.models.report import Report
+        from app.services.report_generator import ReportDataExtractor
+
+        create_activity(self.admin, form(), auto_validate=True)
+        create_activity(self.admin, form(category='', quantity='500'), auto_validate=True)
+        expected = self.rollups()
+        # A deployment upgraded from before the rollup tables
+        for model in (EmissionRollup, PlatformEmissionRollup, PlatformEmissionBreakdown):
+            model.query.delete()
+        db.session.commit()
+        rollup._backfilled.pop(db.engine, None)
+
+        self.assertEqual(organization_kpis(self.org.id).val_total_kg, 78.0)
+        self.assertEqual(self.rollups(), expected)
+
+        report = Report(summary='FY', organization_id=self.org.id, created_by_id=self.admin.id)
+        db.session.add(report)
+        db.session.commit()
+        # Activities without a category keep the key they had before the rollups
+        self.assertEqual(ReportDataExtractor.get_data(report.id)['category_totals'],
+                         {'Electricité': 52.0, None: 26.0})
+
+    def test_bulk_import_and_recalculation(self):
+        lines = ['scope;category;quantity;period_start;period_end;ademe_factor_id']
+        lines += [f'2;Electricité;{100 + i};2024-0{1 + i % 3}-01;2024-06-30;10' for i in range(7)]
+        stream = io.BytesIO('\n'.join(lines).encode())
+        import_activities(self.worker, stream, 'activities.csv', chunk_size=3)
+        self.assertEqual(sum(r.activity_count for r in EmissionRollup.query), 7)
+        self.assertMatchesRebuild()
+
+        install_loader([make_factor('10', 'Électricité', factor=0.06)])
+        recalculate_activities(chunk_size=4)
+        rollups = self.assertMatchesRebuild()
+        self.assertAlmostEqual(sum(v[0] for v in rollups.values()),
+                               sum(100 + i for i in range(7)) * 0.06)
+
+    def test_analytics_reads_rollups(self):
+        for category, quantity in (('Electricité', '1000'), ('Bureaux', '500')):
+            create_activity(self.admin, form(category=category, quantity=quantity), auto_validate=True)
+        create_activity(self.admin, form(scope='Scope 1', ademe_factor_id='20',
+                                          period_start='2024-02-01', period_end='2024-02-29'))
+
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(self.admin.id)
+        g.pop('_login_user', None)
+
+        from_rollup = client.get('/api/v1/analytics/emissions').json
+        # date_to filters on period_end, which only the activity rows can answer
+        from_activities = client.get('/api/v1/analytics/emissions?date_to=2030-01-01').json
+        self.assertEqual(from_rollup['summary'], from_activities['summary'])
+        self.assertEqual(from_rollup['categories'], from_activities['categories'])
+        self.assertEqual(from_rollup['trend'], {'labels': ['2024-01', '2024-02'],
+                                                'data': [0.078, 0.227]})
+
+        validated = client.get('/api/v1/analytics/emissions?status=validated&date_from=2024-01-01').json
+        self.assertEqual(validated['summary']['count'], 2)
+
+        self.assertEqual(client.get('/dashboard/org-admin/').status_code, 200)
+
+    def test_worker_analytics_aggregates_own_activities(self):
+        create_activity(self.worker, form())
+        create_activity(self.worker, form(category='', quantity='10', period_start='2024-03-05'))
+        create_activity(self.worker, form(ademe_factor_id=''))
+        create_activity(self.admin, form(quantity='99999'), auto_validate=True)
+
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(self.worker.id)
+        g.pop('_login_user', None)
+
+        data = client.get('/api/v1/analytics/emissions').json
+        self.assertEqual((data['summary']['total_kg'], data['summary']['count']), (52.52, 2))
+        self.assertEqual(data['categories']['labels'], ['Electricité', 'Uncategorized'])
+        self.assertEqual(data['trend']['labels'], ['2024-01', '2024-03'])
+        self.assertEqual(data['activity_types']['labels'], ['simple'])
+
+        data = client.get('/api/v1/analytics/emissions?date_from=2024-02-01&scope=Scope 2').json
+        self.assertEqual(data['summary']['count'], 1)
+
+    def test_platform_rollups_and_breakdowns(self):
+        other = Organization(name='Globex', country='Belgium')
+        db.session.add(other)
+        db.session.flush()
+        other_admin = User(email='admin@globex.test', password_hash='x', organization_id=other.id,
+                           role=UserRole.ORG_ADMIN)
+        platform_admin = User(email='root@greenledger.test', password_hash='x',
+                              role=UserRole.PLATFORM_ADMIN)
+        db.session.add_all([other_admin, platform_admin])
+        db.session.commit()
+
+        create_activity(self.admin, form(), auto_validate=True)
+        create_activity(other_admin, form(quantity='3000'), auto_validate=True)
+        draft = create_activity(other_admin, form(scope='Scope 1', ademe_factor_id='20'))
+        # Writers leave the platform tables to the scheduled refresh
+        self.assertEqual(self.platform(), ({}, {}))
+        refresh = job_queue.schedule()[0]
+        self.assertEqual((refresh.kind, refresh.status), ('refresh_platform_rollups', JobStatus.SUCCEEDED))
+        self.assertEqual(job_queue.schedule(), [])
+
+        platform = PlatformEmissionRollup.query.filter_by(status=ActivityStatus.VALIDATED).one()
+        self.assertEqual((platform.co2e_kg, platform.activity_count), (208.0, 2))
+
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(platform_admin.id)
+        g.pop('_login_user', None)
+
+        data = client.get('/api/v1/analytics/emissions').json
+        self.assertEqual(data['summary']['count'], 3)
+        self.assertEqual(data['breakdowns']['organizations']['labels'], ['Globex', 'Acme'])
+        self.assertEqual(data['breakdowns']['industries']['labels'], ['Unspecified', 'Retail'])
+        self.assertEqual(data['breakdowns']['countries']['labels'], ['Belgium', 'France'])
+
+        data = client.get('/api/v1/analytics/emissions?status=draft').json
+        self.assertEqual(data['breakdowns']['organizations'], {'labels': ['Globex'], 'data': [0.227]})
+        self.assertNotIn('breakdowns', client.get('/api/v1/analytics/emissions?category=Bureaux').json)
+
+        # Moving the draft out of Globex's totals reaches the breakdown rows at the next refresh
+        submit_activity(other_admin, draft.id)
+        drafts = PlatformEmissionBreakdown.query.filter_by(dimension='country', value='Belgium',
+                                                           status=ActivityStatus.DRAFT)
+        self.assertEqual(drafts.count(), 1)
+        enqueue('refresh_platform_rollups')
+        self.assertEqual(drafts.count(), 0)
+        platform = self.platform()
+        self.assertMatchesRebuild()
+        self.assertEqual(self.platform(), platform)
+
+    def test_platform_tables_refreshed_without_job_runner(self):
+        platform_admin = User(email='root@greenledger.test', password_hash='x',
+                              role=UserRole.PLATFORM_ADMIN)
+        db.session.add(platform_admin)
+        db.session.commit()
+        create_activity(self.admin, form(), auto_validate=True)
+        self.assertEqual(self.platform(), ({}, {}))
+
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(platform_admin.id)
+        g.pop('_login_user', None)
+
+        # No job ever ran: the first platform reader builds the tables
+        self.assertEqual(client.get('/api/v1/analytics/emissions').json['summary']['total_kg'], 52.0)
+
+        # Tables not refreshed for PLATFORM_ROLLUP_INTERVAL are rebuilt by the next check
+        create_activity(self.admin, form(quantity='2000'), auto_validate=True)
+        interval = self.app.config['PLATFORM_ROLLUP_INTERVAL']
+        db.session.execute(update(PlatformRollupVersion).values(
+            updated_at=datetime.utcnow() - timedelta(seconds=interval + 1)
+        ))
+        db.session.commit()
+        rollup._platform_checked.pop(db.engine, None)
+        self.assertEqual(client.get('/api/v1/analytics/emissions').json['summary']['total_kg'], 156.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
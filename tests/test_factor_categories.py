@@ -0,0 +1,66 @@
+import unittest
+
+from app.services.emission_factor_loader import EmissionFactorSearchEngine
+from app.services.factor_categories import CategoryTree, split_category
+from tests.test_emission_factor_search import FACTORS, make_factor
+
+
+class CategoryTreeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tree = CategoryTree({
+            'Energie > Electricite': [0, 4],
+            'Energie > Chaleur > Reseau': [2],
+            'Energie': [5],
+            'Transport > Marchandises': [1, 3],
+            '': [6],
+        })
+
+    def test_split_category(self):
+        self.assertEqual(split_category(' Energie >  Electricite > '), ('Energie', 'Electricite'))
+        self.assertEqual(split_category(''), ())
+
+    def test_children(self):
+        self.assertEqual([n.name for n in self.tree.children('')], ['Energie', 'Transport'])
+        self.assertEqual([n.path for n in self.tree.children('Energie')],
+                         ['Energie > Chaleur', 'Energie > Electricite'])
+        self.assertEqual(self.tree.children('Unknown'), [])
+
+    def test_positions_under(self):
+        self.assertEqual(self.tree.positions_under('Energie'), [5, 2, 0, 4])
+        self.assertEqual(self.tree.positions_under('Energie>Chaleur'), [2])
+        self.assertEqual(self.tree.node('Energie').count, 4)
+        self.assertEqual(self.tree.root.count, 6)
+        self.assertEqual(self.tree.positions_under('Energie > Gaz'), [])
+
+    def test_paths_are_case_sensitive(self):
+        tree = CategoryTree({'Energie > Electricite': [0], 'ENERGIE > Electricite': [1]})
+        self.assertEqual([n.path for n in tree.children('')], ['ENERGIE', 'Energie'])
+        self.assertEqual(tree.positions_under('Energie'), [0])
+        self.assertEqual(tree.positions_under('ENERGIE > Electricite'), [1])
+        self.assertIsNone(tree.node('energie'))
+
+
+class SearchByCategoryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = EmissionFactorSearchEngine(FACTORS + [
+            make_factor('9', 'Chaleur réseau', category='Energie > Chaleur'),
+            make_factor('10', 'Panneaux solaires', category='Achats de biens > Energie'),
+        ])
+
+    def test_subtree(self):
+        # A node path returns its subtree only, not every category containing it
+        ids = [f.id for f in self.engine.search_by_category('Energie')]
+        self.assertEqual(ids, ['9', '1', '2'])
+        # Other spellings are matched as substrings, anywhere in the code
+        ids = [f.id for f in self.engine.search_by_category('energie')]
+        self.assertEqual(sorted(ids), ['1', '10', '2', '9'])
+
+    def test_substring_fallback(self):
+        ids = [f.id for f in self.engine.search_by_category('fossiles')]
+        self.assertEqual(ids, ['3', '4', '5', '6'])
+        ids = [f.id for f in self.engine.search_by_category('Combustibles > Fossiles', exact=True)]
+        self.assertEqual(ids, ['3', '4', '5', '6'])
+
+
+if __name__ == '__main__':
+    unittest.main()
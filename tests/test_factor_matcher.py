@@ -0,0 +1,122 @@
+import itertools
+import unittest
+from difflib import SequenceMatcher
+from unittest import mock
+
+from app.services import factor_matcher
+from app.services.emission_factor_loader import EmissionFactorSearchEngine
+from app.services.factor_matcher import normalize_scope, normalize_unit, scope_for_category
+from tests.test_emission_factor_search import make_factor
+
+
+FACTORS = [
+    make_factor('1', 'Électricité - mix moyen', 'Electricity - average mix',
+                category='Electricité > Mix moyen', unit_fr='kgCO2e/kWh', factor=0.052),
+    make_factor('2', 'Gazole routier', 'Road diesel', category='Combustibles > Fossiles',
+                unit_fr='kgCO2e/litre', factor=3.17),
+    make_factor('3', 'Gazole routier', 'Road diesel', category='Combustibles > Fossiles',
+                unit_fr='kgCO2e/kWh PCI', factor=0.324),
+    make_factor('4', 'Gaz naturel', 'Natural gas', category='Combustibles > Fossiles',
+                unit_fr='kgCO2e/MWh PCS', factor=227.0),
+    make_factor('5', 'Transport routier - camion', 'Road transport - truck',
+                category='Transport de marchandises > Routier', unit_fr='kgCO2e/t.km', factor=0.09),
+    make_factor('6', 'Gazole routier 2015', category='Combustibles > Fossiles',
+                unit_fr='kgCO2e/litre', status='Archivé', factor=3.0),
+]
+
+
+class UnitNormalizationTestCase(unittest.TestCase):
+    def test_aliases(self):
+        self.assertEqual(normalize_unit('kgCO2e/kWh PCI'), ('kwh', ('energy', 1.0)))
+        self.assertEqual(normalize_unit('MWh'), ('mwh', ('energy', 1e3)))
+        self.assertEqual(normalize_unit('litres')[0], 'l')
+        self.assertEqual(normalize_unit('kgCO₂e /L')[0], 'l')
+        self.assertEqual(normalize_unit('tonne-km')[0], 't.km')
+        self.assertEqual(normalize_unit('furlongs'), (None, None))
+
+    def test_scopes(self):
+        self.assertEqual(normalize_scope(2), 2)
+        self.assertEqual(normalize_scope('Scope 3'), 3)
+        self.assertIsNone(normalize_scope(None))
+        self.assertEqual(scope_for_category('Electricité > Mix moyen'), 2)
+        self.assertIsNone(scope_for_category('Autre'))
+
+
+class FindFactorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = EmissionFactorSearchEngine(FACTORS)
+
+    def test_unit_selects_factor(self):
+        self.assertEqual(self.engine.find_factor('gazole', 'litres', 1).id, '2')
+        self.assertEqual(self.engine.find_factor('gazole', 'kWh', 1).id, '3')
+        self.assertEqual(self.engine.find_factor('camion', 'tonne-km', 3).id, '5')
+        self.assertIsNone(self.engine.find_factor('gazole', 'km'))
+        self.assertIsNone(self.engine.find_factor('bœuf', 'kg'))
+
+    def test_other_unit_of_same_dimension_is_rescaled(self):
+        factor = self.engine.find_factor('gaz naturel', 'kWh', 1)
+        self.assertEqual(factor.id, '4')
+        self.assertAlmostEqual(factor.factor, 0.227)
+        self.assertEqual(factor.unit_fr, 'kgCO2e/kWh')
+        # The loaded factor itself is untouched
+        self.assertEqual(self.engine.get_by_id('4').factor, 227.0)
+
+        self.assertAlmostEqual(self.engine.find_factor('electricite', 'MWh', 2).factor, 52.0)
+
+    def test_lookups_are_memoised(self):
+        self.engine.find_factor('Gazole', 'L', 1)
+        self.engine.find_factor('gazole ', 'litre', 'Scope 1')
+        self.assertEqual(self.engine.matcher._cache.stats()['hits'], 1)
+
+    def test_every_candidate_is_scored(self):
+        # The closest name comes after hundreds of candidates in index order
+        factors = [
+            make_factor(str(i), f'Gazole routier lot {i} mélange {"bio " * (i % 7)}transporté',
+                        category='Combustibles > Fossiles', unit_fr='kgCO2e/litre')
+            for i in range(300)
+        ] + [make_factor('best', 'Gazole routier', category='Combustibles > Fossiles',
+                         unit_fr='kgCO2e/litre')]
+        engine = EmissionFactorSearchEngine(factors)
+        self.assertEqual(engine.find_factor('gazole routier', 'litres', 1).id, 'best')
+        self.assertEqual(engine.find_factor('gazole routier lot 250', 'litres').id, '250')
+
+    def test_full_comparisons_are_bounded(self):
+        factors = [
+            make_factor(str(i), f'Gazole routier lot {i}', category='Combustibles > Fossiles',
+                        unit_fr='kgCO2e/litre')
+            for i in range(300)
+        ] + [make_factor('best', 'Gazole routier', category='Combustibles > Fossiles',
+                         unit_fr='kgCO2e/litre')]
+        engine = EmissionFactorSearchEngine(factors)
+        compared = []
+
+        class CountingMatcher(SequenceMatcher):
+            def set_seq2(self, b):
+                if b:
+                    compared.append(b)
+                super().set_seq2(b)
+
+        with mock.patch.object(factor_matcher, 'SequenceMatcher', CountingMatcher):
+            # The exact name has the best bound: no other name is compared
+            self.assertEqual(engine.find_factor('gazole routier', 'litres').id, 'best')
+            self.assertEqual(compared, ['gazole routier'] * 2)
+
+        # Reordered names all share the best bound; only the shortlist is compared
+        words = ('gazole', 'routier', 'camion', 'benne', 'diesel')
+        engine = EmissionFactorSearchEngine([
+            make_factor(str(i), ' '.join(order), category='Combustibles > Fossiles',
+                        unit_fr='kgCO2e/litre')
+            for i, order in enumerate(itertools.permutations(words))
+        ])
+        query = 'diesel gazole camion routier benne'
+        del compared[:]
+        with mock.patch.object(factor_matcher, 'SequenceMatcher', CountingMatcher), \
+                mock.patch.object(factor_matcher, 'MAX_SCORED_CANDIDATES', 5):
+            self.assertEqual(engine.find_factor(query, 'litres').name_fr, query)
+        self.assertLessEqual(len(compared), 10)
+        # The exact name is compared first, however late it comes in the table
+        self.assertEqual(compared[:2], [query] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
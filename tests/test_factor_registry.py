@@ -0,0 +1,182 @@
+import time
+import unittest
+from unittest import mock
+
+from sqlalchemy import event, insert
+
+from app.extensions import db
+from app.factory import create_app
+from app.models.emission_factor import EmissionFactor
+from app.models.emission_factor_database import EmissionFactorDatabase
+from app.services import emission_factor_loader, factor_registry
+from app.services.emission_factor_loader import EmissionFactorSearchEngine
+from app.services.factor_registry import DatabaseFactorSource, FactorRegistry, FactorSource
+from tests.test_emission_factor_search import FACTORS, make_factor
+from tests.test_factors_api import install_loader
+
+
+class StaticSource(FactorSource):
+    """In-memory source counting its builds"""
+
+    def __init__(self, name, factors):
+        self.name = name
+        self.factors = factors
+        self.builds = 0
+
+    def load_rows(self):
+        self.builds += 1
+        return [f.to_row() for f in self.factors]
+
+
+class FactorRegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.first = StaticSource('ademe', FACTORS[:4])
+        self.second = StaticSource('defra', FACTORS[4:])
+        self.registry = FactorRegistry()
+        self.registry.register(self.first)
+        self.registry.register(self.second)
+
+    def test_search_matches_single_index(self):
+        combined = EmissionFactorSearchEngine(FACTORS)
+        for query in ('gaz', 'routier', 'fioul', 'boeuf', 'é', 'l d'):
+            self.assertEqual(
+                [(f.id, score) for f, score in self.registry.search(query, max_results=3)],
+                [(f.id, score) for f, score in combined.search(query, max_results=3)],
+                query,
+            )
+        self.assertEqual(
+            [[f.id for f, _ in hits] for hits in self.registry.search_many(['gaz', 'camion', 'é', 'gaz'])],
+            [[f.id for f, _ in hits] for hits in combined.search_many(['gaz', 'camion', 'é', 'gaz'])],
+        )
+
+    def test_database_selection(self):
+        ids = [f.id for f, _ in self.registry.search('routier', databases=['defra'])]
+        self.assertEqual(ids, ['7'])
+        hits, counts = self.registry.faceted_search('routier')
+        self.assertEqual(counts['category'], {'Combustibles > Fossiles': 1, 'Transport > Marchandises': 1})
+
+    def test_per_source_reload(self):
+        self.registry.search('gaz')
+        self.assertEqual((self.first.builds, self.second.builds), (1, 1))
+
+        self.second.factors = FACTORS[4:] + [make_factor('defra:1', 'Gaz de pétrole liquéfié')]
+        self.registry.reload('defra')
+        self.assertEqual((self.first.builds, self.second.builds), (1, 2))
+        self.assertEqual(self.registry.get_by_id('defra:1').name_fr, 'Gaz de pétrole liquéfié')
+        self.assertEqual(self.registry.get_by_id('3').name_fr, 'Gazole routier')
+
+        with self.assertRaises(ValueError):
+            self.registry.reload('unknown')
+
+    def test_failed_source_is_skipped(self):
+        broken = StaticSource('ipcc', [])
+        broken.load_rows = lambda: 1 / 0
+        self.registry.register(broken)
+        self.assertTrue(self.registry.search('gaz'))
+        self.assertIn('division by zero', self.registry.status()['ipcc']['error'])
+
+    def test_sources_must_load_rows(self):
+        with self.assertRaises(TypeError):
+            FactorSource()
+
+
+class DatabaseFactorSourceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add(EmissionFactor(
+            name='Chaudière biomasse atelier', factor=0.03, unit='kWh', category='Combustion',
+            database_source=EmissionFactorDatabase.CUSTOM, year=2024, region='FR',
+        ))
+        db.session.commit()
+
+        self.previous_registry = factor_registry._registry
+        self.previous_loader = emission_factor_loader._global_loader
+        factor_registry._registry = None
+        install_loader(FACTORS)
+
+    def tearDown(self):
+        factor_registry._registry = self.previous_registry
+        emission_factor_loader._global_loader = self.previous_loader
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_custom_factors_are_searchable(self):
+        registry = factor_registry.get_registry()
+        hits = registry.search('biomasse')
+        self.assertEqual(hits[0][0].id, 'custom:1')
+        self.assertEqual(hits[0][0].unit_fr, 'kgCO2e/kWh')
+        self.assertEqual(registry.status()['custom']['factors'], 1)
+        self.assertEqual(registry.status()['defra']['factors'], 0)
+
+        client = self.app.test_client()
+        ids = [hit['id'] for hit in client.get('/api/v1/factors/search?q=biomasse&databases=all').json]
+        self.assertEqual(ids, ['custom:1'])
+        # Without databases=all only ADEME is searched (its fuzzy fallback hits only)
+        ids = [hit['id'] for hit in client.get('/api/v1/factors/search?q=biomasse').json]
+        self.assertNotIn('custom:1', ids)
+        self.assertEqual(client.get('/api/v1/factors/custom:1').json['validity_period'], '2024')
+
+    def test_edits_rebuild_the_segment(self):
+        registry = factor_registry.get_registry()
+        self.assertEqual(registry.search('camion', databases=['defra']), [])
+        client = self.app.test_client()
+        self.assertEqual(client.get('/api/v1/factors/search?q=hgv&databases=defra').json, [])
+
+        truck = EmissionFactor(name='HGV camion diesel', factor=0.1, unit='tonne.km', category='Freight',
+                               database_source=EmissionFactorDatabase.DEFRA)
+        db.session.add(truck)
+        db.session.commit()
+        # Cached API results are not served once the factors changed
+        self.assertEqual([hit['id'] for hit in client.get('/api/v1/factors/search?q=hgv&databases=defra').json],
+                         [f'defra:{truck.id}'])
+        self.assertEqual([f.id for f, _ in registry.search('camion', databases=['defra'])],
+                         [f'defra:{truck.id}'])
+
+        custom = EmissionFactor.query.filter_by(database_source=EmissionFactorDatabase.CUSTOM).one()
+        self.assertEqual(registry.search('biomasse', databases=['custom'])[0][0].id, 'custom:1')
+        db.session.delete(custom)
+        db.session.commit()
+        self.assertEqual(registry.search('biomasse', databases=['custom']), [])
+
+    def test_searches_reuse_checked_stamps(self):
+        client = self.app.test_client()
+        url = '/api/v1/factors/search?databases=all&q='
+        self.assertEqual(client.get(url + 'biomasse').json[0]['id'], 'custom:1')
+
+        statements = []
+
+        def record(*args):
+            statements.append(args[2])
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            client.get(url + 'biomasse')
+            self.assertEqual(client.get(url + 'chaudiere').json[0]['id'], 'custom:1')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        # Neither the cache hit nor the miss checks the database-backed sources again
+        self.assertEqual(statements, [])
+
+        # A row written by another process (no ORM event here) is seen once the stamp expires
+        db.session.execute(insert(EmissionFactor).values(
+            name='Chaudière fioul atelier', factor=0.3, unit='kWh', category='Combustion',
+            database_source=EmissionFactorDatabase.CUSTOM,
+        ))
+        db.session.commit()
+        self.assertEqual(len(client.get(url + 'atelier').json), 1)
+        later = time.monotonic() + factor_registry.STAMP_TTL + 1
+        with mock.patch.object(factor_registry.time, 'monotonic', return_value=later):
+            self.assertEqual(len(client.get(url + 'chaudiere atelier').json), 2)
+
+    def test_source_rows(self):
+        rows = DatabaseFactorSource(EmissionFactorDatabase.CUSTOM).load_rows()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][0], 'custom:1')
+
+
+if __name__ == '__main__':
+    unittest.main()
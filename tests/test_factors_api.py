@@ -0,0 +1,123 @@
+import unittest
+
+from app.factory import create_app
+from app.services import emission_factor_loader
+from app.services.emission_factor_loader import ADEMEEmissionFactorLoader, EmissionFactorSearchEngine
+from app.api.v1 import factors as factors_api
+from tests.test_emission_factor_search import FACTORS
+
+
+def install_loader(factors):
+    """Publish an in-memory loader as the global one"""
+    loader = ADEMEEmissionFactorLoader('/nonexistent/Base_Carbone.csv', use_snapshot=False)
+    loader.factors = factors
+    loader.search_engine = EmissionFactorSearchEngine(factors)
+    emission_factor_loader._global_loader = loader
+    emission_factor_loader._loader_version += 1
+    return loader
+
+
+class FactorsApiTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.previous_loader = emission_factor_loader._global_loader
+        self.loader = install_loader(FACTORS)
+        factors_api._search_cache.clear()
+
+    def tearDown(self):
+        emission_factor_loader._global_loader = self.previous_loader
+
+    def test_search(self):
+        response = self.client.get('/api/v1/factors/search?q=gaz')
+        self.assertEqual(response.status_code, 200)
+        ids = [hit['id'] for hit in response.json]
+        self.assertIn('4', ids)
+        self.assertNotIn('6', ids)
+
+    def test_search_limit_is_filled_after_valid_filter(self):
+        ids = [hit['id'] for hit in self.client.get('/api/v1/factors/search?q=gaz&limit=2').json]
+        self.assertEqual(len(ids), 2)
+        self.assertNotIn('6', ids)
+
+        ids = [hit['id'] for hit in self.client.get('/api/v1/factors/search?q=gaz&valid_only=0').json]
+        self.assertIn('6', ids)
+
+    def test_search_facets(self):
+        response = self.client.get(
+            '/api/v1/factors/search?q=gaz&facets=1&category=Combustibles%20%3E%20Fossiles'
+        )
+        self.assertEqual(sorted(hit['id'] for hit in response.json['results']), ['3', '4'])
+        self.assertEqual(response.json['facets']['source'], [{'value': 'Base Carbone', 'count': 2}])
+
+        plain = self.client.get('/api/v1/factors/search?q=gaz&category=Energie').json
+        self.assertEqual(plain, [])
+
+    def test_batch(self):
+        response = self.client.post('/api/v1/factors/batch', json={
+            'ids': ['3', '404'],
+            'queries': ['Gaz', 'fioul', 'x'],
+            'limit': 2,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['factors']['3']['name_fr'], 'Gazole routier')
+        self.assertIsNone(response.json['factors']['404'])
+        queries = response.json['queries']
+        self.assertEqual([q['q'] for q in queries], ['Gaz', 'fioul', 'x'])
+        self.assertEqual(len(queries[0]['results']), 2)
+        self.assertEqual(queries[1]['results'][0]['id'], '5')
+        self.assertEqual(queries[2]['results'], [])
+
+        too_many = self.client.post('/api/v1/factors/batch', json={'ids': ['1'] * 501})
+        self.assertEqual(too_many.status_code, 400)
+        for limit in ('5', None, 2.5, True):
+            bad_limit = self.client.post('/api/v1/factors/batch', json={'queries': ['gaz'], 'limit': limit})
+            self.assertEqual(bad_limit.status_code, 400, limit)
+        for valid_only in ('false', '0', 0, None):
+            bad_flag = self.client.post('/api/v1/factors/batch', json={'queries': ['gaz'], 'valid_only': valid_only})
+            self.assertEqual(bad_flag.status_code, 400, valid_only)
+        all_factors = self.client.post('/api/v1/factors/batch', json={'queries': ['gaz'], 'valid_only': False})
+        self.assertEqual(all_factors.status_code, 200)
+
+    def test_malformed_limit_falls_back_to_default(self):
+        response = self.client.get('/api/v1/factors/search?q=gaz&limit=abc')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('4', [hit['id'] for hit in response.json])
+        response = self.client.get('/api/v1/factors/suggest?q=elec&limit=many')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json)
+
+    def test_categories(self):
+        root = self.client.get('/api/v1/factors/categories').json
+        self.assertEqual(root['count'], len(FACTORS))
+        self.assertIn({'name': 'Combustibles', 'path': 'Combustibles', 'count': 4, 'has_children': True},
+                      root['children'])
+
+        node = self.client.get('/api/v1/factors/categories?path=Combustibles').json
+        self.assertEqual([c['path'] for c in node['children']], ['Combustibles > Fossiles'])
+        self.assertEqual(self.client.get('/api/v1/factors/categories?path=Nope').status_code, 404)
+
+    def test_suggest(self):
+        response = self.client.get('/api/v1/factors/suggest?q=elec&limit=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json), 3)
+        self.assertEqual(response.json[0], {'type': 'tag', 'text': 'electricite', 'count': 2})
+        self.assertEqual(self.client.get('/api/v1/factors/suggest?q=').json, [])
+
+    def test_search_cache_hits_and_invalidation(self):
+        before = factors_api._search_cache.stats()
+        self.client.get('/api/v1/factors/search?q=Gaz')
+        self.client.get('/api/v1/factors/search?q=gaz%20')
+
+        stats = self.client.get('/api/v1/factors/stats').json['search_cache']
+        self.assertEqual(stats['misses'] - before['misses'], 1)
+        self.assertEqual(stats['hits'] - before['hits'], 1)
+
+        # A new loader version never serves the old entries
+        install_loader(FACTORS[:3])
+        ids = [hit['id'] for hit in self.client.get('/api/v1/factors/search?q=gaz').json]
+        self.assertNotIn('4', ids)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,225 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from flask import g
+from sqlalchemy import update
+
+from app.config import TestingConfig
+from app.extensions import db
+from app.factory import create_app
+from app.models.background_job import BackgroundJob, JobStatus
+from app.models.organization import Organization
+from app.models.user import User, UserRole
+from app.services.job_queue import enqueue, job_file_path, job_handler, job_queue, report_progress
+
+
+@job_handler('test_sum')
+def sum_job(job, numbers):
+    report_progress(job, 1, 2, 'halfway')
+    return {'total': sum(numbers)}
+
+
+@job_handler('test_fail')
+def failing_job(job):
+    raise RuntimeError('boom')
+
+
+@job_handler('test_tick')
+def tick_job(job):
+    return {'ticked': True}
+
+
+@job_handler('test_file')
+def file_job(job, text):
+    path = job_file_path(f'job-{job.id}.txt')
+    with open(path, 'w') as f:
+        f.write(text)
+    return {'file': os.path.basename(path), 'filename': 'out.txt', 'mimetype': 'text/plain'}
+
+
+class JobQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config['JOB_FILES_DIR'] = tempfile.mkdtemp()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        org = Organization(name='Acme')
+        db.session.add(org)
+        db.session.flush()
+        self.user = User(email='admin@acme.test', password_hash='x', organization_id=org.id,
+                         role=UserRole.ORG_ADMIN)
+        self.other = User(email='other@acme.test', password_hash='x', organization_id=org.id,
+                          role=UserRole.WORKER)
+        db.session.add_all([self.user, self.other])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.app.config['JOB_FILES_DIR'])
+
+    def get(self, user, url):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+        # Requests share the test's app context; drop the previous user
+        g.pop('_login_user', None)
+        return client.get(url)
+
+    def test_inline_success_and_failure(self):
+        job = enqueue('test_sum', self.user, numbers=[1, 2, 3])
+        self.assertEqual(job.status, JobStatus.SUCCEEDED)
+        self.assertEqual(job.result, {'total': 6})
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(job.organization_id, self.user.organization_id)
+        self.assertIsNotNone(job.finished_at)
+
+        failed = enqueue('test_fail', self.user)
+        self.assertEqual(failed.status, JobStatus.FAILED)
+        self.assertEqual(failed.error, 'boom')
+
+        with self.assertRaises(ValueError):
+            enqueue('no_such_kind', self.user)
+
+    def test_runner_claims_queued_jobs_once(self):
+        self.app.config.update(JOB_INLINE=False, JOB_WORKERS=0)
+        first = enqueue('test_sum', self.user, numbers=[1])
+        second = enqueue('test_sum', self.user, numbers=[2])
+        self.assertEqual(first.status, JobStatus.QUEUED)
+
+        # A job already claimed elsewhere is not claimed again
+        self.assertTrue(job_queue._claim(first.id))
+        self.assertFalse(job_queue._claim(first.id))
+
+        self.assertTrue(job_queue.run_next())
+        self.assertFalse(job_queue.run_next())
+        db.session.expire_all()
+        self.assertEqual(db.session.get(BackgroundJob, second.id).result, {'total': 2})
+        self.assertEqual(db.session.get(BackgroundJob, first.id).status, JobStatus.RUNNING)
+
+    def test_runner_threads(self):
+        self.app.config.update(JOB_INLINE=False, JOB_WORKERS=1, JOB_POLL_INTERVAL=0.05)
+        job_id = enqueue('test_sum', self.user, numbers=[4, 5]).id
+        self.addCleanup(job_queue.stop)
+
+        for _ in range(100):
+            db.session.expire_all()
+            if db.session.get(BackgroundJob, job_id).is_finished:
+                break
+            time.sleep(0.05)
+        self.assertEqual(db.session.get(BackgroundJob, job_id).result, {'total': 9})
+
+    def test_api(self):
+        job = enqueue('test_file', self.user, text='hello')
+
+        status = self.get(self.user, f'/api/v1/jobs/{job.id}').json
+        self.assertEqual(status['status'], 'succeeded')
+        listed = self.get(self.user, '/api/v1/jobs?kind=test_file').json
+        self.assertEqual([j['id'] for j in listed], [job.id])
+
+        download = self.get(self.user, f'/api/v1/jobs/{job.id}/download')
+        self.assertEqual(download.data, b'hello')
+        self.assertIn('out.txt', download.headers['Content-Disposition'])
+        download.close()
+
+        # Other users cannot see the job
+        self.assertEqual(self.get(self.other, f'/api/v1/jobs/{job.id}').status_code, 404)
+        self.assertEqual(self.get(self.other, f'/api/v1/jobs/{job.id}/download').status_code, 404)
+
+        failed = enqueue('test_fail', self.user)
+        self.assertEqual(self.get(self.user, f'/api/v1/jobs/{failed.id}/download').status_code, 409)
+
+    def age(self, job_id, seconds):
+        db.session.execute(update(BackgroundJob).where(BackgroundJob.id == job_id)
+                           .values(updated_at=datetime.utcnow() - timedelta(seconds=seconds)))
+        db.session.commit()
+
+    def test_stale_running_jobs_are_failed(self):
+        self.app.config.update(JOB_INLINE=False, JOB_WORKERS=0, JOB_STALE_AFTER=300)
+        dead, alive, busy = (enqueue('test_sum', self.user, numbers=[n]).id for n in range(3))
+        for job_id in (dead, alive, busy):
+            self.assertTrue(job_queue._claim(job_id))
+        self.age(dead, 600)
+        self.age(busy, 600)
+
+        # This process is still running busy: the heartbeat keeps it alive
+        job_queue._running.add(busy)
+        self.addCleanup(job_queue._running.discard, busy)
+        job_queue.heartbeat()
+        self.assertEqual(job_queue.fail_stale(), 1)
+
+        db.session.expire_all()
+        self.assertEqual(db.session.get(BackgroundJob, dead).status, JobStatus.FAILED)
+        self.assertIsNotNone(db.session.get(BackgroundJob, dead).finished_at)
+        self.assertEqual(db.session.get(BackgroundJob, alive).status, JobStatus.RUNNING)
+        self.assertEqual(db.session.get(BackgroundJob, busy).status, JobStatus.RUNNING)
+
+    def test_stale_recalculation_does_not_block_a_new_one(self):
+        self.app.config.update(JOB_INLINE=False, JOB_WORKERS=0, WTF_CSRF_ENABLED=False)
+        admin = User(email='root@platform.test', password_hash='x', role=UserRole.PLATFORM_ADMIN)
+        db.session.add(admin)
+        db.session.commit()
+        stuck = enqueue('recalculate_emissions', admin).id
+        job_queue._claim(stuck)
+        self.age(stuck, 3600)
+
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(admin.id)
+        g.pop('_login_user', None)
+        client.post('/dashboard/admin/factors/recalculate')
+
+        jobs = BackgroundJob.query.filter_by(kind='recalculate_emissions').order_by(BackgroundJob.id).all()
+        self.assertEqual([job.status for job in jobs], [JobStatus.FAILED, JobStatus.QUEUED])
+
+    def test_old_job_files_are_purged(self):
+        self.app.config['JOB_FILES_RETENTION'] = 3600
+        old, recent = job_file_path('job-1.pdf'), job_file_path('job-2.xlsx')
+        for path in (old, recent):
+            open(path, 'w').close()
+        two_hours_ago = time.time() - 7200
+        os.utime(old, (two_hours_ago, two_hours_ago))
+
+        self.assertEqual(job_queue.purge_files(), 1)
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(recent))
+
+    def test_app_starts_the_queue(self):
+        with mock.patch.object(TestingConfig, 'JOB_AUTOSTART', True), \
+                mock.patch.object(job_queue, 'start') as start:
+            app = create_app('testing')
+        start.assert_called_once_with()
+        self.assertIs(job_queue.app, app)
+        job_queue.init_app(self.app)
+
+    def test_periodic_jobs_are_scheduled_once_per_interval(self):
+        self.app.config.update(JOB_INLINE=False, JOB_WORKERS=0,
+                               JOB_SCHEDULE={'test_tick': 'TEST_INTERVAL'}, TEST_INTERVAL=600)
+        job_id = job_queue.schedule()[0].id
+        # Not again while it is queued, running or recently finished
+        self.assertEqual(job_queue.schedule(), [])
+        self.assertTrue(job_queue.run_next())
+        self.assertEqual(db.session.get(BackgroundJob, job_id).status, JobStatus.SUCCEEDED)
+        self.assertEqual(job_queue.schedule(), [])
+
+        db.session.execute(update(BackgroundJob).values(
+            finished_at=datetime.utcnow() - timedelta(seconds=601)
+        ))
+        db.session.commit()
+        self.assertEqual(len(job_queue.schedule()), 1)
+
+        self.app.config['TEST_INTERVAL'] = 0
+        self.assertTrue(job_queue.run_next())
+        self.assertEqual(job_queue.schedule(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()